@@ -0,0 +1,115 @@
+import re
+from typing import Optional, Tuple
+
+from config import Config
+from render_info import RenderInfo
+from render_task import RenderTask
+
+
+# Copy of the regex based parser that Renderer used before log_parser.py,
+# kept as the baseline for log_parser_benchmark.py.
+class LegacyParser:
+    def __init__(self, config: Config) -> None:
+        self.config = config
+
+    def parse_blender_logs(
+        self, render_task: RenderTask, line: str, start_frame: int,
+        end_frame: int
+    ) -> Tuple[Optional[RenderInfo], Optional[int]]:
+        m = re.search(
+            r"""
+            ^
+            (?P<frame> [^|]*)
+            \s \| \s
+            (?P<time> Time: [^|]*)
+            \s \| \s
+            (?P<payload> .*?)
+            \s*
+            $
+            """,
+            line,
+            flags=re.VERBOSE
+        )
+
+        if not m:
+            return None, None
+
+        frame = m.group("frame")
+        time = m.group("time")
+        payload = m.group("payload")
+        remaining = None
+        mem = None
+        layer = None
+        status = None
+        progress = None
+
+        if payload.startswith("Remaining:"):
+            remaining, payload = payload.split(" | ", maxsplit=1)
+        if payload.startswith("Mem:"):
+            mem, layer, status = payload.split(" | ", maxsplit=2)
+        elif payload.startswith("Compositing"):
+            status = payload
+
+        if render_task.render_engine == "CYCLES":
+            if status is not None and status.startswith("Rendered "):
+                progress = self.parse_status(
+                    render_task, status, frame, start_frame, end_frame, layer
+                )
+        else:
+            i_frame = int(re.search(
+                "^ Fra: (?P<frame> [0-9]+)", frame, flags=re.VERBOSE
+            ).group("frame"))
+            progress = (i_frame - start_frame) \
+                / (end_frame - start_frame + 1) * 100
+
+        render_info = RenderInfo(
+            frame, time, remaining, mem, layer, status, self.config
+        )
+        return render_info, progress
+
+    def parse_status(
+        self, render_task: RenderTask, status: str, frame: str,
+        start_frame: int, end_frame: int, layer: str
+    ) -> float:
+        m = re.search(
+            r"""
+            ^
+            Rendered \s+
+            (?P<tiles> [0-9]+) / (?P<total_tiles> [0-9]+) \s+
+            Tiles, \s+
+            (
+                Sample \s+
+                (?P<samples> [0-9]+) / (?P<total_samples> [0-9]+)
+            )?
+            \b
+            """,
+            status,
+            flags=re.VERBOSE
+        )
+
+        tiles = int(m.group("tiles"))
+        total_tiles = int(m.group("total_tiles"))
+        try:
+            samples = int(m.group("samples"))
+            total_samples = int(m.group("total_samples"))
+        except TypeError:
+            samples = 1
+            total_samples = 1
+
+        frame = int(re.search(
+            "^ Fra: (?P<frame> [0-9]+)", frame, flags=re.VERBOSE
+        ).group("frame"))
+
+        if samples == total_samples:
+            samples = 0
+
+        # Queue files for headless runs may not list the view layers.
+        layer = layer.split(", ")[1]
+        layers = render_task.layers if layer in render_task.layers \
+            else [layer]
+        layer_index = layers.index(layer)
+
+        f_tiles = tiles + samples / total_samples
+        f_layers = layer_index + f_tiles / total_tiles
+        f_frames = frame + f_layers / len(layers)
+        return (f_frames - start_frame) / (end_frame - start_frame + 1) * 100
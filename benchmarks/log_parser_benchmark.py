@@ -0,0 +1,86 @@
+#!/bin/python3
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "pygtk"))
+
+from config import Config, default_settings  # noqa: E402
+from legacy_log_parser import LegacyParser  # noqa: E402
+from log_parser import LogParser  # noqa: E402
+from render_task import RenderTask  # noqa: E402
+
+
+LOGS = {
+    "cycles.log": ("CYCLES", ["View Layer", "Background"], 1, 4),
+    "eevee.log": ("BLENDER_EEVEE", ["View Layer"], 1, 24),
+    "workbench.log": ("BLENDER_WORKBENCH", ["View Layer"], 1, 48)
+}
+
+
+def read_log(path: str) -> List[str]:
+    with open(path, "r") as file:
+        return [line.strip() for line in file]
+
+
+def lines_per_second(
+    parse: Callable[[str], object], lines: List[str], repeat: int
+) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            parse(line)
+    return len(lines) * repeat / (time.perf_counter() - start)
+
+
+def check(legacy: Callable, compiled: Callable, lines: List[str]) -> None:
+    for line in lines:
+        old_info, old_progress = legacy(line)
+        new_info, new_progress = compiled(line)
+        assert str(old_info) == str(new_info), line
+        assert old_progress == new_progress or \
+            abs(old_progress - new_progress) < 1e-9, line
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="replay recorded Blender logs through the log parsers"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=20,
+        help="number of times every log is replayed"
+    )
+    args = parser.parse_args()
+
+    config = Config(default_settings(""))
+    legacy_parser = LegacyParser(config)
+
+    print(f"{'log':<16}{'lines':>8}{'legacy/s':>14}{'compiled/s':>14}"
+          f"{'speedup':>10}")
+    for name, (engine, layers, start, end) in LOGS.items():
+        lines = read_log(os.path.join(BENCHMARK_DIR, "logs", name))
+        render_task = RenderTask(
+            "", engine, "CPU", 0, 1920, 1080, 100, "Animation", start, end,
+            "PNG", "", "", layers, False
+        )
+        log_parser = LogParser(engine, layers, [(start, end)], config)
+
+        def legacy(line: str) -> tuple:
+            return legacy_parser.parse_blender_logs(
+                render_task, line, start, end
+            )
+
+        check(legacy, log_parser.parse, lines)
+        legacy_rate = lines_per_second(legacy, lines, args.repeat)
+        compiled_rate = lines_per_second(log_parser.parse, lines, args.repeat)
+        print(f"{name:<16}{len(lines):>8}{legacy_rate:>14,.0f}"
+              f"{compiled_rate:>14,.0f}"
+              f"{compiled_rate / legacy_rate:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
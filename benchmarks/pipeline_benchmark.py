@@ -0,0 +1,212 @@
+#!/bin/python3
+
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import trio
+from typing import Callable, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "pygtk"))
+# The fake Blender is found instead of a real one.
+os.environ["PATH"] = os.path.join(BENCHMARK_DIR, "fake_blender") \
+    + os.pathsep + os.environ.get("PATH", "")
+
+from config import Config, default_settings  # noqa: E402
+from eta import EtaPredictor  # noqa: E402
+from render_history import RenderHistory  # noqa: E402
+from render_info import RenderInfo  # noqa: E402
+from render_task import RenderTask  # noqa: E402
+from renderer import Renderer  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+from task_queue import TaskQueue  # noqa: E402
+
+
+ENGINES = ["CYCLES", "BLENDER_EEVEE", "BLENDER_WORKBENCH"]
+
+
+def create_tasks(
+    count: int, output_dir: str, engine: str = "CYCLES",
+    output_type: str = "Single Frame", end_frame: int = 1
+) -> List[RenderTask]:
+    return [
+        RenderTask(
+            os.path.join(output_dir, f"scene_{i}.blend"), engine, "CPU", 128,
+            1920, 1080, 100, output_type, 1, end_frame, "PNG",
+            os.path.join(output_dir, f"task_{i}_"), "", ["View Layer"], False
+        )
+        for i in range(count)
+    ]
+
+
+def create_storyboard(count: int, output_dir: str) -> List[RenderTask]:
+    return [
+        RenderTask(
+            os.path.join(output_dir, "storyboard.blend"), "CYCLES", "CPU",
+            128, 1920, 1080, 100, "Single Frame", i + 1, i + 1, "PNG",
+            os.path.join(output_dir, "storyboard_"), "", ["View Layer"],
+            False
+        )
+        for i in range(count)
+    ]
+
+
+async def render_queue(
+    config: Config, render_tasks: List[RenderTask], slots: int,
+    on_info: Callable[[RenderTask, RenderInfo], None]
+) -> None:
+    renderer = Renderer(config, on_info, lambda render_task, progress: None)
+    task_queue = TaskQueue()
+    for render_task in render_tasks:
+        task_queue.add(render_task)
+
+    def finish(render_task: RenderTask, image_path: Optional[str]) -> None:
+        render_task.finished = True
+
+    async def render(
+        render_tasks: List[RenderTask], threads: int,
+        cpus: Optional[List[int]]
+    ) -> None:
+        await renderer.render_batch(render_tasks, threads, finish, cpus)
+
+    scheduler = Scheduler(
+        slots, os.cpu_count() or 1, None, config.settings["batch_tasks"]
+    )
+    try:
+        await scheduler.run(task_queue, render)
+    finally:
+        with trio.CancelScope(shield=True):
+            await renderer.terminate()
+
+
+def task_overhead(
+    config: Config, count: int, slots: int,
+    create: Callable[[int, str], List[RenderTask]] = create_tasks
+) -> float:
+    with tempfile.TemporaryDirectory() as output_dir:
+        render_tasks = create(count, output_dir)
+        start = time.perf_counter()
+        trio.run(render_queue, config, render_tasks, slots,
+                 lambda render_task, info: None)
+        return (time.perf_counter() - start) / count
+
+
+def log_throughput(config: Config, engine: str, frames: int) -> float:
+    lines = 0
+
+    def on_info(render_task: RenderTask, info: RenderInfo) -> None:
+        nonlocal lines
+        lines += 1
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        render_tasks = create_tasks(1, output_dir, engine, "Animation", frames)
+        start = time.perf_counter()
+        trio.run(render_queue, config, render_tasks, 1, on_info)
+        return lines / (time.perf_counter() - start)
+
+
+def time_ms(function: Callable[[], object], repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def ui_latency(size: int) -> List[float]:
+    render_tasks = create_tasks(size, "/tmp")
+    task_queue = TaskQueue()
+    eta_predictor = EtaPredictor(RenderHistory(":memory:"))
+
+    def add_tasks() -> None:
+        for render_task in render_tasks:
+            task_queue.add(render_task)
+
+    def update_eta() -> None:
+        for render_task in render_tasks:
+            task_queue.state(render_task)
+            eta_predictor.task_remaining(render_task, 0)
+        eta_predictor.queue_remaining(render_tasks, 1, 0)
+
+    def next_task() -> None:
+        render_task = task_queue.take(lambda render_task: True)
+        task_queue.done(render_task)
+
+    add = time_ms(add_tasks)
+    return [
+        add / size, time_ms(update_eta, 3), time_ms(next_task, 100),
+        gtk_update_ms(size)
+    ]
+
+
+def gtk_update_ms(size: int) -> float:
+    if importlib.util.find_spec("gi") is None:
+        return float("nan")
+    import gi
+    gi.require_version("Gtk", "3.0")
+    from gi.repository import Gtk
+
+    store = Gtk.ListStore(str, str, str, str, int, str, str, str, str)
+    for i in range(size):
+        store.append([f"scene_{i}.blend", "Cycles", "", "", 0, "", "",
+                      str(i), "Ready"])
+
+    def update() -> None:
+        for row in store:
+            row[5] = "1 min"
+
+    return time_ms(update, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="render queues with the fake Blender and measure the "
+        "overhead of scheduling, log parsing and UI updates"
+    )
+    parser.add_argument(
+        "--tasks", type=int, default=50,
+        help="number of tasks to measure the per-task overhead with"
+    )
+    parser.add_argument(
+        "--frames", type=int, default=50,
+        help="number of frames to measure the log throughput with"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000],
+        help="queue sizes to measure the UI latency with"
+    )
+    args = parser.parse_args()
+
+    config = Config(default_settings(""))
+    print("Per-task overhead")
+    for persistent_workers in (False, True):
+        config.settings["persistent_workers"] = persistent_workers
+        for slots in (1, 4):
+            overhead = task_overhead(config, args.tasks, slots)
+            print(f"  {'workers' if persistent_workers else 'processes':<10}"
+                  f"{slots} slots {overhead * 1000:10.1f} ms")
+    config.settings["persistent_workers"] = False
+    for batch_tasks in (False, True):
+        config.settings["batch_tasks"] = batch_tasks
+        overhead = task_overhead(config, args.tasks, 1, create_storyboard)
+        print(f"  {'batched' if batch_tasks else 'unbatched':<10}"
+              f"same file {overhead * 1000:8.1f} ms")
+
+    print("Log throughput")
+    for engine in ENGINES:
+        rate = log_throughput(config, engine, args.frames)
+        print(f"  {engine:<20}{rate:>12,.0f} lines/s")
+
+    print("UI latency")
+    print(f"  {'tasks':>8}{'add ms':>12}{'eta ms':>12}{'next ms':>12}"
+          f"{'gtk ms':>12}")
+    for size in args.sizes:
+        add, eta, next_task, gtk = ui_latency(size)
+        print(f"  {size:>8}{add:>12.4f}{eta:>12.3f}{next_task:>12.4f}"
+              f"{gtk:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
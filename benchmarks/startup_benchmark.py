@@ -0,0 +1,109 @@
+#!/bin/python3
+
+import argparse
+import importlib.util
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PYGTK_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "pygtk")
+sys.path.insert(0, PYGTK_DIR)
+
+from config import find_blender_config, query_blender_config  # noqa: E402
+
+# Runs the GUI with a window that quits once it is drawn.
+FIRST_FRAME_SCRIPT = f"""
+import sys
+sys.path.insert(0, {PYGTK_DIR!r})
+
+import trio_gtk
+import overnight_renderer
+
+
+class FirstFrameWindow(overnight_renderer.MainWindow):
+    def __init__(self, nursery):
+        super().__init__(nursery)
+        self.drawn = False
+        self.connect("draw", self.on_draw)
+
+    def on_draw(self, window, context):
+        if not self.drawn:
+            self.drawn = True
+            print("FIRST_FRAME", flush=True)
+            overnight_renderer.main_quit(self, None)
+        return False
+
+
+overnight_renderer.MainWindow = FirstFrameWindow
+trio_gtk.run(overnight_renderer.main)
+"""
+
+
+def time_call(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def time_to_first_frame() -> Optional[float]:
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", FIRST_FRAME_SCRIPT], stdout=subprocess.PIPE
+    )
+    elapsed = None
+    for line in process.stdout:
+        if line.strip() == b"FIRST_FRAME":
+            elapsed = time.perf_counter() - start
+            break
+    process.wait()
+    return elapsed
+
+
+def format_times(times: List[float]) -> str:
+    return f"median {statistics.median(times) * 1000:.1f} ms, " \
+        f"min {min(times) * 1000:.1f} ms, max {max(times) * 1000:.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="measure how long the GUI takes to show its window"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5,
+        help="number of times the GUI is started"
+    )
+    args = parser.parse_args()
+
+    print(f"Config directory from known paths: "
+          f"{time_call(find_blender_config, 100) * 1000:.2f} ms "
+          f"({find_blender_config() or 'not found'})")
+    if shutil.which("blender") is not None:
+        print(f"Config directory from Blender: "
+              f"{time_call(query_blender_config, 1) * 1000:.0f} ms")
+
+    if importlib.util.find_spec("gi") is None \
+            or importlib.util.find_spec("trio_gtk") is None:
+        print("PyGObject or trio_gtk is missing, skipping the GUI")
+        return
+    if not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        print("No display, skipping the GUI")
+        return
+
+    times = []
+    for _ in range(args.repeat):
+        elapsed = time_to_first_frame()
+        if elapsed is None:
+            print("The GUI exited before showing its window")
+            return
+        times.append(elapsed)
+    print(f"Time to first window: {format_times(times)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import bpy
+
+import ctypes
+import sys
+import traceback
+
+
+FRAME = "OVERNIGHT_BATCH_FRAME"
+FAILED = "OVERNIGHT_BATCH_FAILED"
+
+libc = ctypes.CDLL(None)
+
+
+def flush() -> None:
+    sys.stdout.flush()
+    libc.fflush(None)
+
+
+def parse_frames(argument: str) -> list:
+    frames = []
+    for part in argument.split(","):
+        start, _, end = part.partition("..")
+        frames += range(int(start), int(end or start) + 1)
+    return frames
+
+
+def render_frames(frames: list) -> int:
+    # Every frame is rendered on its own and announced first, so the log
+    # can be split up between the tasks of the batch and a broken frame
+    # doesn't stop the frames after it.
+    returncode = 0
+    for frame in frames:
+        print(f"{FRAME} {frame}")
+        flush()
+        try:
+            bpy.context.scene.frame_set(frame)
+            bpy.ops.render.render(write_still=True)
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
+            print(f"{FAILED} {frame}")
+            returncode = 1
+        flush()
+    return returncode
+
+
+if __name__ == "__main__":
+    sys.exit(render_frames(parse_frames(sys.argv[sys.argv.index("--") + 1])))
@@ -1,15 +1,38 @@
 import bpy
 
-print("\nREADY")
-print(bpy.context.scene.render.engine)
-print(bpy.context.scene.cycles.device)
-print(bpy.context.scene.cycles.samples)
-print(bpy.context.scene.eevee.taa_render_samples)
-print(bpy.context.scene.render.resolution_x)
-print(bpy.context.scene.render.resolution_y)
-print(bpy.context.scene.render.resolution_percentage)
-print(bpy.context.scene.frame_start)
-print(bpy.context.scene.frame_end)
-print(bpy.context.scene.render.image_settings.file_format)
-print(bpy.context.scene.render.filepath)
-print(", ".join([l.name for l in bpy.context.scene.view_layers]))
+import sys
+
+
+def print_file_information() -> None:
+    print("\nREADY")
+    print(bpy.context.scene.render.engine)
+    print(bpy.context.scene.cycles.device)
+    print(bpy.context.scene.cycles.samples)
+    print(bpy.context.scene.eevee.taa_render_samples)
+    print(bpy.context.scene.render.resolution_x)
+    print(bpy.context.scene.render.resolution_y)
+    print(bpy.context.scene.render.resolution_percentage)
+    print(bpy.context.scene.frame_start)
+    print(bpy.context.scene.frame_end)
+    print(bpy.context.scene.render.image_settings.file_format)
+    print(bpy.context.scene.render.filepath)
+    print(", ".join(
+        [layer.name for layer in bpy.context.scene.view_layers]
+    ))
+
+
+def print_batch_information(paths: list) -> None:
+    for path in paths:
+        print(f"\nFILE {path}")
+        try:
+            bpy.ops.wm.open_mainfile(filepath=path)
+        except RuntimeError:
+            continue
+        print_file_information()
+
+
+if __name__ == "__main__":
+    if "--" in sys.argv:
+        print_batch_information(sys.argv[sys.argv.index("--") + 1:])
+    else:
+        print_file_information()
@@ -0,0 +1,390 @@
+import gzip
+import mmap
+import re
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+PRIMITIVES = {
+    "char": "b", "uchar": "B", "short": "h", "ushort": "H", "int": "i",
+    "uint": "I", "float": "f", "double": "d", "int64_t": "q",
+    "uint64_t": "Q", "int8_t": "b", "uint8_t": "B", "int16_t": "h",
+    "uint16_t": "H", "int32_t": "i", "uint32_t": "I", "bool": "?"
+}
+
+IMAGE_TYPES = {
+    0: "TARGA", 1: "IRIS", 4: "JPEG", 14: "TARGA_RAW", 15: "AVI_RAW",
+    16: "AVI_JPEG", 17: "PNG", 20: "BMP", 21: "HDR", 22: "TIFF",
+    23: "OPEN_EXR", 24: "FFMPEG", 26: "CINEON", 27: "DPX",
+    28: "OPEN_EXR_MULTILAYER", 30: "JPEG2000", 35: "WEBP"
+}
+
+IDP_INT = 1
+IDP_GROUP = 6
+
+CYCLES_DEVICES = {0: "CPU", 1: "GPU"}
+
+
+class BlendFileError(Exception):
+    pass
+
+
+class Field:
+    def __init__(
+        self, type_name: str, name: str, offset: int, size: int,
+        pointer: bool, count: int
+    ) -> None:
+        self.type_name = type_name
+        self.name = name
+        self.offset = offset
+        self.size = size
+        self.pointer = pointer
+        self.count = count
+
+
+class Block:
+    def __init__(
+        self, code: bytes, size: int, old: int, sdna_index: int, count: int,
+        offset: int
+    ) -> None:
+        self.code = code
+        self.size = size
+        self.old = old
+        self.sdna_index = sdna_index
+        self.count = count
+        self.offset = offset
+
+
+class BlendFile:
+    def __init__(self, data: Any) -> None:
+        self.data = data
+        self.blocks: List[Block] = []
+        self.blocks_by_address: Dict[int, Block] = {}
+        self.structs: List[Tuple[str, int, Dict[str, Field]]] = []
+        self.struct_indices: Dict[str, int] = {}
+        self.read_header()
+        self.read_blocks()
+
+    def open(path: str) -> "BlendFile":
+        with open(path, "rb") as file:
+            magic = file.read(4)
+            file.seek(0)
+            if magic[:2] == GZIP_MAGIC:
+                with gzip.GzipFile(fileobj=file) as reader:
+                    data = reader.read()
+            elif magic == ZSTD_MAGIC:
+                if zstandard is None:
+                    raise BlendFileError("zstandard is not installed")
+                with zstandard.ZstdDecompressor().stream_reader(
+                    file, read_across_frames=True
+                ) as reader:
+                    data = reader.readall()
+            else:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return BlendFile(data)
+        except BaseException:
+            if isinstance(data, mmap.mmap):
+                data.close()
+            raise
+
+    def read_header(self) -> None:
+        header = bytes(self.data[:17])
+        if not header.startswith(b"BLENDER"):
+            raise BlendFileError("not a .blend file")
+
+        if header[7:9].isdigit():
+            # Blender 5.0+ header: BLENDER17-01v0500
+            self.header_size = int(header[7:9])
+            self.pointer_size = 8
+            self.endian = "<" if header[12:13] == b"v" else ">"
+            self.version = int(header[13:17])
+            self.large_bhead = int(header[10:12]) >= 1
+        else:
+            self.header_size = 12
+            self.pointer_size = 8 if header[7:8] == b"-" else 4
+            self.endian = "<" if header[8:9] == b"v" else ">"
+            self.version = int(header[9:12])
+            self.large_bhead = False
+
+        if self.large_bhead:
+            self.bhead_format = self.endian + "4siQqq"
+        elif self.pointer_size == 8:
+            self.bhead_format = self.endian + "4siQii"
+        else:
+            self.bhead_format = self.endian + "4siIii"
+        self.pointer_format = self.endian \
+            + ("Q" if self.pointer_size == 8 else "I")
+
+    def read_blocks(self) -> None:
+        bhead_size = struct.calcsize(self.bhead_format)
+        offset = self.header_size
+        while offset + bhead_size <= len(self.data):
+            values = struct.unpack_from(self.bhead_format, self.data, offset)
+            if self.large_bhead:
+                code, sdna_index, old, size, count = values
+            else:
+                code, size, old, sdna_index, count = values
+            offset += bhead_size
+            block = Block(code, size, old, sdna_index, count, offset)
+            if code == b"ENDB":
+                break
+            if code == b"DNA1":
+                self.read_sdna(offset)
+            self.blocks.append(block)
+            self.blocks_by_address[old] = block
+            offset += size
+
+        if not self.structs:
+            raise BlendFileError("file has no SDNA")
+
+    def read_sdna(self, offset: int) -> None:
+        def align(position: int) -> int:
+            return offset + ((position - offset + 3) & ~3)
+
+        def read_strings(position: int) -> Tuple[List[str], int]:
+            if bytes(self.data[position:position + 4]) not in \
+                    (b"NAME", b"TYPE"):
+                raise BlendFileError("corrupt SDNA")
+            count = struct.unpack_from(
+                self.endian + "i", self.data, position + 4
+            )[0]
+            position += 8
+            strings = []
+            for _ in range(count):
+                end = self.data.find(b"\0", position)
+                strings.append(
+                    bytes(self.data[position:end]).decode("latin-1")
+                )
+                position = end + 1
+            return strings, align(position)
+
+        position = offset + 4
+        names, position = read_strings(position)
+        types, position = read_strings(position)
+
+        position += 4
+        type_lengths = struct.unpack_from(
+            f"{self.endian}{len(types)}H", self.data, position
+        )
+        position = align(position + 2 * len(types))
+
+        position += 4
+        struct_count = struct.unpack_from(
+            self.endian + "i", self.data, position
+        )[0]
+        position += 4
+        for _ in range(struct_count):
+            type_index, field_count = struct.unpack_from(
+                self.endian + "HH", self.data, position
+            )
+            position += 4
+            fields: Dict[str, Field] = {}
+            field_offset = 0
+            for _ in range(field_count):
+                field_type, field_name = struct.unpack_from(
+                    self.endian + "HH", self.data, position
+                )
+                position += 4
+                field = self.make_field(
+                    types[field_type], type_lengths[field_type],
+                    names[field_name], field_offset
+                )
+                fields[field.name] = field
+                field_offset += field.size
+            self.struct_indices[types[type_index]] = len(self.structs)
+            self.structs.append(
+                (types[type_index], type_lengths[type_index], fields)
+            )
+
+    def make_field(
+        self, type_name: str, type_length: int, name: str, offset: int
+    ) -> Field:
+        count = 1
+        for dimension in re.findall(r"\[(\d+)\]", name):
+            count *= int(dimension)
+        pointer = name.startswith("*") or name.startswith("(*")
+        element_size = self.pointer_size if pointer else type_length
+        clean_name = re.sub(r"[\*\(\)]|\[\d+\]", "", name)
+        return Field(
+            type_name, clean_name, offset, element_size * count, pointer,
+            count
+        )
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def struct_view(
+        self, struct_name: str, offset: int
+    ) -> "StructView":
+        return StructView(self, self.struct_indices[struct_name], offset)
+
+    def block_view(self, block: Block) -> "StructView":
+        return StructView(self, block.sdna_index, block.offset)
+
+    def find_blocks(self, code: bytes) -> List[Block]:
+        return [block for block in self.blocks if block.code == code]
+
+    def deref(self, address: int) -> Optional["StructView"]:
+        block = self.blocks_by_address.get(address)
+        if block is None or address == 0:
+            return None
+        return self.block_view(block)
+
+
+class StructView:
+    def __init__(
+        self, blend_file: BlendFile, struct_index: int, offset: int
+    ) -> None:
+        self.blend_file = blend_file
+        self.struct_index = struct_index
+        self.offset = offset
+
+    def struct_name(self) -> str:
+        return self.blend_file.structs[self.struct_index][0]
+
+    def has(self, name: str) -> bool:
+        return name in self.blend_file.structs[self.struct_index][2]
+
+    def field(self, name: str) -> Field:
+        fields = self.blend_file.structs[self.struct_index][2]
+        if name not in fields:
+            raise BlendFileError(
+                f"{self.struct_name()} has no field {name}"
+            )
+        return fields[name]
+
+    def get(self, name: str) -> Any:
+        blend_file = self.blend_file
+        field = self.field(name)
+        offset = self.offset + field.offset
+
+        if field.pointer:
+            return struct.unpack_from(
+                blend_file.pointer_format, blend_file.data, offset
+            )[0]
+        if field.type_name == "char" and field.count > 1:
+            raw = bytes(blend_file.data[offset:offset + field.size])
+            return raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+        if field.type_name in PRIMITIVES:
+            return struct.unpack_from(
+                blend_file.endian + PRIMITIVES[field.type_name],
+                blend_file.data, offset
+            )[0]
+        return blend_file.struct_view(field.type_name, offset)
+
+    def path(self, path: str) -> Any:
+        value: Any = self
+        for name in path.split("."):
+            value = value.get(name)
+        return value
+
+    def list_items(self, name: str) -> List["StructView"]:
+        items = []
+        item = self.blend_file.deref(self.get(name).get("first"))
+        while item is not None and len(items) < 100000:
+            items.append(item)
+            item = self.blend_file.deref(item.get("next"))
+        return items
+
+
+def id_property_children(
+    id_property: Optional[StructView]
+) -> Dict[str, StructView]:
+    if id_property is None or id_property.get("type") != IDP_GROUP:
+        return {}
+    return {
+        item.get("name"): item
+        for item in id_property.get("data").list_items("group")
+    }
+
+
+def active_scene(blend_file: BlendFile) -> StructView:
+    for block in blend_file.find_blocks(b"GLOB"):
+        scene = blend_file.deref(blend_file.block_view(block).get("curscene"))
+        if scene is not None:
+            return scene
+    scenes = blend_file.find_blocks(b"SC\0\0")
+    if not scenes:
+        raise BlendFileError("file has no scene")
+    return blend_file.block_view(scenes[0])
+
+
+def read_cycles_settings(
+    blend_file: BlendFile, scene: StructView
+) -> Tuple[int, str]:
+    scene_id = scene.get("id")
+    properties = {}
+    for name in ("properties", "system_properties"):
+        if scene_id.has(name):
+            properties.update(id_property_children(
+                blend_file.deref(scene_id.get(name))
+            ))
+
+    # Python-defined properties are only written once they differ from the
+    # add-on's default, which changed from 128 to 4096 samples in 3.0.
+    samples = 4096 if blend_file.version >= 300 else 128
+    device = "CPU"
+    cycles = id_property_children(properties.get("cycles"))
+    if cycles:
+        if "samples" in cycles and cycles["samples"].get("type") == IDP_INT:
+            samples = cycles["samples"].get("data").get("val")
+        if "device" in cycles and cycles["device"].get("type") == IDP_INT:
+            device = CYCLES_DEVICES.get(
+                cycles["device"].get("data").get("val"), "CPU"
+            )
+    return samples, device
+
+
+def read_scene_settings(blend_file: BlendFile) -> Dict[str, Any]:
+    scene = active_scene(blend_file)
+    render = scene.get("r")
+    readers = {
+        "render_engine": lambda: render.get("engine"),
+        "eevee_samples": lambda: scene.path("eevee.taa_render_samples"),
+        "resolution_x": lambda: render.get("xsch"),
+        "resolution_y": lambda: render.get("ysch"),
+        "resolution_percentage": lambda: render.get("size"),
+        "frame_start": lambda: render.get("sfra"),
+        "frame_end": lambda: render.get("efra"),
+        "file_format": lambda: IMAGE_TYPES[render.path("im_format.imtype")],
+        "filepath": lambda: render.get("pic"),
+        "layers": lambda: [
+            layer.get("name") for layer in scene.list_items("view_layers")
+        ]
+    }
+
+    settings: Dict[str, Any] = {}
+    for name, reader in readers.items():
+        try:
+            settings[name] = reader()
+        except (BlendFileError, KeyError, struct.error):
+            pass
+    try:
+        settings["cycles_samples"], settings["render_device"] = \
+            read_cycles_settings(blend_file, scene)
+    except (BlendFileError, KeyError, struct.error):
+        pass
+    return settings
+
+
+def read_blend_file_settings(path: str) -> Dict[str, Any]:
+    try:
+        blend_file = BlendFile.open(path)
+    except (BlendFileError, OSError, EOFError, ValueError, struct.error):
+        return {}
+    try:
+        return read_scene_settings(blend_file)
+    except (BlendFileError, KeyError, ValueError, struct.error):
+        return {}
+    finally:
+        blend_file.close()
@@ -0,0 +1,87 @@
+import bpy
+
+import ctypes
+import json
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batch_render import render_frames  # noqa: E402
+from blend_file_information import print_file_information  # noqa: E402
+
+
+READY = "OVERNIGHT_WORKER_READY"
+DONE = "OVERNIGHT_WORKER_DONE"
+
+libc = ctypes.CDLL(None)
+
+
+def flush() -> None:
+    # Blender writes its render log with C stdio, Python has its own
+    # buffer, so both have to be flushed before a job counts as done.
+    sys.stdout.flush()
+    libc.fflush(None)
+
+
+def apply_settings(job: dict) -> None:
+    bpy.ops.wm.open_mainfile(filepath=job["blend_file"])
+    scene = bpy.context.scene
+    scene.render.engine = job["render_engine"]
+    scene.render.filepath = job["output_file"]
+    if job["output_format"] is not None:
+        scene.render.image_settings.file_format = job["output_format"]
+    if job["threads"] > 0:
+        scene.render.threads_mode = "FIXED"
+        scene.render.threads = job["threads"]
+    else:
+        scene.render.threads_mode = "AUTO"
+    exec(job["python_expressions"], {"bpy": bpy})
+
+
+def render(job: dict) -> None:
+    apply_settings(job)
+    scene = bpy.context.scene
+    if job["animation"]:
+        for start_frame, end_frame in job["frames"]:
+            scene.frame_start = start_frame
+            scene.frame_end = end_frame
+            bpy.ops.render.render(animation=True)
+    else:
+        scene.frame_set(job["frames"][0][0])
+        bpy.ops.render.render(write_still=True)
+
+
+def run_job(job: dict) -> int:
+    try:
+        if job["type"] == "render":
+            render(job)
+        elif job["type"] == "batch":
+            apply_settings(job)
+            return render_frames([
+                frame for start_frame, end_frame in job["frames"]
+                for frame in range(start_frame, end_frame + 1)
+            ])
+        elif job["type"] == "info":
+            bpy.ops.wm.open_mainfile(filepath=job["blend_file"])
+            print_file_information()
+        return 0
+    except Exception:
+        traceback.print_exc(file=sys.stdout)
+        return 1
+
+
+def main() -> None:
+    print(READY)
+    flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        returncode = run_job(json.loads(line))
+        flush()
+        print(f"{DONE} {returncode}")
+        flush()
+
+
+main()
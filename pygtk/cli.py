@@ -0,0 +1,646 @@
+#!/bin/python3
+
+import argparse
+import datetime
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import toml
+import trio
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CONFIG_DIR, Config, default_settings
+from deadline import DeadlinePlanner, parse_finish_time
+from eta import EtaPredictor
+from render_history import RenderHistory
+from resource_sampler import ResourceSampler
+from memory_guard import MemoryGuard
+from cpu_topology import CpuAllocator, format_cpu_list, parse_cpu_list
+from process_control import watch_user_activity
+from render_farm import DEFAULT_PORT, STALL_TIMEOUT, Coordinator, \
+    FarmWorker
+from render_info import RenderInfo
+from render_log import MIB, START, RenderLogs, read_frame, read_frames
+from render_task import RenderTask
+from renderer import Renderer, post_rendering_command
+from scheduler import Scheduler
+from task_queue import TaskQueue
+
+
+SETTINGS_PATH = os.path.join(CONFIG_DIR, "settings.toml")
+
+
+def load_queue(path: str) -> Tuple[List[RenderTask], Dict[str, Any]]:
+    data = toml.load(path)
+    queue_dir = os.path.dirname(os.path.abspath(path))
+    render_queue = []
+    for entry in data.get("task", []):
+        entry["blend_file"] = os.path.join(queue_dir, entry["blend_file"])
+        entry["output_file"] = os.path.join(queue_dir, entry["output_file"])
+        render_queue.append(RenderTask.from_dict(entry))
+    return render_queue, data
+
+
+def load_config() -> Config:
+    try:
+        return Config.create_from_file(SETTINGS_PATH)
+    except IOError:
+        return Config(default_settings(""))
+
+
+class HeadlessRunner:
+    def __init__(
+        self, config: Config, render_queue: List[RenderTask],
+        status_file: Optional[str], verbose: bool
+    ) -> None:
+        self.config = config
+        self.render_queue = render_queue
+        self.status_file = status_file
+        self.verbose = verbose
+        self.progress: Dict[RenderTask, float] = {}
+        self.status_written = 0.0
+        self.scheduler: Optional[Scheduler] = None
+        self.task_queue = TaskQueue()
+        for render_task in render_queue:
+            self.task_queue.add(render_task)
+        render_history = RenderHistory.open_default()
+        self.eta_predictor = EtaPredictor(render_history)
+        self.deadline_planner = DeadlinePlanner(
+            self.eta_predictor, config.settings["deadline_min_samples"],
+            config.settings["deadline_min_resolution"]
+        )
+        self.resource_sampler = ResourceSampler(
+            config.settings["resource_sample_interval"],
+            lambda render_task: self.renderer.task_pids.get(render_task, [])
+        )
+        self.memory_guard = MemoryGuard(
+            render_history, self.resource_sampler.current_rss,
+            config.settings["memory_limit"]
+        )
+        self.memory_guard.limit_swap = config.settings["memory_limit_swap"]
+        self.renderer = Renderer(
+            config, self.on_render_info, self.update_progress,
+            self.on_render_resumed, self.on_frame_saved
+        )
+        self.renderer.memory_guard = self.memory_guard
+        self.render_logs = RenderLogs.open_default()
+        self.renderer.render_logs = self.render_logs
+
+    def on_render_info(
+        self, render_task: RenderTask, info: RenderInfo
+    ) -> None:
+        if self.verbose:
+            print(f"{os.path.basename(render_task.blend_file)}: {info}")
+
+    def on_render_resumed(
+        self, render_task: RenderTask, done_frames: int, total_frames: int
+    ) -> None:
+        print(
+            f"{os.path.basename(render_task.blend_file)}: {done_frames} of "
+            f"{total_frames} frames already done",
+            flush=True
+        )
+
+    def on_frame_saved(
+        self, render_task: RenderTask, path: str, frame_started: float
+    ) -> None:
+        self.eta_predictor.frame_saved(
+            render_task, frame_started, trio.current_time()
+        )
+
+    def update_progress(
+        self, render_task: RenderTask, progress: float
+    ) -> None:
+        previous = self.progress.get(render_task, -1)
+        self.progress[render_task] = progress
+        self.eta_predictor.update_progress(render_task, progress)
+        if int(progress) != int(previous):
+            print(
+                f"[{int(progress):3d}%] "
+                f"{os.path.basename(render_task.blend_file)}",
+                flush=True
+            )
+        if trio.current_time() - self.status_written >= 1:
+            self.write_status()
+
+    def write_status(self) -> None:
+        if self.status_file is None:
+            return
+        self.status_written = trio.current_time()
+        running = self.scheduler.running if self.scheduler else {}
+        now = trio.current_time()
+        slots = self.scheduler.slots if self.scheduler else 1
+        remaining, unknown = self.eta_predictor.queue_remaining(
+            self.render_queue, slots, now
+        )
+        status = {
+            "remaining": remaining,
+            "tasks_without_estimate": unknown,
+            "tasks": [
+                {
+                    "blend_file": render_task.blend_file,
+                    "output_file": render_task.output_file,
+                    "progress": self.progress.get(render_task, 0),
+                    "remaining": self.eta_predictor.task_remaining(
+                        render_task, now
+                    ),
+                    "resources": self.resource_sampler.series[render_task]
+                    .summary() if render_task in self.resource_sampler.series
+                    else "",
+                    "state": self.task_queue.state(render_task),
+                    "samples": render_task.effective_samples(),
+                    "resolution_percentage":
+                        render_task.effective_resolution_percentage(),
+                    "running": render_task in running,
+                    "paused": render_task in running
+                    and self.renderer.task_paused(render_task),
+                    "priority": self.renderer.task_priority(render_task),
+                    "log": self.render_logs.path(render_task) + ".gz",
+                    "waiting_for_memory": self.scheduler is not None
+                    and render_task in self.scheduler.held,
+                    "finished": render_task.finished
+                }
+                for render_task in self.render_queue
+            ]
+        }
+        temp_file = f"{self.status_file}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(status, file, indent=2)
+        os.replace(temp_file, self.status_file)
+
+    async def render(
+        self, render_tasks: List[RenderTask], threads: int,
+        cpus: Optional[List[int]]
+    ) -> None:
+        plan = self.deadline_planner.start_tasks(
+            render_tasks, self.render_queue, self.task_queue,
+            self.scheduler.running, self.scheduler.slots,
+            trio.current_time()
+        )
+        if self.deadline_planner.finish_time is not None:
+            print(f"Finish by {time_of_day(self.deadline_planner.finish_time)}"
+                  f": {plan.describe()}", flush=True)
+        for render_task in render_tasks:
+            print(f"Rendering {render_task.blend_file}", flush=True)
+            if self.verbose:
+                print(f"  {threads} threads on CPUs "
+                      f"{format_cpu_list(cpus) if cpus else 'any'}",
+                      flush=True)
+            if render_task.deadline_samples is not None:
+                print(f"  {render_task.effective_samples()} samples at "
+                      f"{render_task.effective_resolution_percentage()} % "
+                      "resolution", flush=True)
+            self.eta_predictor.start_task(render_task, trio.current_time())
+            if self.renderer.task_paused(render_task):
+                self.eta_predictor.pause_task(
+                    render_task, trio.current_time()
+                )
+        await self.renderer.render_batch(
+            render_tasks, threads, self.finish_render, cpus
+        )
+
+    def finish_render(
+        self, render_task: RenderTask, image_path: Optional[str]
+    ) -> None:
+        self.memory_guard.record_peak(
+            render_task, self.renderer.peak_memory(
+                render_task, self.resource_sampler.peak_rss(render_task)
+            )
+        )
+        export_path = self.resource_sampler.finish_task(
+            render_task, self.config.settings["resource_export"],
+            self.config.settings["resource_export_dir"]
+        )
+        if export_path is not None:
+            print(f"Resource usage written to {export_path}", flush=True)
+        render_task.finished = True
+        self.eta_predictor.finish_task(render_task)
+        self.update_progress(render_task, 100)
+        self.write_status()
+
+    async def run(self, slots: int, thread_budget: int) -> None:
+        self.scheduler = Scheduler(
+            slots, thread_budget,
+            self.memory_guard
+            if self.config.settings["memory_admission"] else None,
+            self.config.settings["batch_tasks"],
+            CpuAllocator.read() if self.config.settings["pin_cpus"] else None
+        )
+        self.renderer.yield_mode = self.config.settings["yield_to_users"]
+        self.render_logs.cleanup(
+            self.config.settings["log_max_size"] * MIB,
+            self.config.settings["log_max_age"] * 24 * 60 * 60
+        )
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(self.watch_signals, nursery.cancel_scope)
+            nursery.start_soon(
+                self.resource_sampler.run,
+                lambda: list(self.scheduler.running)
+            )
+            if self.renderer.yield_mode != "off":
+                nursery.start_soon(
+                    watch_user_activity, self.on_user_activity
+                )
+            await self.scheduler.run(self.task_queue, self.render)
+            nursery.cancel_scope.cancel()
+        self.report_blocked()
+        self.write_status()
+
+    def report_blocked(self) -> None:
+        for render_task in self.task_queue.blocked():
+            print(f"{os.path.basename(render_task.blend_file)} was not "
+                  "rendered, its dependencies never finished", flush=True)
+
+    async def coordinate(
+        self, host: str, port: int, chunk_frames: int, stall_timeout: float
+    ) -> None:
+        coordinator = Coordinator(
+            self.config, self.task_queue, chunk_frames,
+            self.on_render_info, self.update_progress, self.on_task_finished,
+            stall_timeout
+        )
+        await coordinator.run(host, port)
+        self.report_blocked()
+        self.write_status()
+
+    def on_task_finished(self, render_task: RenderTask) -> None:
+        self.eta_predictor.finish_task(render_task)
+        self.update_progress(render_task, 100)
+        self.write_status()
+
+    def on_user_activity(self, users_active: bool) -> None:
+        if users_active:
+            print("Someone is using the machine, yielding to them",
+                  flush=True)
+        else:
+            print("The machine is idle, rendering at full speed", flush=True)
+        if not self.renderer.set_users_active(users_active):
+            print("Only root can raise the priority of running renders "
+                  "again, renders started from now on use normal priority",
+                  flush=True)
+        self.update_paused_tasks()
+
+    def update_paused_tasks(self) -> None:
+        now = trio.current_time()
+        for render_task in list(self.renderer.task_pids):
+            if self.renderer.task_paused(render_task):
+                self.eta_predictor.pause_task(render_task, now)
+            else:
+                self.eta_predictor.resume_task(render_task, now)
+        self.write_status()
+
+    async def watch_signals(self, cancel_scope: trio.CancelScope) -> None:
+        # SIGUSR1 pauses the running renders and SIGUSR2 resumes them.
+        with trio.open_signal_receiver(
+            signal.SIGTERM, signal.SIGINT, signal.SIGUSR1, signal.SIGUSR2
+        ) as signals:
+            async for signal_number in signals:
+                if signal_number in (signal.SIGUSR1, signal.SIGUSR2):
+                    paused = signal_number == signal.SIGUSR1
+                    print("Pausing renders..." if paused
+                          else "Resuming renders...", flush=True)
+                    for render_task in list(self.renderer.task_pids):
+                        if paused:
+                            self.renderer.pause(render_task)
+                        else:
+                            self.renderer.resume(render_task)
+                    self.update_paused_tasks()
+                    continue
+                print("Stopping renders...", flush=True)
+                await self.renderer.terminate()
+                cancel_scope.cancel()
+                return
+
+
+def time_of_day(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M")
+
+
+async def post_rendering(action: str, timer: int) -> None:
+    command = post_rendering_command(action)
+    if command is None:
+        return
+    for i in range(timer):
+        print(f"{action} in {timer - i} s", flush=True)
+        await trio.sleep(1)
+    subprocess.run(command)
+
+
+def check_cpus(render_queue: List[RenderTask]) -> bool:
+    for render_task in render_queue:
+        try:
+            parse_cpu_list(render_task.cpus)
+        except ValueError:
+            print(f"Invalid CPUs {render_task.cpus} for "
+                  f"{render_task.blend_file}, expected e.g. 0-7,16-23",
+                  file=sys.stderr)
+            return False
+    return True
+
+
+async def run(args: argparse.Namespace) -> int:
+    config = load_config()
+    render_queue, queue_data = load_queue(args.queue)
+    if not check_cpus(render_queue):
+        return 2
+    try:
+        runner = HeadlessRunner(config, render_queue, args.status_file,
+                                args.verbose)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finish_by = args.finish_by or queue_data.get("finish_by")
+    if finish_by:
+        try:
+            runner.deadline_planner.finish_time = parse_finish_time(
+                finish_by, datetime.datetime.now()
+            )
+        except ValueError:
+            print(f"Invalid finish time {finish_by}, expected HH:MM",
+                  file=sys.stderr)
+            return 2
+    await runner.run(
+        args.slots or config.settings["parallel_slots"],
+        args.threads or config.settings["thread_budget"]
+    )
+
+    if not all(render_task.finished for render_task in render_queue):
+        return 1
+
+    print("Rendering complete!", flush=True)
+    action = args.post_rendering \
+        or queue_data.get("post_rendering", "Do nothing")
+    await post_rendering(action, config.settings["post_rendering_timer"])
+    return 0
+
+
+def partition_tasks(
+    render_task: RenderTask, frames: int, parts: int, output_dir: str
+) -> List[RenderTask]:
+    render_tasks = []
+    start_frame = render_task.start_frame
+    for i in range(parts):
+        end_frame = render_task.start_frame + frames * (i + 1) // parts - 1
+        if end_frame < start_frame:
+            continue
+        entry = render_task.to_dict()
+        entry.update({
+            "output_type": "Animation", "start_frame": start_frame,
+            "end_frame": end_frame,
+            "output_file": os.path.join(output_dir, "frame_"),
+            "finished": False, "chunk_workers": 1, "resume": False,
+            "task_id": None, "dependencies": [], "threads": 0, "cpus": ""
+        })
+        render_tasks.append(RenderTask.from_dict(entry))
+        start_frame = end_frame + 1
+    return render_tasks
+
+
+async def render_partition(
+    config: Config, render_tasks: List[RenderTask], thread_budget: int,
+    pin_cpus: bool
+) -> float:
+    renderer = Renderer(
+        config, lambda render_task, info: None,
+        lambda render_task, progress: None
+    )
+    task_queue = TaskQueue()
+    for render_task in render_tasks:
+        task_queue.add(render_task)
+    scheduler = Scheduler(
+        len(render_tasks), thread_budget, None, False,
+        CpuAllocator.read() if pin_cpus else None
+    )
+
+    def finish(render_task: RenderTask, image_path: Optional[str]) -> None:
+        render_task.finished = True
+
+    async def render(
+        render_tasks: List[RenderTask], threads: int,
+        cpus: Optional[List[int]]
+    ) -> None:
+        print(f"  frames {render_tasks[0].start_frame}-"
+              f"{render_tasks[0].end_frame}: {threads} threads on CPUs "
+              f"{format_cpu_list(cpus) if cpus else 'any'}", flush=True)
+        await renderer.render_batch(render_tasks, threads, finish, cpus)
+
+    start = trio.current_time()
+    try:
+        await scheduler.run(task_queue, render)
+    finally:
+        with trio.CancelScope(shield=True):
+            await renderer.terminate()
+    return trio.current_time() - start
+
+
+async def benchmark(args: argparse.Namespace) -> int:
+    config = load_config()
+    render_queue, _ = load_queue(args.queue)
+    if not render_queue:
+        print("The queue file has no tasks", file=sys.stderr)
+        return 2
+    # The first task is rendered with the machine split into a different
+    # number of parts every time, always the same frames.
+    thread_budget = args.threads or config.settings["thread_budget"]
+    results = []
+    for parts in args.partitions:
+        print(f"{parts} parallel renders", flush=True)
+        with tempfile.TemporaryDirectory() as output_dir:
+            seconds = await render_partition(
+                config,
+                partition_tasks(
+                    render_queue[0], args.frames, parts, output_dir
+                ),
+                thread_budget, not args.no_pinning
+            )
+        results.append((parts, seconds))
+
+    print(f"{'renders':>8}{'threads':>10}{'seconds':>10}{'frames/h':>10}")
+    for parts, seconds in results:
+        print(f"{parts:>8}{max(1, thread_budget // parts):>10}"
+              f"{seconds:>10.1f}{args.frames / seconds * 3600:>10.0f}")
+    return 0
+
+
+async def show_log(args: argparse.Namespace) -> int:
+    path = args.log
+    if path.endswith(".gz"):
+        path = path[:-len(".gz")]
+    elif not path.endswith(".log"):
+        path = os.path.join(
+            RenderLogs.open_default().directory, f"{path}.log"
+        )
+    frames = read_frames(path)
+    if not frames:
+        print(f"No log at {path}.gz", file=sys.stderr)
+        return 1
+    if args.frame is None:
+        print(" ".join("start" if frame == START else frame
+                       for frame in frames))
+        return 0
+    frame = START if args.frame == "start" else args.frame
+    if frame not in frames:
+        print(f"Frame {args.frame} isn't in the log", file=sys.stderr)
+        return 1
+    sys.stdout.write(read_frame(path, frame))
+    return 0
+
+
+async def coordinate(args: argparse.Namespace) -> int:
+    config = load_config()
+    render_queue, queue_data = load_queue(args.queue)
+    try:
+        runner = HeadlessRunner(config, render_queue, args.status_file,
+                                args.verbose)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    await runner.coordinate(
+        args.host, args.port, args.chunk_frames, args.stall_timeout
+    )
+    if not all(render_task.finished for render_task in render_queue):
+        return 1
+
+    print("Rendering complete!", flush=True)
+    action = args.post_rendering \
+        or queue_data.get("post_rendering", "Do nothing")
+    await post_rendering(action, config.settings["post_rendering_timer"])
+    return 0
+
+
+async def work(args: argparse.Namespace) -> int:
+    worker = FarmWorker(
+        args.host, args.port, args.threads, args.name, args.give_up_after
+    )
+    return 0 if await worker.run() else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="overnight-renderer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="render a queue file without the GUI"
+    )
+    run_parser.add_argument("queue", help="queue file in TOML format")
+    run_parser.add_argument(
+        "--status-file", help="write the queue state as JSON to this file"
+    )
+    run_parser.add_argument(
+        "--slots", type=int, help="number of tasks to render in parallel"
+    )
+    run_parser.add_argument(
+        "--threads", type=int, help="total number of render threads"
+    )
+    run_parser.add_argument(
+        "--post-rendering", choices=["Do nothing", "Suspend", "Shutdown"]
+    )
+    run_parser.add_argument(
+        "--finish-by", metavar="HH:MM",
+        help="lower samples and resolution where needed to finish the "
+        "queue by this time"
+    )
+    run_parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="print the parsed render information of every log line"
+    )
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark", help="compare the throughput of splitting the machine "
+        "between different numbers of parallel renders"
+    )
+    benchmark_parser.add_argument(
+        "queue", help="queue file in TOML format, its first task is rendered"
+    )
+    benchmark_parser.add_argument(
+        "--frames", type=int, default=8,
+        help="number of frames to render with every partition"
+    )
+    benchmark_parser.add_argument(
+        "--partitions", type=int, nargs="+", default=[1, 2, 4],
+        help="numbers of parallel renders to compare"
+    )
+    benchmark_parser.add_argument(
+        "--threads", type=int, help="total number of render threads"
+    )
+    benchmark_parser.add_argument(
+        "--no-pinning", action="store_true",
+        help="let the OS place the render threads instead of giving every "
+        "render its own CPUs"
+    )
+
+    show_log_parser = subparsers.add_parser(
+        "log", help="print the Blender log of a task, one frame at a time"
+    )
+    show_log_parser.add_argument(
+        "log", help="task ID or log file, as in the status file"
+    )
+    show_log_parser.add_argument(
+        "--frame", help="frame to print, \"start\" for the lines before "
+        "the first frame, lists the logged frames if left out"
+    )
+
+    coordinator_parser = subparsers.add_parser(
+        "coordinator", help="hand out the tasks of a queue file to workers"
+    )
+    coordinator_parser.add_argument("queue", help="queue file in TOML format")
+    coordinator_parser.add_argument(
+        "--host", default="0.0.0.0", help="address to listen on"
+    )
+    coordinator_parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="port to listen on"
+    )
+    coordinator_parser.add_argument(
+        "--chunk-frames", type=int, default=10,
+        help="number of frames a worker renders at once"
+    )
+    coordinator_parser.add_argument(
+        "--stall-timeout", type=float, default=STALL_TIMEOUT,
+        help="seconds without log output after which a job is handed to "
+        "another worker"
+    )
+    coordinator_parser.add_argument(
+        "--status-file", help="write the queue state as JSON to this file"
+    )
+    coordinator_parser.add_argument(
+        "--post-rendering", choices=["Do nothing", "Suspend", "Shutdown"]
+    )
+    coordinator_parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="print the parsed render information of every log line"
+    )
+
+    worker_parser = subparsers.add_parser(
+        "worker", help="render jobs handed out by a coordinator"
+    )
+    worker_parser.add_argument("host", help="address of the coordinator")
+    worker_parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT,
+        help="port of the coordinator"
+    )
+    worker_parser.add_argument(
+        "--threads", type=int, default=0,
+        help="number of render threads, 0 to use all cores"
+    )
+    worker_parser.add_argument(
+        "--name", help="name shown by the coordinator, defaults to the host"
+    )
+    worker_parser.add_argument(
+        "--give-up-after", type=float, default=600, metavar="SECONDS",
+        help="stop when the coordinator can't be reached for this long, "
+        "0 to keep trying"
+    )
+
+    args = parser.parse_args()
+    commands = {
+        "run": run, "benchmark": benchmark, "log": show_log,
+        "coordinator": coordinate, "worker": work
+    }
+    sys.exit(trio.run(commands[args.command], args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,62 @@
-import gi
-
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk  # noqa: E402
-
-import toml  # noqa: E402
-import subprocess  # noqa: E402
-
-from typing import Any, Dict  # noqa: E402
-from widgets import create_label, create_file_chooser_button, \
-    create_tree_view, create_spin_button  # noqa: E402
-
-
-class Config:
-    def __init__(self, settings: Dict[Any, Any]) -> None:
-        self.settings = settings
-
-    def create_new() -> "Config":
-        config_dir = ""
-        with subprocess.Popen(
+import os
+import re
+import toml
+import subprocess
+
+from typing import Any, Dict, List
+
+
+CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"),
+    "overnight-renderer"
+)
+VERSION_PATTERN = re.compile(r"^([0-9]+)\.([0-9]+)$")
+
+
+def data_path(name: str) -> str:
+    # The queue, caches, history and logs are kept out of the source tree.
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+def blender_config_roots() -> List[str]:
+    config_home = os.environ.get("XDG_CONFIG_HOME") \
+        or os.path.expanduser("~/.config")
+    roots = [
+        os.path.join(config_home, "blender"),
+        os.path.expanduser("~/Library/Application Support/Blender")
+    ]
+    if "APPDATA" in os.environ:
+        roots.append(os.path.join(
+            os.environ["APPDATA"], "Blender Foundation", "Blender"
+        ))
+    return roots
+
+
+def find_blender_config() -> str:
+    if os.environ.get("BLENDER_USER_CONFIG"):
+        return os.environ["BLENDER_USER_CONFIG"]
+    # Blender keeps one directory per version, the newest one belongs to
+    # the installed Blender in almost every case.
+    versions = []
+    for root in blender_config_roots():
+        try:
+            names = os.listdir(root)
+        except OSError:
+            continue
+        for name in names:
+            m = VERSION_PATTERN.match(name)
+            path = os.path.join(root, name, "config")
+            if m is not None and os.path.isdir(path):
+                versions.append(((int(m.group(1)), int(m.group(2))), path))
+    return max(versions)[1] if versions else ""
+
+
+def query_blender_config() -> str:
+    config_dir = ""
+    try:
+        process = subprocess.Popen(
             [
                 "blender",
                 "-b",
@@ -27,61 +66,95 @@ class Config:
                 + "print(bpy.utils.user_resource('CONFIG'))"
             ],
             stdout=subprocess.PIPE
-        ) as process:
-            output = process.stdout
-            finished = False
-            for raw_line in output:
-                line = raw_line.strip().decode("utf-8")
-                if line == "config_dir":
-                    finished = True
-                elif finished:
-                    config_dir = line
-                    break
-
-        settings = {
-            "blender_config": config_dir,
-            "default_blender_dir": "",
-            "default_output_dir": "",
-            "post_rendering_timer": 30,
-            "render_info": [
-                {
-                    "name": "frame",
-                    "display_name": "Frame",
-                    "visible": True
-                },
-                {
-                    "name": "time",
-                    "display_name": "Time",
-                    "visible": True
-                },
-                {
-                    "name": "remaining",
-                    "display_name": "Remaining Time",
-                    "visible": True
-                },
-                {
-                    "name": "mem",
-                    "display_name": "Memory",
-                    "visible": True
-                },
-                {
-                    "name": "layer",
-                    "display_name": "Scene, Layer",
-                    "visible": True
-                },
-                {
-                    "name": "status",
-                    "display_name": "Status",
-                    "visible": True
-                }
-            ]
-        }
+        )
+    except OSError:
+        return config_dir
+    with process:
+        output = process.stdout
+        finished = False
+        for raw_line in output:
+            line = raw_line.strip().decode("utf-8")
+            if line == "config_dir":
+                finished = True
+            elif finished:
+                config_dir = line
+                break
+    return config_dir
+
+
+def default_settings(blender_config: str) -> Dict[Any, Any]:
+    return {
+        "blender_config": blender_config,
+        "default_blender_dir": "",
+        "default_output_dir": "",
+        "post_rendering_timer": 30,
+        "parallel_slots": 1,
+        "thread_budget": os.cpu_count() or 1,
+        "persistent_workers": False,
+        "worker_max_jobs": 20,
+        "worker_max_memory": 8192,
+        "file_index_poll_interval": 300,
+        "ui_update_rate": 10,
+        "resume_queue_on_startup": True,
+        "resource_sample_interval": 2,
+        "resource_export": "None",
+        "resource_export_dir": "",
+        "memory_admission": True,
+        "memory_limit": "off",
+        "memory_limit_swap": False,
+        "batch_tasks": True,
+        "pin_cpus": True,
+        "deadline_min_samples": 25,
+        "deadline_min_resolution": 50,
+        "yield_to_users": "off",
+        "log_max_size": 1024,
+        "log_max_age": 30,
+        "render_info": [
+            {
+                "name": "frame",
+                "display_name": "Frame",
+                "visible": True
+            },
+            {
+                "name": "time",
+                "display_name": "Time",
+                "visible": True
+            },
+            {
+                "name": "remaining",
+                "display_name": "Remaining Time",
+                "visible": True
+            },
+            {
+                "name": "mem",
+                "display_name": "Memory",
+                "visible": True
+            },
+            {
+                "name": "layer",
+                "display_name": "Scene, Layer",
+                "visible": True
+            },
+            {
+                "name": "status",
+                "display_name": "Status",
+                "visible": True
+            }
+        ]
+    }
 
-        return Config(settings)
+
+class Config:
+    def __init__(self, settings: Dict[Any, Any]) -> None:
+        self.settings = settings
+
+    def create_new() -> "Config":
+        return Config(default_settings(find_blender_config()))
 
     def create_from_file(path: str) -> "Config":
         data = open(path, "r").read()
-        settings = toml.loads(data)
+        settings = default_settings("")
+        settings.update(toml.loads(data))
         return Config(settings)
 
     def modify(self, settings) -> "Config":
@@ -92,115 +165,3 @@ class Config:
         file = open("settings.toml", "w")
         file.write(toml.dumps(self.settings))
         file.close()
-
-
-class ConfigDialog(Gtk.Dialog):
-    blender_config_chooser_button: Gtk.FileChooserButton = None
-    default_dir_chooser_button: Gtk.FileChooserButton = None
-    output_dir_chooser_button: Gtk.FileChooserButton = None
-    post_rendering_spin: Gtk.SpinButton = None
-    render_info_store: Gtk.ListStore = None
-    render_info_tree_view: Gtk.TreeView = None
-
-    def __init__(self, config) -> None:
-        super(ConfigDialog, self).__init__()
-        self.set_title("Settings")
-        self.set_border_width(20)
-        self.set_position(Gtk.WindowPosition.CENTER)
-
-        self.config = config
-
-        self.create_content()
-
-    def create_content(self) -> None:
-        header_bar = Gtk.HeaderBar(title="Settings")
-        header_bar.set_show_close_button(True)
-        header_bar.set_decoration_layout(":close")
-
-        blender_config_label = create_label("Blender Config Directory")
-        self.blender_config_chooser_button = create_file_chooser_button(
-            self, "Select Blender config directory",
-            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
-        )
-        self.blender_config_chooser_button.set_filename(
-            self.config.settings["blender_config"]
-        )
-
-        default_dir_label = create_label("Default Blender Project Directory")
-        self.default_dir_chooser_button = create_file_chooser_button(
-            self, "Select default Blender project directory",
-            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
-        )
-        self.default_dir_chooser_button.set_filename(
-            self.config.settings["default_blender_dir"]
-        )
-
-        output_dir_label = create_label("Default Output Directory")
-        self.output_dir_chooser_button = create_file_chooser_button(
-            self, "Select default output directory",
-            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
-        )
-        self.output_dir_chooser_button.set_filename(
-            self.config.settings["default_output_dir"]
-        )
-
-        post_rendering_label = create_label("Post Rendering Timer")
-        self.post_rendering_spin = create_spin_button(
-            self.config.settings["post_rendering_timer"], 0, 600
-        )
-        self.post_rendering_spin.connect("output", self.on_output)
-
-        render_info_label = create_label("Render Information (Cycles only)")
-        self.render_info_store = Gtk.ListStore(str, bool, str)
-        for i in range(6):
-            self.render_info_store.append(
-                [
-                    self.config.settings["render_info"][i]["display_name"],
-                    self.config.settings["render_info"][i]["visible"],
-                    self.config.settings["render_info"][i]["name"]
-                ]
-            )
-        self.render_info_tree_view = create_tree_view(
-            self.render_info_store, ["Category"]
-        )
-        self.render_info_tree_view.set_reorderable(True)
-        visible_toggle_renderer = Gtk.CellRendererToggle()
-        visible_toggle_renderer.connect("toggled", self.on_cell_toggled)
-        visible_toggle_column = Gtk.TreeViewColumn(
-            "Visible", visible_toggle_renderer, active=1
-        )
-        self.render_info_tree_view.append_column(visible_toggle_column)
-
-        grid = Gtk.Grid(column_spacing=12, row_spacing=12)
-        grid.set_halign(Gtk.Align.CENTER)
-        grid.set_valign(Gtk.Align.CENTER)
-
-        grid.attach(blender_config_label, 0, 0, 1, 1)
-        grid.attach(self.blender_config_chooser_button, 1, 0, 1, 1)
-        grid.attach(default_dir_label, 0, 1, 1, 1)
-        grid.attach(self.default_dir_chooser_button, 1, 1, 1, 1)
-        grid.attach(output_dir_label, 0, 2, 1, 1)
-        grid.attach(self.output_dir_chooser_button, 1, 2, 1, 1)
-        grid.attach(post_rendering_label, 0, 4, 1, 1)
-        grid.attach(self.post_rendering_spin, 1, 4, 1, 1)
-        grid.attach(render_info_label, 0, 5, 1, 1)
-        grid.attach(self.render_info_tree_view, 1, 5, 1, 1)
-
-        self.set_titlebar(header_bar)
-        self.get_content_area().add(grid)
-
-        self.add_buttons(
-            Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL,
-            Gtk.STOCK_APPLY, Gtk.ResponseType.APPLY
-        )
-
-        self.show_all()
-
-    def on_cell_toggled(
-        self, cell_renderer_toggle: Gtk.CellRendererToggle, path: str
-    ) -> None:
-        self.render_info_store[path][1] = not self.render_info_store[path][1]
-
-    def on_output(self, spin_button: Gtk.SpinButton) -> bool:
-        spin_button.set_text(f"{spin_button.get_value_as_int()} s")
-        return True
@@ -0,0 +1,346 @@
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk  # noqa: E402
+
+from widgets import create_label, create_file_chooser_button, \
+    create_tree_view, create_spin_button, create_combo_box  # noqa: E402
+
+
+class ConfigDialog(Gtk.Dialog):
+    blender_config_chooser_button: Gtk.FileChooserButton = None
+    default_dir_chooser_button: Gtk.FileChooserButton = None
+    output_dir_chooser_button: Gtk.FileChooserButton = None
+    post_rendering_spin: Gtk.SpinButton = None
+    parallel_slots_spin: Gtk.SpinButton = None
+    thread_budget_spin: Gtk.SpinButton = None
+    persistent_workers_switch: Gtk.Switch = None
+    worker_max_jobs_spin: Gtk.SpinButton = None
+    worker_max_memory_spin: Gtk.SpinButton = None
+    ui_update_rate_spin: Gtk.SpinButton = None
+    resume_queue_switch: Gtk.Switch = None
+    resource_interval_spin: Gtk.SpinButton = None
+    resource_export_combo_box: Gtk.ComboBox = None
+    resource_export_dir_chooser_button: Gtk.FileChooserButton = None
+    memory_admission_switch: Gtk.Switch = None
+    memory_limit_combo_box: Gtk.ComboBox = None
+    memory_limit_swap_switch: Gtk.Switch = None
+    batch_tasks_switch: Gtk.Switch = None
+    deadline_min_samples_spin: Gtk.SpinButton = None
+    deadline_min_resolution_spin: Gtk.SpinButton = None
+    yield_to_users_combo_box: Gtk.ComboBox = None
+    pin_cpus_switch: Gtk.Switch = None
+    log_max_size_spin: Gtk.SpinButton = None
+    log_max_age_spin: Gtk.SpinButton = None
+    render_info_store: Gtk.ListStore = None
+    render_info_tree_view: Gtk.TreeView = None
+
+    def __init__(self, config) -> None:
+        super(ConfigDialog, self).__init__()
+        self.set_title("Settings")
+        self.set_border_width(20)
+        self.set_position(Gtk.WindowPosition.CENTER)
+
+        self.config = config
+
+        self.create_content()
+
+    def create_content(self) -> None:
+        header_bar = Gtk.HeaderBar(title="Settings")
+        header_bar.set_show_close_button(True)
+        header_bar.set_decoration_layout(":close")
+
+        blender_config_label = create_label("Blender Config Directory")
+        self.blender_config_chooser_button = create_file_chooser_button(
+            self, "Select Blender config directory",
+            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
+        )
+        self.blender_config_chooser_button.set_filename(
+            self.config.settings["blender_config"]
+        )
+
+        default_dir_label = create_label("Default Blender Project Directory")
+        self.default_dir_chooser_button = create_file_chooser_button(
+            self, "Select default Blender project directory",
+            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
+        )
+        self.default_dir_chooser_button.set_filename(
+            self.config.settings["default_blender_dir"]
+        )
+
+        output_dir_label = create_label("Default Output Directory")
+        self.output_dir_chooser_button = create_file_chooser_button(
+            self, "Select default output directory",
+            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
+        )
+        self.output_dir_chooser_button.set_filename(
+            self.config.settings["default_output_dir"]
+        )
+
+        post_rendering_label = create_label("Post Rendering Timer")
+        self.post_rendering_spin = create_spin_button(
+            self.config.settings["post_rendering_timer"], 0, 600
+        )
+        self.post_rendering_spin.connect("output", self.on_output)
+
+        parallel_slots_label = create_label("Parallel Render Tasks")
+        self.parallel_slots_spin = create_spin_button(
+            self.config.settings["parallel_slots"], 1, 256
+        )
+
+        thread_budget_label = create_label("Total Render Threads")
+        self.thread_budget_spin = create_spin_button(
+            self.config.settings["thread_budget"], 1, 4096
+        )
+
+        persistent_workers_label = create_label("Keep Blender Running")
+        self.persistent_workers_switch = Gtk.Switch()
+        self.persistent_workers_switch.set_halign(Gtk.Align.START)
+        self.persistent_workers_switch.set_active(
+            self.config.settings["persistent_workers"]
+        )
+
+        worker_max_jobs_label = create_label("Restart Blender After Jobs")
+        self.worker_max_jobs_spin = create_spin_button(
+            self.config.settings["worker_max_jobs"], 1, 10000
+        )
+
+        worker_max_memory_label = create_label("Restart Blender Above Memory")
+        self.worker_max_memory_spin = create_spin_button(
+            self.config.settings["worker_max_memory"], 256, 1048576
+        )
+        self.worker_max_memory_spin.connect("output", self.on_memory_output)
+
+        ui_update_rate_label = create_label("Progress Updates per Second")
+        self.ui_update_rate_spin = create_spin_button(
+            self.config.settings["ui_update_rate"], 1, 60
+        )
+
+        resume_queue_label = create_label("Resume Queue on Startup")
+        self.resume_queue_switch = Gtk.Switch()
+        self.resume_queue_switch.set_halign(Gtk.Align.START)
+        self.resume_queue_switch.set_active(
+            self.config.settings["resume_queue_on_startup"]
+        )
+
+        resource_interval_label = create_label("Resource Sampling Interval")
+        self.resource_interval_spin = create_spin_button(
+            self.config.settings["resource_sample_interval"], 1, 3600
+        )
+        self.resource_interval_spin.connect("output", self.on_output)
+
+        resource_export_label = create_label("Export Resource Usage")
+        resource_export_formats = ["None", "CSV", "Prometheus"]
+        self.resource_export_combo_box = create_combo_box(
+            labels=resource_export_formats
+        )
+        self.resource_export_combo_box.set_active(
+            resource_export_formats.index(
+                self.config.settings["resource_export"]
+            )
+        )
+
+        resource_export_dir_label = create_label("Resource Export Directory")
+        self.resource_export_dir_chooser_button = create_file_chooser_button(
+            self, "Select resource export directory",
+            Gtk.FileChooserAction.SELECT_FOLDER, Gtk.STOCK_OPEN, False
+        )
+        if self.config.settings["resource_export_dir"]:
+            self.resource_export_dir_chooser_button.set_filename(
+                self.config.settings["resource_export_dir"]
+            )
+
+        memory_admission_label = create_label("Wait for Free Memory")
+        self.memory_admission_switch = Gtk.Switch()
+        self.memory_admission_switch.set_halign(Gtk.Align.START)
+        self.memory_admission_switch.set_active(
+            self.config.settings["memory_admission"]
+        )
+
+        memory_limit_label = create_label("Limit Blender Memory")
+        memory_limit_store = Gtk.ListStore(str, str)
+        memory_limit_store.append(["Off", "off"])
+        memory_limit_store.append(["Address space (setrlimit)", "rlimit"])
+        memory_limit_store.append(["Control group (systemd-run)", "cgroup"])
+        self.memory_limit_combo_box = create_combo_box(
+            store=memory_limit_store
+        )
+        self.memory_limit_combo_box.set_active(
+            ["off", "rlimit", "cgroup"].index(
+                self.config.settings["memory_limit"]
+            )
+        )
+
+        memory_limit_swap_label = create_label(
+            "Keep Limited Blender out of Swap"
+        )
+        self.memory_limit_swap_switch = Gtk.Switch()
+        self.memory_limit_swap_switch.set_halign(Gtk.Align.START)
+        self.memory_limit_swap_switch.set_active(
+            self.config.settings["memory_limit_swap"]
+        )
+
+        batch_tasks_label = create_label("Render Frames of a File Together")
+        self.batch_tasks_switch = Gtk.Switch()
+        self.batch_tasks_switch.set_halign(Gtk.Align.START)
+        self.batch_tasks_switch.set_active(
+            self.config.settings["batch_tasks"]
+        )
+
+        deadline_min_samples_label = create_label(
+            "Lowest Samples to Meet a Deadline"
+        )
+        self.deadline_min_samples_spin = create_spin_button(
+            self.config.settings["deadline_min_samples"], 1, 100
+        )
+        self.deadline_min_samples_spin.connect(
+            "output", self.on_percent_output
+        )
+
+        deadline_min_resolution_label = create_label(
+            "Lowest Resolution to Meet a Deadline"
+        )
+        self.deadline_min_resolution_spin = create_spin_button(
+            self.config.settings["deadline_min_resolution"], 1, 100
+        )
+        self.deadline_min_resolution_spin.connect(
+            "output", self.on_percent_output
+        )
+
+        yield_to_users_label = create_label("While Someone Uses the Machine")
+        yield_to_users_store = Gtk.ListStore(str, str)
+        yield_to_users_store.append(["Keep rendering", "off"])
+        yield_to_users_store.append(["Render at lowest priority", "priority"])
+        yield_to_users_store.append(["Pause rendering", "pause"])
+        self.yield_to_users_combo_box = create_combo_box(
+            store=yield_to_users_store
+        )
+        self.yield_to_users_combo_box.set_active(
+            ["off", "priority", "pause"].index(
+                self.config.settings["yield_to_users"]
+            )
+        )
+
+        pin_cpus_label = create_label("Give Parallel Renders Their Own CPUs")
+        self.pin_cpus_switch = Gtk.Switch()
+        self.pin_cpus_switch.set_halign(Gtk.Align.START)
+        self.pin_cpus_switch.set_active(self.config.settings["pin_cpus"])
+
+        log_max_size_label = create_label("Keep Render Logs up to")
+        self.log_max_size_spin = create_spin_button(
+            self.config.settings["log_max_size"], 1, 1048576
+        )
+        self.log_max_size_spin.connect("output", self.on_memory_output)
+
+        log_max_age_label = create_label("Delete Render Logs After")
+        self.log_max_age_spin = create_spin_button(
+            self.config.settings["log_max_age"], 1, 3650
+        )
+        self.log_max_age_spin.connect("output", self.on_days_output)
+
+        render_info_label = create_label("Render Information (Cycles only)")
+        self.render_info_store = Gtk.ListStore(str, bool, str)
+        for i in range(6):
+            self.render_info_store.append(
+                [
+                    self.config.settings["render_info"][i]["display_name"],
+                    self.config.settings["render_info"][i]["visible"],
+                    self.config.settings["render_info"][i]["name"]
+                ]
+            )
+        self.render_info_tree_view = create_tree_view(
+            self.render_info_store, ["Category"]
+        )
+        self.render_info_tree_view.set_reorderable(True)
+        visible_toggle_renderer = Gtk.CellRendererToggle()
+        visible_toggle_renderer.connect("toggled", self.on_cell_toggled)
+        visible_toggle_column = Gtk.TreeViewColumn(
+            "Visible", visible_toggle_renderer, active=1
+        )
+        self.render_info_tree_view.append_column(visible_toggle_column)
+
+        grid = Gtk.Grid(column_spacing=12, row_spacing=12)
+        grid.set_halign(Gtk.Align.CENTER)
+        grid.set_valign(Gtk.Align.CENTER)
+
+        grid.attach(blender_config_label, 0, 0, 1, 1)
+        grid.attach(self.blender_config_chooser_button, 1, 0, 1, 1)
+        grid.attach(default_dir_label, 0, 1, 1, 1)
+        grid.attach(self.default_dir_chooser_button, 1, 1, 1, 1)
+        grid.attach(output_dir_label, 0, 2, 1, 1)
+        grid.attach(self.output_dir_chooser_button, 1, 2, 1, 1)
+        grid.attach(post_rendering_label, 0, 4, 1, 1)
+        grid.attach(self.post_rendering_spin, 1, 4, 1, 1)
+        grid.attach(parallel_slots_label, 0, 5, 1, 1)
+        grid.attach(self.parallel_slots_spin, 1, 5, 1, 1)
+        grid.attach(thread_budget_label, 0, 6, 1, 1)
+        grid.attach(self.thread_budget_spin, 1, 6, 1, 1)
+        grid.attach(persistent_workers_label, 0, 7, 1, 1)
+        grid.attach(self.persistent_workers_switch, 1, 7, 1, 1)
+        grid.attach(worker_max_jobs_label, 0, 8, 1, 1)
+        grid.attach(self.worker_max_jobs_spin, 1, 8, 1, 1)
+        grid.attach(worker_max_memory_label, 0, 9, 1, 1)
+        grid.attach(self.worker_max_memory_spin, 1, 9, 1, 1)
+        grid.attach(ui_update_rate_label, 0, 10, 1, 1)
+        grid.attach(self.ui_update_rate_spin, 1, 10, 1, 1)
+        grid.attach(resume_queue_label, 0, 11, 1, 1)
+        grid.attach(self.resume_queue_switch, 1, 11, 1, 1)
+        grid.attach(resource_interval_label, 0, 12, 1, 1)
+        grid.attach(self.resource_interval_spin, 1, 12, 1, 1)
+        grid.attach(resource_export_label, 0, 13, 1, 1)
+        grid.attach(self.resource_export_combo_box, 1, 13, 1, 1)
+        grid.attach(resource_export_dir_label, 0, 14, 1, 1)
+        grid.attach(self.resource_export_dir_chooser_button, 1, 14, 1, 1)
+        grid.attach(memory_admission_label, 0, 15, 1, 1)
+        grid.attach(self.memory_admission_switch, 1, 15, 1, 1)
+        grid.attach(memory_limit_label, 0, 16, 1, 1)
+        grid.attach(self.memory_limit_combo_box, 1, 16, 1, 1)
+        grid.attach(memory_limit_swap_label, 0, 17, 1, 1)
+        grid.attach(self.memory_limit_swap_switch, 1, 17, 1, 1)
+        grid.attach(batch_tasks_label, 0, 18, 1, 1)
+        grid.attach(self.batch_tasks_switch, 1, 18, 1, 1)
+        grid.attach(deadline_min_samples_label, 0, 19, 1, 1)
+        grid.attach(self.deadline_min_samples_spin, 1, 19, 1, 1)
+        grid.attach(deadline_min_resolution_label, 0, 20, 1, 1)
+        grid.attach(self.deadline_min_resolution_spin, 1, 20, 1, 1)
+        grid.attach(yield_to_users_label, 0, 21, 1, 1)
+        grid.attach(self.yield_to_users_combo_box, 1, 21, 1, 1)
+        grid.attach(pin_cpus_label, 0, 22, 1, 1)
+        grid.attach(self.pin_cpus_switch, 1, 22, 1, 1)
+        grid.attach(log_max_size_label, 0, 23, 1, 1)
+        grid.attach(self.log_max_size_spin, 1, 23, 1, 1)
+        grid.attach(log_max_age_label, 0, 24, 1, 1)
+        grid.attach(self.log_max_age_spin, 1, 24, 1, 1)
+        grid.attach(render_info_label, 0, 25, 1, 1)
+        grid.attach(self.render_info_tree_view, 1, 25, 1, 1)
+
+        self.set_titlebar(header_bar)
+        self.get_content_area().add(grid)
+
+        self.add_buttons(
+            Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL,
+            Gtk.STOCK_APPLY, Gtk.ResponseType.APPLY
+        )
+
+        self.show_all()
+
+    def on_cell_toggled(
+        self, cell_renderer_toggle: Gtk.CellRendererToggle, path: str
+    ) -> None:
+        self.render_info_store[path][1] = not self.render_info_store[path][1]
+
+    def on_output(self, spin_button: Gtk.SpinButton) -> bool:
+        spin_button.set_text(f"{spin_button.get_value_as_int()} s")
+        return True
+
+    def on_memory_output(self, spin_button: Gtk.SpinButton) -> bool:
+        spin_button.set_text(f"{spin_button.get_value_as_int()} MB")
+        return True
+
+    def on_days_output(self, spin_button: Gtk.SpinButton) -> bool:
+        spin_button.set_text(f"{spin_button.get_value_as_int()} days")
+        return True
+
+    def on_percent_output(self, spin_button: Gtk.SpinButton) -> bool:
+        spin_button.set_text(f"{spin_button.get_value_as_int()} %")
+        return True
@@ -1,4 +1,15 @@
-from typing import List
+import os
+from typing import List, Optional, Tuple
+
+
+BATCH_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "batch_render.py"
+)
+# Codes of -F whose name in the Python API differs
+FILE_FORMATS = {
+    "TGA": "TARGA", "RAWTGA": "TARGA_RAW", "AVIJPEG": "AVI_JPEG",
+    "AVIRAW": "AVI_RAW", "MPEG": "FFMPEG"
+}
 
 
 def convert_output_format(output_format: str) -> List[str]:
@@ -7,6 +18,12 @@ def convert_output_format(output_format: str) -> List[str]:
     return []
 
 
+def convert_file_format(output_format: str) -> Optional[str]:
+    if output_format == ".blend file":
+        return None
+    return FILE_FORMATS.get(output_format, output_format)
+
+
 def convert_animation(
     output_type: str, start_frame: int, end_frame: int
 ) -> List[str]:
@@ -21,6 +38,27 @@ def convert_single_frame(output_type: str, start_frame: int) -> List[str]:
     return ["-a"]
 
 
+def format_frame_ranges(frame_ranges: List[Tuple[int, int]]) -> str:
+    return ",".join(
+        str(start) if start == end else f"{start}..{end}"
+        for start, end in frame_ranges
+    )
+
+
+def convert_frame_ranges(frame_ranges: List[Tuple[int, int]]) -> List[str]:
+    return ["-f", format_frame_ranges(frame_ranges)]
+
+
+def convert_batch_frames(frame_ranges: List[Tuple[int, int]]) -> List[str]:
+    return ["--python", BATCH_SCRIPT, "--", format_frame_ranges(frame_ranges)]
+
+
+def convert_threads(threads: int) -> List[str]:
+    if threads > 0:
+        return ["-t", str(threads)]
+    return []
+
+
 def convert_render_device(render_device: str) -> str:
     return f"bpy.context.scene.cycles.device = '{render_device}'; "
 
@@ -31,6 +69,7 @@ def convert_render_samples(render_samples: int, render_engine: str) -> str:
     elif render_engine == "BLENDER_EEVEE":
         return f"bpy.context.scene.eevee.taa_render_samples " \
                 f"= {render_samples}; "
+    return ""
 
 
 def convert_resolution_x(resolution_x: int) -> str:
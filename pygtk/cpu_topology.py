@@ -0,0 +1,177 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+SYSFS_ROOT = "/sys/devices/system"
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    cpus: List[int] = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        first, last = int(start), int(end or start)
+        if first < 0 or last < first:
+            raise ValueError(f"invalid CPU range {part}")
+        cpus += range(first, last + 1)
+    return sorted(set(cpus))
+
+
+def cpu_ranges(cpus: List[int]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for cpu in sorted(cpus):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1] = (ranges[-1][0], cpu)
+        else:
+            ranges.append((cpu, cpu))
+    return ranges
+
+
+def format_cpu_list(cpus: List[int]) -> str:
+    return ",".join(
+        f"{start}-{end}" if end > start else str(start)
+        for start, end in cpu_ranges(cpus)
+    )
+
+
+def read_value(path: str) -> str:
+    try:
+        with open(path, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return ""
+
+
+def available_cpus() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def cpu_nodes(root: str = SYSFS_ROOT) -> Dict[int, int]:
+    nodes = {}
+    try:
+        names = os.listdir(f"{root}/node")
+    except OSError:
+        return nodes
+    for name in names:
+        if name.startswith("node") and name[4:].isdigit():
+            for cpu in parse_cpu_list(
+                read_value(f"{root}/node/{name}/cpulist")
+            ):
+                nodes[cpu] = int(name[4:])
+    return nodes
+
+
+def l3_cache(cpu: int, root: str = SYSFS_ROOT) -> str:
+    cache_dir = f"{root}/cpu/cpu{cpu}/cache"
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return ""
+    for name in names:
+        if read_value(f"{cache_dir}/{name}/level") == "3":
+            return read_value(f"{cache_dir}/{name}/shared_cpu_list")
+    return ""
+
+
+def core_key(cpu: int, root: str = SYSFS_ROOT) -> Tuple[int, int, int]:
+    topology = f"{root}/cpu/cpu{cpu}/topology"
+    package = read_value(f"{topology}/physical_package_id")
+    core = read_value(f"{topology}/core_id")
+    return (
+        int(package) if package.lstrip("-").isdigit() else 0,
+        int(core) if core.lstrip("-").isdigit() else cpu,
+        cpu
+    )
+
+
+def cpu_domains(
+    cpus: Optional[List[int]] = None, root: str = SYSFS_ROOT
+) -> List[Tuple[int, List[int]]]:
+    # CPUs that share a NUMA node and an L3 cache form a domain. Within a
+    # domain the hyperthreads of a core are next to each other, so tasks
+    # get whole cores.
+    nodes = cpu_nodes(root)
+    domains: Dict[Tuple[int, str], List[int]] = {}
+    for cpu in available_cpus() if cpus is None else cpus:
+        domains.setdefault(
+            (nodes.get(cpu, 0), l3_cache(cpu, root)), []
+        ).append(cpu)
+    return [
+        (node, sorted(domain, key=lambda cpu: core_key(cpu, root)))
+        for (node, _), domain in sorted(
+            domains.items(), key=lambda item: (item[0][0], min(item[1]))
+        )
+    ]
+
+
+def set_process_affinity(pid: int, cpus: Optional[List[int]]) -> None:
+    # Every thread of a running process has its own affinity.
+    cpus = cpus or available_cpus()
+    try:
+        threads = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        threads = [str(pid)]
+    for thread in threads:
+        try:
+            os.sched_setaffinity(int(thread), cpus)
+        except OSError:
+            pass
+
+
+def split_cpus(cpus: List[int], parts: int) -> List[List[int]]:
+    if len(cpus) < parts:
+        return [cpus] * parts
+    return [
+        cpus[len(cpus) * i // parts:len(cpus) * (i + 1) // parts]
+        for i in range(parts)
+    ]
+
+
+class CpuAllocator:
+    def __init__(self, domains: List[Tuple[int, List[int]]]) -> None:
+        self.domains = domains
+        self.used: Dict[int, int] = {}
+
+    @staticmethod
+    def read() -> "CpuAllocator":
+        return CpuAllocator(cpu_domains())
+
+    def free(self, cpus: List[int]) -> List[int]:
+        return [cpu for cpu in cpus if cpu not in self.used]
+
+    def allocate(self, threads: int) -> Optional[List[int]]:
+        # A task stays within one L3 cache if it fits, then within one
+        # NUMA node. The fullest domain that fits is taken, which leaves
+        # the emptier ones to bigger tasks.
+        domain_free = [self.free(cpus) for _, cpus in self.domains]
+        node_free: Dict[int, List[int]] = {}
+        for (node, _), free in zip(self.domains, domain_free):
+            node_free.setdefault(node, []).extend(free)
+        for candidates in [domain_free, list(node_free.values())]:
+            fitting = [free for free in candidates if len(free) >= threads]
+            if fitting:
+                return self.reserve(min(fitting, key=len)[:threads])
+
+        # Spread over the domains with the most free CPUs first.
+        spread: List[int] = []
+        for free in sorted(domain_free, key=len, reverse=True):
+            spread += free[:threads - len(spread)]
+        if len(spread) < threads:
+            # Not enough free CPUs, so the scheduler of the OS shares them.
+            return None
+        return self.reserve(spread)
+
+    def reserve(self, cpus: List[int]) -> List[int]:
+        for cpu in cpus:
+            self.used[cpu] = self.used.get(cpu, 0) + 1
+        return cpus
+
+    def release(self, cpus: Optional[List[int]]) -> None:
+        for cpu in cpus or []:
+            self.used[cpu] -= 1
+            if self.used[cpu] <= 0:
+                del self.used[cpu]
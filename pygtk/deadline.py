@@ -0,0 +1,214 @@
+import datetime
+import math
+import time
+from typing import Container, Dict, List, Optional, Tuple
+
+from eta import EtaPredictor, format_duration
+from render_task import RenderTask
+from task_queue import TaskQueue
+
+
+SAMPLED_ENGINES = ["CYCLES", "BLENDER_EEVEE"]
+
+
+def parse_finish_time(text: str, now: datetime.datetime) -> float:
+    finish_time = datetime.datetime.combine(
+        now.date(), datetime.datetime.strptime(text.strip(), "%H:%M").time()
+    )
+    # A time earlier than now means tomorrow morning.
+    if finish_time <= now:
+        finish_time += datetime.timedelta(days=1)
+    return finish_time.timestamp()
+
+
+def frames_left(render_task: RenderTask) -> int:
+    if render_task.output_type == "Animation":
+        return render_task.end_frame - render_task.start_frame + 1
+    return 1
+
+
+class DeadlinePlan:
+    def __init__(self, slots: int = 1) -> None:
+        self.slots = max(1, slots)
+        self.factors: Dict[RenderTask, float] = {}
+        self.order: List[RenderTask] = []
+        self.work = 0.0
+        self.capacity = 0.0
+        self.unknown = 0
+
+    def feasible(self) -> bool:
+        return self.work <= self.capacity * 1.001
+
+    def late_by(self) -> float:
+        return max(0.0, self.work - self.capacity) / self.slots
+
+    def lowest_factor(self) -> float:
+        return min(self.factors.values(), default=1)
+
+    def describe(self) -> str:
+        if not self.feasible():
+            return f"{format_duration(self.late_by())} late even at the " \
+                "lowest quality"
+        if self.lowest_factor() < 1:
+            return "render time cut to " \
+                f"{self.lowest_factor() * 100:.0f} % to finish in time"
+        return "on time"
+
+
+class DeadlinePlanner:
+    def __init__(
+        self, eta_predictor: EtaPredictor, min_samples: int,
+        min_resolution: int
+    ) -> None:
+        self.eta_predictor = eta_predictor
+        self.min_samples = min_samples
+        self.min_resolution = min_resolution
+        self.finish_time: Optional[float] = None
+        self.plan = DeadlinePlan()
+        self.reordered = False
+
+    def min_factor(self, render_task: RenderTask) -> float:
+        samples = self.min_samples / 100 \
+            if render_task.render_engine in SAMPLED_ENGINES else 1
+        return samples * (self.min_resolution / 100) ** 2
+
+    def current_factor(self, render_task: RenderTask) -> float:
+        factor = (
+            render_task.effective_resolution_percentage()
+            / render_task.resolution_percentage
+        ) ** 2
+        if render_task.render_engine in SAMPLED_ENGINES:
+            factor *= render_task.effective_samples() \
+                / render_task.render_samples
+        return factor
+
+    def settings(
+        self, render_task: RenderTask, factor: float
+    ) -> Tuple[int, int]:
+        # The render time grows with the samples and the number of pixels.
+        # Noise from fewer samples is easier to clean up than missing
+        # detail, so the samples are lowered first.
+        if render_task.render_engine in SAMPLED_ENGINES:
+            samples_factor = max(self.min_samples / 100, factor)
+        else:
+            samples_factor = 1
+        resolution_factor = min(1, math.sqrt(factor / samples_factor))
+        return (
+            max(1, round(render_task.render_samples * samples_factor)),
+            max(1, round(
+                render_task.resolution_percentage * resolution_factor
+            ))
+        )
+
+    def update(
+        self, render_queue: List[RenderTask],
+        running: Container[RenderTask], slots: int, now: float
+    ) -> DeadlinePlan:
+        plan = DeadlinePlan(slots)
+        plan.order = list(render_queue)
+        self.plan = plan
+        if self.finish_time is None:
+            return plan
+        plan.capacity = max(0.0, self.finish_time - time.time()) * plan.slots
+        costs: Dict[RenderTask, Optional[float]] = {}
+        for render_task in render_queue:
+            if render_task.finished:
+                continue
+            if render_task in running:
+                plan.capacity -= self.eta_predictor.task_remaining(
+                    render_task, now
+                ) or 0
+                continue
+            frame_time = self.eta_predictor.frame_time(render_task)
+            if frame_time is None:
+                plan.unknown += 1
+                costs[render_task] = None
+            else:
+                # Costs are planned at the full settings of the task.
+                costs[render_task] = frames_left(render_task) * frame_time \
+                    / self.current_factor(render_task)
+                plan.work += costs[render_task]
+
+        # Quality goes down for the least important tasks first.
+        excess = plan.work - plan.capacity
+        for priority in sorted({t.priority for t in costs}):
+            group = [t for t in costs if t.priority == priority]
+            factor = 1.0
+            if excess > 0:
+                factor = self.fit(group, costs, excess)
+                excess -= self.saved(group, costs, factor)
+            for render_task in group:
+                plan.factors[render_task] = max(
+                    self.min_factor(render_task), factor
+                )
+        plan.work = sum(
+            plan.factors[render_task] * cost
+            for render_task, cost in costs.items() if cost is not None
+        )
+
+        if not plan.feasible():
+            # Short tasks first gets the most of them done in time.
+            plan.order.sort(key=lambda render_task: (
+                -render_task.priority,
+                costs.get(render_task) or math.inf
+            ))
+        return plan
+
+    def saved(
+        self, group: List[RenderTask],
+        costs: Dict[RenderTask, Optional[float]], factor: float
+    ) -> float:
+        return sum(
+            (1 - max(self.min_factor(render_task), factor))
+            * (costs[render_task] or 0)
+            for render_task in group
+        )
+
+    def fit(
+        self, group: List[RenderTask],
+        costs: Dict[RenderTask, Optional[float]], excess: float
+    ) -> float:
+        # The highest factor that still saves enough time.
+        low, high = 0.0, 1.0
+        if self.saved(group, costs, low) <= excess:
+            return low
+        for _ in range(30):
+            middle = (low + high) / 2
+            if self.saved(group, costs, middle) >= excess:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def start_tasks(
+        self, render_tasks: List[RenderTask], render_queue: List[RenderTask],
+        task_queue: TaskQueue, running: Container[RenderTask], slots: int,
+        now: float
+    ) -> DeadlinePlan:
+        # Replanning whenever tasks start takes the frame times measured so
+        # far into account.
+        others = {
+            render_task for render_task in render_queue
+            if render_task in running and render_task not in render_tasks
+        }
+        plan = self.update(render_queue, others, slots, now)
+        self.apply(render_tasks[0])
+        for render_task in render_tasks[1:]:
+            # Tasks of a batch are rendered with the settings of the first.
+            render_task.deadline_samples = render_tasks[0].deadline_samples
+            render_task.deadline_resolution_percentage = \
+                render_tasks[0].deadline_resolution_percentage
+        if not plan.feasible() or self.reordered:
+            task_queue.reorder(plan.order)
+            self.reordered = not plan.feasible()
+        return plan
+
+    def apply(self, render_task: RenderTask) -> None:
+        factor = self.plan.factors.get(render_task, 1)
+        if factor >= 1:
+            render_task.deadline_samples = None
+            render_task.deadline_resolution_percentage = None
+        else:
+            render_task.deadline_samples, \
+                render_task.deadline_resolution_percentage = \
+                self.settings(render_task, factor)
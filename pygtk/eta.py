@@ -0,0 +1,147 @@
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from render_history import RenderHistory
+from render_task import RenderTask
+
+
+def history_key(render_task: RenderTask) -> Hashable:
+    # The settings the render history is looked up with
+    return (
+        render_task.blend_file, render_task.render_engine,
+        render_task.effective_samples(), render_task.resolution_x,
+        render_task.resolution_y,
+        render_task.effective_resolution_percentage(),
+        tuple(render_task.layers)
+    )
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds + 59) // 60
+    if minutes >= 60:
+        return f"{minutes // 60} h {minutes % 60} min"
+    if minutes > 1:
+        return f"{minutes} min"
+    return f"{int(seconds)} s"
+
+
+class EtaPredictor:
+    def __init__(self, history: RenderHistory) -> None:
+        self.history = history
+        self.progress: Dict[RenderTask, float] = {}
+        self.started: Dict[RenderTask, float] = {}
+        self.paused: Dict[RenderTask, float] = {}
+        # Pauses that ended, as start and end time
+        self.pauses: Dict[RenderTask, List[Tuple[float, float]]] = {}
+        self.frame_times: Dict[RenderTask, List[float]] = {}
+        # Tasks of a sweep share their settings, so the history is looked
+        # up once per settings.
+        self.history_times: Dict[Hashable, Optional[float]] = {}
+
+    def start_task(self, render_task: RenderTask, now: float) -> None:
+        self.started[render_task] = now
+
+    def pause_task(self, render_task: RenderTask, now: float) -> None:
+        if render_task in self.started:
+            self.paused.setdefault(render_task, now)
+
+    def resume_task(self, render_task: RenderTask, now: float) -> None:
+        paused = self.paused.pop(render_task, None)
+        if paused is None:
+            return
+        # Time spent paused doesn't count as render time.
+        self.started[render_task] += now - paused
+        self.pauses.setdefault(render_task, []).append((paused, now))
+
+    def paused_time(
+        self, render_task: RenderTask, start: float, end: float
+    ) -> float:
+        pauses = list(self.pauses.get(render_task, []))
+        if render_task in self.paused:
+            pauses.append((self.paused[render_task], end))
+        return sum(
+            max(0.0, min(end, pause_end) - max(start, pause_start))
+            for pause_start, pause_end in pauses
+        )
+
+    def frame_saved(
+        self, render_task: RenderTask, frame_started: float, now: float
+    ) -> None:
+        # Chunks and batches render other frames at the same time or in
+        # between, so every frame is timed from when its own Blender
+        # process started on it.
+        wall_time = now - frame_started \
+            - self.paused_time(render_task, frame_started, now)
+        self.frame_times.setdefault(render_task, []).append(wall_time)
+        self.history.record(render_task, wall_time)
+        # Other settings of the same file are estimated from it as well.
+        self.history_times = {
+            key: frame_time
+            for key, frame_time in self.history_times.items()
+            if key[0] != render_task.blend_file
+        }
+
+    def update_progress(
+        self, render_task: RenderTask, progress: float
+    ) -> None:
+        self.progress[render_task] = progress
+
+    def finish_task(self, render_task: RenderTask) -> None:
+        self.progress[render_task] = 100
+        self.started.pop(render_task, None)
+        self.paused.pop(render_task, None)
+        self.pauses.pop(render_task, None)
+        self.frame_times.pop(render_task, None)
+
+    def frame_time(self, render_task: RenderTask) -> Optional[float]:
+        frame_times = self.frame_times.get(render_task)
+        if frame_times:
+            recent = frame_times[-8:]
+            return sum(recent) / len(recent)
+        key = history_key(render_task)
+        if key not in self.history_times:
+            self.history_times[key] = self.history.frame_time(render_task)
+        return self.history_times[key]
+
+    def task_remaining(
+        self, render_task: RenderTask, now: float
+    ) -> Optional[float]:
+        if render_task.finished:
+            return 0
+        progress = self.progress.get(render_task, 0)
+        frames = render_task.end_frame - render_task.start_frame + 1 \
+            if render_task.output_type == "Animation" else 1
+        frame_time = self.frame_time(render_task)
+        if frame_time is not None:
+            # Chunks render their frames side by side.
+            parallel = render_task.chunk_workers \
+                if render_task.output_type == "Animation" else 1
+            return frames * (1 - progress / 100) * frame_time \
+                / max(1, parallel)
+        if render_task in self.started and progress > 0:
+            elapsed = now - self.started[render_task]
+            return elapsed * (100 - progress) / progress
+        return None
+
+    def queue_remaining(
+        self, render_queue: List[RenderTask], slots: int, now: float
+    ) -> Tuple[float, int]:
+        return self.queue_total(
+            (
+                self.task_remaining(render_task, now)
+                for render_task in render_queue
+            ), slots
+        )
+
+    def queue_total(
+        self, remaining: Iterable[Optional[float]], slots: int
+    ) -> Tuple[float, int]:
+        # Tasks rendering in parallel share the machine, so the total work
+        # is spread evenly over the slots.
+        total = 0.0
+        unknown = 0
+        for task_remaining in remaining:
+            if task_remaining is None:
+                unknown += 1
+            else:
+                total += task_remaining
+        return total / max(1, slots), unknown
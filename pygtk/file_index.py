@@ -0,0 +1,158 @@
+import ctypes
+import json
+import os
+import struct
+import trio
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE \
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class BlendFileIndex:
+    def __init__(self, root: str, cache_path: str) -> None:
+        self.root = root
+        self.cache_path = cache_path
+        # directory -> {"mtime": st_mtime_ns, "files": [...], "dirs": [...]}
+        self.directories: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.cache_path, "r") as file:
+                data = json.load(file)
+        except (IOError, ValueError):
+            return
+        if data.get("root") == self.root:
+            self.directories = data["directories"]
+
+    def save(self) -> None:
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(
+                {"root": self.root, "directories": self.directories}, file
+            )
+        os.replace(temp_path, self.cache_path)
+
+    def files(self) -> List[str]:
+        return [
+            file
+            for entry in self.directories.values()
+            for file in entry["files"]
+        ]
+
+    def update(
+        self, directories: Iterable[str]
+    ) -> Tuple[List[str], List[str]]:
+        before = set(self.files())
+        for directory in sorted(set(directories)):
+            if directory != self.root \
+                    and not directory.startswith(self.root + os.sep):
+                continue
+            prefix = directory + os.sep
+            cached = {
+                path: entry for path, entry in self.directories.items()
+                if path == directory or path.startswith(prefix)
+            }
+            for path in cached:
+                del self.directories[path]
+            self.scan_directory(directory, cached)
+        after = set(self.files())
+        return sorted(after - before), sorted(before - after)
+
+    def scan_directory(
+        self, directory: str, cached: Dict[str, Dict[str, Any]]
+    ) -> None:
+        stack = [directory]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            # Adding, removing or renaming an entry changes the mtime of
+            # its directory, so unchanged directories needn't be listed.
+            entry = cached.get(path)
+            if entry is None or entry["mtime"] != mtime:
+                entry = {"mtime": mtime, "files": [], "dirs": []}
+                try:
+                    with os.scandir(path) as iterator:
+                        for dir_entry in iterator:
+                            if dir_entry.is_dir(follow_symlinks=False):
+                                entry["dirs"].append(dir_entry.path)
+                            elif dir_entry.name.endswith(".blend") \
+                                    and not dir_entry.name.startswith("."):
+                                entry["files"].append(dir_entry.path)
+                except OSError:
+                    continue
+            self.directories[path] = entry
+            stack.extend(entry["dirs"])
+
+
+class InotifyWatcher:
+    def __init__(self) -> None:
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+        self.watched: Dict[str, int] = {}
+        self.exhausted = False
+
+    def watch(self, directories: Iterable[str]) -> None:
+        for directory in directories:
+            if directory in self.watched:
+                continue
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK
+            )
+            if wd < 0:
+                # Usually fs.inotify.max_user_watches, keep polling instead.
+                self.exhausted = True
+                return
+            self.watches[wd] = directory
+            self.watched[directory] = wd
+
+    async def changed_directories(self) -> List[str]:
+        await trio.lowlevel.wait_readable(self.fd)
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+
+        directories = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size + length
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                self.watched.pop(directory, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                directory = os.path.dirname(directory)
+            directories.append(directory)
+        return directories
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_watcher() -> Optional[InotifyWatcher]:
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        return None
@@ -0,0 +1,180 @@
+import os
+import trio
+from typing import Any, Dict, List, Optional
+
+from blend_reader import read_blend_file_settings
+from worker_pool import WorkerPool
+
+
+FILE_INFO_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "blend_file_information.py"
+)
+ENGINE_NAMES = {
+    "BLENDER_EEVEE": "Eevee",
+    "BLENDER_EEVEE_NEXT": "Eevee",
+    "BLENDER_WORKBENCH": "Workbench",
+    "CYCLES": "Cycles"
+}
+# Settings of one engine, files rendered with another engine don't need
+# Blender to read them.
+CYCLES_DEFAULTS = {"cycles_samples": 4096, "render_device": "CPU"}
+EEVEE_DEFAULTS = {"eevee_samples": 64}
+EEVEE_ENGINES = ["BLENDER_EEVEE", "BLENDER_EEVEE_NEXT"]
+
+
+class FileInfo:
+    def __init__(
+        self, render_engine: str, render_device: str, cycles_samples: int,
+        eevee_samples: int, resolution_x: int, resolution_y: int,
+        resolution_percentage: int, frame_start: int, frame_end: int,
+        file_format: str, filepath: str, layers: List[str]
+    ) -> None:
+        self.render_engine = render_engine
+        self.render_device = render_device
+        self.cycles_samples = cycles_samples
+        self.eevee_samples = eevee_samples
+        self.resolution_x = resolution_x
+        self.resolution_y = resolution_y
+        self.resolution_percentage = resolution_percentage
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.file_format = file_format
+        self.filepath = filepath
+        self.layers = layers
+
+    def from_lines(lines: List[str]) -> Optional["FileInfo"]:
+        if len(lines) < 12:
+            return None
+        return FileInfo(
+            lines[0], lines[1], int(lines[2]), int(lines[3]), int(lines[4]),
+            int(lines[5]), int(lines[6]), int(lines[7]), int(lines[8]),
+            lines[9], lines[10], lines[11].split(", ")
+        )
+
+    def from_dict(data: Dict[str, Any]) -> "FileInfo":
+        return FileInfo(**data)
+
+    def from_settings(settings: Dict[str, Any]) -> Optional["FileInfo"]:
+        settings = dict(settings)
+        engine = settings.get("render_engine")
+        if engine is not None and engine != "CYCLES":
+            for name, value in CYCLES_DEFAULTS.items():
+                settings.setdefault(name, value)
+        if engine is not None and engine not in EEVEE_ENGINES:
+            for name, value in EEVEE_DEFAULTS.items():
+                settings.setdefault(name, value)
+        try:
+            return FileInfo.from_dict(settings)
+        except TypeError:
+            # Some fields could not be decoded.
+            return None
+
+    def from_blend_file(blend_file: str) -> Optional["FileInfo"]:
+        return FileInfo.from_settings(read_blend_file_settings(blend_file))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def file_info_columns(file_info: Optional[FileInfo]) -> List[str]:
+    if file_info is None:
+        return ["", "", ""]
+    return [
+        ENGINE_NAMES.get(file_info.render_engine, file_info.render_engine),
+        f"{file_info.frame_start} - {file_info.frame_end}",
+        f"{file_info.resolution_x} x {file_info.resolution_y} "
+        f"({file_info.resolution_percentage} %)"
+    ]
+
+
+def fill_missing(
+    settings: Dict[str, Any], file_info: Optional[FileInfo]
+) -> Optional[FileInfo]:
+    # Blender only fills in what the file reader couldn't decode.
+    if file_info is None:
+        return None
+    return FileInfo.from_dict({**file_info.to_dict(), **settings})
+
+
+def parse_file_info_output(output: str) -> List[str]:
+    file_info = []
+    ready = False
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        if line == "READY":
+            ready = True
+            continue
+        if ready:
+            file_info.append(line)
+    return file_info
+
+
+def parse_batch_output(output: str) -> Dict[str, Optional[FileInfo]]:
+    file_infos: Dict[str, Optional[FileInfo]] = {}
+    path = None
+    lines: List[str] = []
+    for raw_line in output.splitlines() + ["FILE "]:
+        line = raw_line.strip()
+        if raw_line.startswith("FILE "):
+            if path is not None:
+                file_infos[path] = FileInfo.from_lines(
+                    parse_file_info_output("\n".join(lines))
+                )
+            path = raw_line[len("FILE "):]
+            lines = []
+        elif path is not None:
+            lines.append(line)
+    return file_infos
+
+
+async def read_file_infos(
+    blend_files: List[str], batch_size: int = 50
+) -> Dict[str, Optional[FileInfo]]:
+    file_infos: Dict[str, Optional[FileInfo]] = {}
+    remaining: Dict[str, Dict[str, Any]] = {}
+    for blend_file in blend_files:
+        settings = await trio.to_thread.run_sync(
+            read_blend_file_settings, blend_file
+        )
+        file_info = FileInfo.from_settings(settings)
+        if file_info is None:
+            remaining[blend_file] = settings
+        else:
+            file_infos[blend_file] = file_info
+
+    paths = list(remaining)
+    for i in range(0, len(paths), batch_size):
+        batch = paths[i:i + batch_size]
+        process = await trio.run_process(
+            ["blender", "-b", "-P", FILE_INFO_SCRIPT, "--"] + batch,
+            capture_stdout=True, check=False
+        )
+        for path, file_info in parse_batch_output(
+            process.stdout.decode("utf-8")
+        ).items():
+            file_infos[path] = fill_missing(remaining.get(path, {}), file_info)
+    return file_infos
+
+
+async def read_file_info(
+    blend_file: str, worker_pool: Optional[WorkerPool] = None
+) -> Optional[FileInfo]:
+    settings = await trio.to_thread.run_sync(
+        read_blend_file_settings, blend_file
+    )
+    file_info = FileInfo.from_settings(settings)
+    if file_info is not None:
+        return file_info
+
+    if worker_pool is not None:
+        return fill_missing(settings, FileInfo.from_lines(
+            await worker_pool.file_info(blend_file)
+        ))
+
+    process = await trio.run_process(
+        ["blender", "-b", blend_file, "-P", FILE_INFO_SCRIPT],
+        capture_stdout=True, check=False
+    )
+    return fill_missing(settings, FileInfo.from_lines(
+        parse_file_info_output(process.stdout.decode("utf-8"))
+    ))
@@ -0,0 +1,165 @@
+import os
+import re
+import struct
+from typing import BinaryIO, List, Optional, Tuple
+
+
+EXTENSIONS = {
+    "BMP": ".bmp",
+    "IRIS": ".rgb",
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "TGA": ".tga",
+    "RAWTGA": ".tga",
+    "CINEON": ".cin",
+    "DPX": ".dpx",
+    "OPEN_EXR_MULTILAYER": ".exr",
+    "OPEN_EXR": ".exr",
+    "HDR": ".hdr",
+    "TIFF": ".tif"
+}
+MOVIE_FORMATS = ["AVIJPEG", "AVIRAW", "MPEG"]
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_END = b"IEND\xaeB`\x82"
+EXR_MAGIC = b"\x76\x2f\x31\x01"
+EXR_TILED = 0x200
+EXR_MULTIPART = 0x1000
+# Scanlines per chunk for every OpenEXR compression method
+EXR_LINES_PER_CHUNK = [1, 1, 1, 16, 32, 16, 32, 32, 32, 256]
+
+
+def expand_output_path(
+    output_file: str, blend_file: str, frame: int, extension: str
+) -> str:
+    if output_file.startswith("//"):
+        output_file = os.path.join(
+            os.path.dirname(blend_file), output_file[2:]
+        )
+
+    runs = list(re.finditer(r"#+", output_file))
+    if runs:
+        start, end = runs[-1].span()
+        path = output_file[:start] + str(frame).zfill(end - start) \
+            + output_file[end:]
+    else:
+        path = output_file + str(frame).zfill(4)
+
+    if extension and not path.lower().endswith(extension):
+        path += extension
+    return path
+
+
+def check_png(file: BinaryIO, size: int) -> bool:
+    if file.read(8) != PNG_SIGNATURE or size < 20:
+        return False
+    file.seek(size - 8)
+    return file.read(8) == PNG_END
+
+
+def check_jpeg(file: BinaryIO, size: int) -> bool:
+    if file.read(2) != b"\xff\xd8" or size < 4:
+        return False
+    file.seek(size - 2)
+    return file.read(2) == b"\xff\xd9"
+
+
+def check_exr(file: BinaryIO, size: int) -> bool:
+    header = file.read(8)
+    if len(header) < 8 or header[:4] != EXR_MAGIC:
+        return False
+    if struct.unpack("<I", header[4:])[0] & (EXR_TILED | EXR_MULTIPART):
+        return True
+
+    data_window = None
+    compression = None
+    data = file.read(65536)
+    position = 0
+    try:
+        while data[position] != 0:
+            name_end = data.index(b"\0", position)
+            type_end = data.index(b"\0", name_end + 1)
+            length = struct.unpack_from("<i", data, type_end + 1)[0]
+            value_start = type_end + 5
+            name = data[position:name_end]
+            if name == b"dataWindow":
+                data_window = struct.unpack_from("<4i", data, value_start)
+            elif name == b"compression":
+                compression = data[value_start]
+            position = value_start + length
+    except (IndexError, ValueError, struct.error):
+        return False
+    if data_window is None or compression is None \
+            or compression >= len(EXR_LINES_PER_CHUNK):
+        return False
+
+    lines = data_window[3] - data_window[1] + 1
+    lines_per_chunk = EXR_LINES_PER_CHUNK[compression]
+    chunks = (lines + lines_per_chunk - 1) // lines_per_chunk
+    file.seek(8 + position + 1)
+    table = file.read(8 * chunks)
+    if len(table) < 8 * chunks:
+        return False
+    last_chunk = max(struct.unpack(f"<{chunks}Q", table))
+    file.seek(last_chunk)
+    chunk_header = file.read(8)
+    if len(chunk_header) < 8:
+        return False
+    return last_chunk + 8 + struct.unpack("<i", chunk_header[4:])[0] <= size
+
+
+def frame_is_complete(path: str) -> bool:
+    try:
+        size = os.path.getsize(path)
+        if size == 0:
+            return False
+        with open(path, "rb") as file:
+            extension = os.path.splitext(path)[1].lower()
+            if extension == ".png":
+                return check_png(file, size)
+            if extension == ".jpg":
+                return check_jpeg(file, size)
+            if extension == ".exr":
+                return check_exr(file, size)
+    except OSError:
+        return False
+    return True
+
+
+def find_frame(
+    output_file: str, blend_file: str, frame: int, output_format: str
+) -> Optional[str]:
+    if output_format in EXTENSIONS:
+        extensions = [EXTENSIONS[output_format]]
+    else:
+        # The format is taken from the .blend file, so accept any of them.
+        extensions = sorted(set(EXTENSIONS.values()))
+    for extension in extensions:
+        path = expand_output_path(output_file, blend_file, frame, extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def missing_frames(
+    output_file: str, blend_file: str, start_frame: int, end_frame: int,
+    output_format: str
+) -> List[int]:
+    if output_format in MOVIE_FORMATS:
+        return list(range(start_frame, end_frame + 1))
+    frames = []
+    for frame in range(start_frame, end_frame + 1):
+        path = find_frame(output_file, blend_file, frame, output_format)
+        if path is None or not frame_is_complete(path):
+            frames.append(frame)
+    return frames
+
+
+def frame_ranges(frames: List[int]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for frame in sorted(frames):
+        if ranges and ranges[-1][1] == frame - 1:
+            ranges[-1] = (ranges[-1][0], frame)
+        else:
+            ranges.append((frame, frame))
+    return ranges
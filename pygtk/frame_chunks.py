@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Tuple
+
+
+class FrameChunker:
+    def __init__(
+        self, start_frame: int, end_frame: int, workers: int,
+        target_chunk_time: float = 120, max_chunk_size: int = 50
+    ) -> None:
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.workers = max(1, min(workers, end_frame - start_frame + 1))
+        self.target_chunk_time = target_chunk_time
+        self.max_chunk_size = max_chunk_size
+        self.frame_times: List[float] = []
+        self.done_frames = 0
+        self.failed_frames: List[int] = []
+        self.running: Dict[int, Tuple[int, int, float]] = {}
+        self.reported_progress = 0.0
+
+        # Every worker owns a contiguous range of frames. It renders from
+        # the front of its own range and steals the back half of the
+        # largest remaining range once its own is exhausted.
+        self.ranges: List[List[int]] = []
+        total = end_frame - start_frame + 1
+        lo = start_frame
+        for worker in range(self.workers):
+            size = total // self.workers \
+                + (1 if worker < total % self.workers else 0)
+            self.ranges.append([lo, lo + size - 1])
+            lo += size
+
+    def total_frames(self) -> int:
+        return self.end_frame - self.start_frame + 1
+
+    def chunk_size(self) -> int:
+        if not self.frame_times:
+            return 1
+        recent = self.frame_times[-16:]
+        frame_time = sum(recent) / len(recent)
+        if frame_time <= 0:
+            return self.max_chunk_size
+        size = int(self.target_chunk_time / frame_time)
+        return max(1, min(size, self.max_chunk_size))
+
+    def steal(self, worker: int) -> bool:
+        victim = max(
+            range(self.workers),
+            key=lambda w: self.ranges[w][1] - self.ranges[w][0]
+        )
+        lo, hi = self.ranges[victim]
+        if hi < lo:
+            return False
+        if hi == lo:
+            # A single frame left is only worth taking from an idle owner.
+            if victim in self.running:
+                return False
+            self.ranges[worker] = [lo, hi]
+            self.ranges[victim] = [hi + 1, hi]
+            return True
+        mid = (lo + hi + 1) // 2
+        self.ranges[worker] = [mid, hi]
+        self.ranges[victim] = [lo, mid - 1]
+        return True
+
+    def next_chunk(
+        self, worker: int, now: float
+    ) -> Optional[Tuple[int, int]]:
+        lo, hi = self.ranges[worker]
+        if hi < lo:
+            if not self.steal(worker):
+                return None
+            lo, hi = self.ranges[worker]
+
+        end = min(hi, lo + self.chunk_size() - 1)
+        self.ranges[worker] = [end + 1, hi]
+        self.running[worker] = (lo, end, now)
+        return lo, end
+
+    def finish_chunk(
+        self, worker: int, now: float, failed_frame: Optional[int] = None
+    ) -> None:
+        lo, end, started = self.running.pop(worker)
+        if failed_frame is None:
+            frames = end - lo + 1
+            self.done_frames += frames
+            self.frame_times.append((now - started) / frames)
+            return
+
+        # Skip the frame Blender crashed on and hand the rest of the chunk
+        # back to the worker, so one bad frame doesn't stop the range.
+        self.failed_frames.append(failed_frame)
+        self.done_frames += failed_frame - lo + 1
+        if failed_frame > lo:
+            self.frame_times.append((now - started) / (failed_frame - lo))
+        if failed_frame < end:
+            own_lo, own_hi = self.ranges[worker]
+            if own_hi < own_lo:
+                self.ranges[worker] = [failed_frame + 1, end]
+            else:
+                self.ranges[worker] = [failed_frame + 1, own_hi]
+
+    def progress(self, chunk_progress: Dict[int, float]) -> float:
+        # Finished frames plus the part of the running chunks that is done.
+        # A failed chunk gives up the progress of its unsaved frames, the
+        # task's progress still only moves forward.
+        frames = float(self.done_frames)
+        for worker, (lo, end, _) in self.running.items():
+            progress = min(100.0, max(0.0, chunk_progress.get(worker, 0)))
+            frames += (end - lo + 1) * progress / 100
+        self.reported_progress = max(
+            self.reported_progress,
+            min(100.0, frames / self.total_frames() * 100)
+        )
+        return self.reported_progress
@@ -0,0 +1,94 @@
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk, Gio  # noqa: E402
+
+from render_log import START, read_frame, read_frames  # noqa: E402
+from widgets import create_tree_view  # noqa: E402
+
+
+class LogDialog(Gtk.Dialog):
+    frames_store: Gtk.ListStore = None
+    frames_tree_view: Gtk.TreeView = None
+    text_view: Gtk.TextView = None
+
+    def __init__(self, title: str, path: str) -> None:
+        super(LogDialog, self).__init__()
+        self.set_title(title)
+        self.set_border_width(20)
+        self.set_position(Gtk.WindowPosition.CENTER)
+        self.set_default_size(1000, 700)
+
+        self.path = path
+
+        self.create_content(title)
+        self.load_frames()
+
+    def create_content(self, title: str) -> None:
+        header_bar = Gtk.HeaderBar(title=title)
+        header_bar.set_show_close_button(True)
+        header_bar.set_decoration_layout(":close")
+
+        reload_button = Gtk.Button()
+        reload_button.set_tooltip_text("Reload the log")
+        reload_button.connect("clicked", self.on_reload_clicked)
+        reload_icon = Gio.ThemedIcon(name="view-refresh-symbolic")
+        reload_button.add(Gtk.Image.new_from_gicon(
+            reload_icon, Gtk.IconSize.BUTTON
+        ))
+        header_bar.pack_start(reload_button)
+
+        self.frames_store = Gtk.ListStore(str, str)
+        self.frames_tree_view = create_tree_view(
+            self.frames_store, ["Frame"]
+        )
+        self.frames_tree_view.get_selection().connect(
+            "changed", self.on_frame_selected
+        )
+        frames_scrolled = Gtk.ScrolledWindow()
+        frames_scrolled.set_policy(
+            Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC
+        )
+        frames_scrolled.add(self.frames_tree_view)
+
+        self.text_view = Gtk.TextView()
+        self.text_view.set_editable(False)
+        self.text_view.set_monospace(True)
+        text_scrolled = Gtk.ScrolledWindow()
+        text_scrolled.add(self.text_view)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        hbox.pack_start(frames_scrolled, False, False, 0)
+        hbox.pack_start(text_scrolled, True, True, 0)
+
+        self.set_titlebar(header_bar)
+        self.get_content_area().pack_start(hbox, True, True, 0)
+
+        self.show_all()
+
+    def load_frames(self) -> None:
+        self.frames_store.clear()
+        for frame in read_frames(self.path):
+            self.frames_store.append(
+                ["Start" if frame == START else frame, frame]
+            )
+        if len(self.frames_store) == 0:
+            self.text_view.get_buffer().set_text(
+                "Nothing has been logged yet."
+            )
+            return
+        # The last frame is the one that is rendering or failed.
+        self.frames_tree_view.get_selection().select_path(
+            len(self.frames_store) - 1
+        )
+
+    def on_reload_clicked(self, button: Gtk.Button) -> None:
+        self.load_frames()
+
+    def on_frame_selected(self, selection: Gtk.TreeSelection) -> None:
+        model, tree_iter = selection.get_selected()
+        if tree_iter is None:
+            return
+        self.text_view.get_buffer().set_text(
+            read_frame(self.path, model[tree_iter][1])
+        )
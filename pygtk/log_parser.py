@@ -0,0 +1,120 @@
+import bisect
+import re
+from typing import List, Optional, Tuple
+
+from config import Config
+from render_info import RenderInfo
+
+
+FRAME_PATTERN = re.compile(r"Fra:([0-9]+)")
+STATUS_PATTERN = re.compile(
+    r"Rendered\s+([0-9]+)/([0-9]+)\s+Tiles,\s+"
+    r"(?:Sample\s+([0-9]+)/([0-9]+))?\b"
+)
+SAVED_PATTERN = re.compile(r"Saved: '(.*)'")
+
+
+def parse_saved(line: str) -> Optional[str]:
+    if not line.startswith("Saved: "):
+        return None
+    m = SAVED_PATTERN.match(line)
+    return m.group(1) if m else None
+
+
+class LogParser:
+    __slots__ = (
+        "cycles", "layer_indices", "layer_count", "range_starts",
+        "range_offsets", "frame_count", "config"
+    )
+
+    def __init__(
+        self, render_engine: str, layers: List[str],
+        frames: List[Tuple[int, int]], config: Config
+    ) -> None:
+        self.cycles = render_engine == "CYCLES"
+        self.layer_indices = {layer: i for i, layer in enumerate(layers)}
+        self.layer_count = len(layers)
+        self.range_starts = [start for start, _ in frames]
+        self.range_offsets = []
+        self.frame_count = 0
+        for start, end in frames:
+            self.range_offsets.append(self.frame_count)
+            self.frame_count += end - start + 1
+        self.config = config
+
+    def frame_position(self, frame: int) -> int:
+        i = max(bisect.bisect_right(self.range_starts, frame) - 1, 0)
+        return self.range_offsets[i] + frame - self.range_starts[i]
+
+    def parse(
+        self, line: str
+    ) -> Tuple[Optional[RenderInfo], Optional[float]]:
+        parts = line.split(" | ")
+        if len(parts) < 3 or not parts[1].startswith("Time:") \
+                or "|" in parts[0] or "|" in parts[1]:
+            return None, None
+
+        frame = parts[0]
+        remaining = None
+        mem = None
+        layer = None
+        status = None
+        progress = None
+
+        i = 2
+        if parts[2].startswith("Remaining:"):
+            remaining = parts[2]
+            i = 3
+        if i < len(parts):
+            payload = parts[i]
+            if payload.startswith("Mem:") and i + 2 < len(parts):
+                mem = payload
+                layer = parts[i + 1]
+                status = " | ".join(parts[i + 2:])
+            elif payload.startswith("Compositing"):
+                status = " | ".join(parts[i:])
+
+        m = FRAME_PATTERN.match(frame)
+        if m is not None:
+            if self.cycles:
+                if status is not None and status.startswith("Rendered "):
+                    progress = self.parse_status(
+                        status, int(m.group(1)), layer
+                    )
+            else:
+                progress = self.frame_position(int(m.group(1))) \
+                    / self.frame_count * 100
+
+        render_info = RenderInfo(
+            frame, parts[1], remaining, mem, layer, status, self.config
+        )
+        return render_info, progress
+
+    def parse_status(
+        self, status: str, frame: int, layer: str
+    ) -> Optional[float]:
+        m = STATUS_PATTERN.match(status)
+        if m is None:
+            return None
+
+        tiles, total_tiles, samples, total_samples = m.groups()
+        if samples is None:
+            f_samples = 0.0
+        else:
+            samples = int(samples)
+            total_samples = int(total_samples)
+            f_samples = 0.0 if samples == total_samples \
+                else samples / total_samples
+
+        # Queue files for headless runs may not list the view layers.
+        layer_name = layer.split(", ", 1)[-1]
+        layer_index = self.layer_indices.get(layer_name)
+        layer_count = self.layer_count
+        if layer_index is None:
+            layer_index = 0
+            layer_count = 1
+
+        f_tiles = int(tiles) + f_samples
+        f_layers = layer_index + f_tiles / int(total_tiles)
+        f_frames = self.frame_position(frame) + f_layers / layer_count
+        return f_frames / self.frame_count * 100
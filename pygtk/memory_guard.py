@@ -0,0 +1,148 @@
+import os
+import re
+import resource
+import shutil
+from typing import Callable, Dict, List, Optional
+
+from render_history import RenderHistory
+from render_task import RenderTask
+
+
+MIB = 1024 * 1024
+PEAK_PATTERN = re.compile(r"Peak:? ?([0-9.]+)([KMG])")
+UNITS = {"K": 1024, "M": MIB, "G": 1024 * MIB}
+
+
+def read_meminfo() -> Dict[str, int]:
+    meminfo = {}
+    try:
+        with open("/proc/meminfo", "r") as file:
+            for line in file:
+                name, value = line.split(":", 1)
+                meminfo[name] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return meminfo
+
+
+def systemd_run_available() -> bool:
+    if shutil.which("systemd-run") is None:
+        return False
+    # Scopes of the user manager need a session bus to talk to.
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR", "")
+    return "DBUS_SESSION_BUS_ADDRESS" in os.environ \
+        or bool(runtime_dir) and os.path.exists(f"{runtime_dir}/bus")
+
+
+def parse_peak_memory(text: str) -> Optional[int]:
+    m = PEAK_PATTERN.search(text)
+    if m is None:
+        return None
+    return int(float(m.group(1)) * UNITS[m.group(2)])
+
+
+class MemoryGuard:
+    def __init__(
+        self, history: RenderHistory,
+        current_rss: Callable[[RenderTask], int], limit_mode: str
+    ) -> None:
+        self.history = history
+        self.current_rss = current_rss
+        self.limit_mode = limit_mode
+        self.limit_swap = False
+        self.estimates: Dict[RenderTask, int] = {}
+        self.running: Dict[RenderTask, int] = {}
+
+    def estimate(self, render_task: RenderTask) -> int:
+        if render_task not in self.estimates:
+            peak = self.history.peak_memory(render_task)
+            if peak is not None:
+                estimate = int(peak * 1.1)
+            else:
+                # Without history assume the scene takes a few times its
+                # file size plus full float render buffers for every layer.
+                try:
+                    file_size = os.path.getsize(render_task.blend_file)
+                except OSError:
+                    file_size = 0
+                pixels = render_task.resolution_x * render_task.resolution_y \
+                    * render_task.resolution_percentage ** 2 // 10000
+                layers = max(1, len(render_task.layers))
+                estimate = 512 * MIB + 4 * file_size + pixels * 64 * layers
+            self.estimates[render_task] = estimate
+        return self.estimates[render_task]
+
+    def available(self) -> int:
+        meminfo = read_meminfo()
+        return meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+
+    def fits(self, render_task: RenderTask) -> bool:
+        # Running tasks that haven't reached their peak yet will still take
+        # memory that MemAvailable counts as free.
+        outstanding = sum(
+            max(0, estimate - self.current_rss(running_task))
+            for running_task, estimate in self.running.items()
+        )
+        return self.estimate(render_task) + outstanding <= self.available()
+
+    def start_task(self, render_task: RenderTask) -> None:
+        self.running[render_task] = self.estimate(render_task)
+
+    def release(self, render_task: RenderTask) -> None:
+        self.running.pop(render_task, None)
+        self.estimates.pop(render_task, None)
+
+    def record_peak(self, render_task: RenderTask, peak: int) -> None:
+        if peak > 0:
+            self.history.record_peak_memory(render_task, peak)
+
+    def limit(self, render_task: RenderTask) -> Optional[int]:
+        # Only a peak that was measured before is a safe base, a guess
+        # could kill a heavy scene on its first render.
+        peak = self.history.peak_memory(render_task)
+        if peak is None:
+            return None
+        total = read_meminfo().get("MemTotal", 0)
+        limit = max(2 * peak, 2048 * MIB)
+        return min(limit, int(total * 0.9)) if total else limit
+
+    def wrap_command(
+        self, render_task: RenderTask, cmd_line: List[str]
+    ) -> List[str]:
+        if self.limit_mode != "cgroup" or not systemd_run_available():
+            return cmd_line
+        limit = self.limit(render_task)
+        if limit is None:
+            return cmd_line
+        properties = ["-p", f"MemoryMax={limit}"]
+        if self.limit_swap:
+            properties += ["-p", "MemorySwapMax=0"]
+        return [
+            "systemd-run", "--user", "--scope", "--quiet"
+        ] + properties + cmd_line
+
+    def preexec(
+        self, render_task: RenderTask
+    ) -> Optional[Callable[[], None]]:
+        if self.limit_mode != "rlimit" and not (
+            self.limit_mode == "cgroup" and not systemd_run_available()
+        ):
+            return None
+        if render_task.render_device == "GPU":
+            # GPU drivers reserve huge address ranges up front.
+            return None
+        limit = self.limit(render_task)
+        if limit is None:
+            return None
+        # The address space limit is much coarser than a cgroup because
+        # Blender maps far more than it touches, so leave extra room and
+        # never go below the installed memory.
+        limit = max(
+            4 * limit, read_meminfo().get("MemTotal", 0)
+            + read_meminfo().get("SwapTotal", 0)
+        )
+
+        def set_limit() -> None:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+        return set_limit
@@ -0,0 +1,90 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import data_path
+from file_info import FileInfo
+
+
+class MetadataCache:
+    def __init__(self, path: str) -> None:
+        # The file list looks files up in a worker thread, so access to the
+        # connection is serialized instead of bound to one thread.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, info TEXT)"
+        )
+        self.connection.commit()
+
+    def open_default() -> "MetadataCache":
+        return MetadataCache(data_path("metadata.sqlite"))
+
+    def file_key(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def lookup(self, path: str) -> Tuple[bool, Optional[FileInfo]]:
+        # Whether the file is cached at its current size and mtime, and its
+        # info, which is None for files Blender couldn't read.
+        key = MetadataCache.file_key(path)
+        if key is None:
+            return False, None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime, info FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or (row[0], row[1]) != key:
+            return False, None
+        if row[2] is None:
+            return True, None
+        return True, FileInfo.from_dict(json.loads(row[2]))
+
+    def get(self, path: str) -> Optional[FileInfo]:
+        return self.lookup(path)[1]
+
+    def get_many(self, paths: Iterable[str]) -> Dict[str, FileInfo]:
+        file_infos = {}
+        for path in paths:
+            file_info = self.get(path)
+            if file_info is not None:
+                file_infos[path] = file_info
+        return file_infos
+
+    def missing(self, paths: Iterable[str]) -> List[str]:
+        # Files that can't be stat'ed can't be read by Blender either, so
+        # they are left out instead of being probed on every scan.
+        return [
+            path for path in paths
+            if MetadataCache.file_key(path) is not None
+            and not self.lookup(path)[0]
+        ]
+
+    def put(self, path: str, file_info: Optional[FileInfo]) -> None:
+        self.put_many({path: file_info})
+
+    def put_many(self, file_infos: Dict[str, Optional[FileInfo]]) -> None:
+        rows = []
+        for path, file_info in file_infos.items():
+            key = MetadataCache.file_key(path)
+            if key is None:
+                continue
+            info = None
+            if file_info is not None:
+                info = json.dumps(file_info.to_dict())
+            rows.append((path, key[0], key[1], info))
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows
+            )
+            self.connection.commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -7,13 +7,15 @@ gi.require_version("Notify", "0.7")
 
 from gi.repository import Gtk, Notify, Gdk, Gio  # noqa: E402
 
+import datetime  # noqa: E402
+import itertools  # noqa: E402
 import os   # noqa: E402
-import glob  # noqa: E402
 import trio  # noqa: E402
 import trio_gtk  # noqa: E402
 import subprocess  # noqa: E402
-import re  # noqa: E402
-from typing import List, Optional, Tuple  # noqa: E402
+import time  # noqa: E402
+from typing import Any, Callable, Dict, List, Optional, Set, \
+    Tuple  # noqa: E402
 
 from widgets import create_label, create_entry, create_combo_box, \
     create_tree_view, create_file_chooser_button, \
@@ -21,8 +23,34 @@ from widgets import create_label, create_entry, create_combo_box, \
 
 from render_task import RenderTask  # noqa: E402
 
+from scheduler import Scheduler  # noqa: E402
+from task_queue import TaskQueue  # noqa: E402
+from throttle import Throttle  # noqa: E402
 
-from config import Config, ConfigDialog  # noqa: E402
+from renderer import Renderer, post_rendering_command  # noqa: E402
+
+from file_info import ENGINE_NAMES, FileInfo, file_info_columns, \
+    read_file_info, read_file_infos  # noqa: E402
+
+from metadata_cache import MetadataCache  # noqa: E402
+from queue_journal import QueueJournal  # noqa: E402
+from queue_model import QueueModel  # noqa: E402
+from render_history import RenderHistory  # noqa: E402
+from eta import EtaPredictor, format_duration  # noqa: E402
+from deadline import DeadlinePlanner, parse_finish_time  # noqa: E402
+from resource_sampler import ResourceSampler  # noqa: E402
+from memory_guard import MemoryGuard  # noqa: E402
+from render_log import MIB, RenderLogs  # noqa: E402
+from cpu_topology import CpuAllocator, parse_cpu_list  # noqa: E402
+from process_control import PRIORITY_LEVELS, \
+    watch_user_activity  # noqa: E402
+
+from file_index import BlendFileIndex, open_watcher  # noqa: E402
+
+
+from config import Config, data_path, query_blender_config  # noqa: E402
+from config_dialog import ConfigDialog  # noqa: E402
+from log_dialog import LogDialog  # noqa: E402
 
 from render_info import RenderInfo  # noqa: E402
 
@@ -34,6 +62,7 @@ config: Optional[Config] = None
 
 class MainWindow(Gtk.Window):
     stack: Gtk.Stack = None
+    unbuilt_pages: Dict[str, Callable[[], Gtk.Widget]] = {}
     info_bar: Gtk.InfoBar = None
     info_bar_label: Gtk.Label = None
     blend_files_tree_view: Gtk.TreeView = None
@@ -48,20 +77,59 @@ class MainWindow(Gtk.Window):
     output_type_combo_box: Gtk.ComboBox = None
     start_frame_spin: Gtk.SpinButton = None
     end_frame_spin: Gtk.SpinButton = None
+    chunk_workers_spin: Gtk.SpinButton = None
+    resume_switch: Gtk.Switch = None
     output_format_combo_box: Gtk.ComboBox = None
     output_name_entry: Gtk.Entry = None
     output_path_chooser_button: Gtk.FileChooserButton = None
     python_expressions_entry: Gtk.Entry = None
+    threads_spin: Gtk.SpinButton = None
+    cpus_entry: Gtk.Entry = None
     post_rendering_combo_box: Gtk.ComboBox = None
+    finish_by_entry: Gtk.Entry = None
+    priority_spin: Gtk.SpinButton = None
+    wait_for_queue_switch: Gtk.Switch = None
     render_button: Gtk.Button = None
     queue_button: Gtk.Button = None
     render_tasks_store: Gtk.ListStore = None
+    queue_tree_view: Gtk.TreeView = None
+    pause_button: Gtk.Button = None
+    task_priority_combo_box: Gtk.ComboBox = None
+    task_control_label: Gtk.Label = None
+    log_button: Gtk.Button = None
 
     layers: List[str] = []
-    render_queue: List[RenderTask] = []
-    current_render_task: Optional[RenderTask] = None
+    queue_model: QueueModel = None
+    progress_throttle: Throttle = None
+    info_throttle: Throttle = None
+    scheduler: Optional[Scheduler] = None
+    task_queue: TaskQueue = None
+    dragged_task_id: Optional[str] = None
     nusery: trio.Nursery = None
-    process: Optional[trio.Process] = None
+    renderer: Renderer = None
+    file_info_cancel_scope: Optional[trio.CancelScope] = None
+    metadata_cache: MetadataCache = None
+    journal: QueueJournal = None
+    eta_predictor: EtaPredictor = None
+    deadline_planner: DeadlinePlanner = None
+    resource_sampler: ResourceSampler = None
+    memory_guard: MemoryGuard = None
+    queue_eta_text: str = ""
+    eta_remaining: Dict[RenderTask, Optional[float]] = {}
+    eta_active: Set[RenderTask] = set()
+    eta_changed: Set[RenderTask] = set()
+    eta_changed_files: Set[str] = set()
+    eta_files_due: float = 0
+    blend_file_rows: Dict[str, List[Gtk.TreeRowReference]] = {}
+    recent_files_row: Optional[Gtk.TreeRowReference] = None
+    recent_files_mtime: Optional[int] = None
+    default_dir_files_row: Optional[Gtk.TreeRowReference] = None
+    default_dir_rows: Dict[str, Gtk.TreeRowReference] = {}
+    file_index: Optional[BlendFileIndex] = None
+    file_index_cancel_scope: Optional[trio.CancelScope] = None
+    file_index_lock: trio.Lock = None
+    metadata_scan_queue: Dict[str, None] = {}
+    metadata_scan_event: trio.Event = None
     do_post_rendering: bool = None
 
     def __init__(self, nursery: trio.Nursery) -> None:
@@ -71,12 +139,65 @@ class MainWindow(Gtk.Window):
         self.set_position(Gtk.WindowPosition.CENTER)
 
         self.do_post_rendering = True
+        self.task_queue = TaskQueue()
+        self.progress_throttle = Throttle(
+            config.settings["ui_update_rate"], self.apply_progress
+        )
+        self.info_throttle = Throttle(
+            config.settings["ui_update_rate"], self.apply_render_info
+        )
+        self.renderer = Renderer(
+            config, self.on_render_info, self.update_progress,
+            self.on_render_resumed, self.on_frame_saved
+        )
+        self.render_logs = RenderLogs.open_default()
+        self.renderer.render_logs = self.render_logs
 
         self.nursery = nursery
 
-        self.create_content()
+        self.metadata_cache = MetadataCache.open_default()
+        self.blend_file_rows = {}
+        self.default_dir_rows = {}
+        self.file_index_lock = trio.Lock()
+        self.metadata_scan_queue = {}
+        self.metadata_scan_event = trio.Event()
+        self.journal = QueueJournal.open_default()
+        render_history = RenderHistory.open_default()
+        self.eta_predictor = EtaPredictor(render_history)
+        self.deadline_planner = DeadlinePlanner(
+            self.eta_predictor, config.settings["deadline_min_samples"],
+            config.settings["deadline_min_resolution"]
+        )
+        self.resource_sampler = ResourceSampler(
+            config.settings["resource_sample_interval"],
+            lambda render_task: self.renderer.task_pids.get(render_task, [])
+        )
+        self.memory_guard = MemoryGuard(
+            render_history, self.resource_sampler.current_rss,
+            config.settings["memory_limit"]
+        )
+        self.queue_eta_text = ""
+        self.eta_remaining = {}
+        self.eta_active = set()
+        self.eta_changed = set()
+        self.eta_changed_files = set()
 
+        self.create_content()
+        self.nursery.start_soon(self.load_content)
+        self.nursery.start_soon(self.scan_metadata)
+
+    async def load_content(self) -> None:
+        # Let the window show up before the queue and the file lists are
+        # read.
+        await trio.sleep(0)
+        self.restore_queue()
         self.load_blend_files()
+        if not config.settings["blender_config"]:
+            # No known config directory, so Blender has to be asked.
+            config_dir = await trio.to_thread.run_sync(query_blender_config)
+            if config_dir:
+                config.modify({"blender_config": config_dir})
+                self.load_recent_files()
 
     def create_content(self) -> None:
         self.stack = Gtk.Stack()
@@ -126,9 +247,9 @@ class MainWindow(Gtk.Window):
         header_bar.pack_start(reload_button)
         header_bar.pack_end(settings_button)
 
-        self.blend_files_store = Gtk.TreeStore(str)
+        self.blend_files_store = Gtk.TreeStore(str, str, str, str)
         self.blend_files_tree_view = create_tree_view(
-            self.blend_files_store, ["File"]
+            self.blend_files_store, ["File", "Engine", "Frames", "Resolution"]
         )
         self.blend_files_tree_view.set_enable_tree_lines(True)
         self.blend_files_tree_view.connect(
@@ -137,10 +258,53 @@ class MainWindow(Gtk.Window):
 
         blend_files_scrolled = Gtk.ScrolledWindow()
         blend_files_scrolled.set_policy(
-            Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC
+            Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC
         )
         blend_files_scrolled.add(self.blend_files_tree_view)
 
+        self.render_tasks_store = Gtk.ListStore(
+            str, str, str, str, int, str, str, str, str
+        )
+        self.queue_model = QueueModel(self.render_tasks_store)
+
+        self.render_button = Gtk.Button(label="Render")
+        self.render_button.set_sensitive(False)
+        self.render_button.set_size_request(0, 0)
+        self.render_button.get_style_context().add_class("suggested-action")
+        self.render_button.connect("clicked", self.on_render_clicked)
+
+        # Only the page that is shown first is built right away, the others
+        # are filled in when they are opened.
+        self.unbuilt_pages = {
+            "render_settings": self.create_render_settings_page,
+            "queue": self.create_queue_page
+        }
+        self.stack.add_titled(
+            blend_files_scrolled, "blend_files", "Blend Files"
+        )
+        for name, title in [
+            ("render_settings", "Render Settings"), ("queue", "Queue")
+        ]:
+            self.stack.add_titled(
+                Gtk.Box(orientation=Gtk.Orientation.VERTICAL), name, title
+            )
+        self.stack.connect("notify::visible-child-name", self.on_page_shown)
+
+        self.set_titlebar(header_bar)
+        self.add(vbox)
+
+    def on_page_shown(self, stack: Gtk.Stack, param: Any) -> None:
+        self.build_page(stack.get_visible_child_name())
+
+    def build_page(self, name: str) -> None:
+        create_page = self.unbuilt_pages.pop(name, None)
+        if create_page is None:
+            return
+        page = self.stack.get_child_by_name(name)
+        page.pack_start(create_page(), True, True, 0)
+        page.show_all()
+
+    def create_render_settings_page(self) -> Gtk.Grid:
         blend_file_label = create_label("Path to .blend file")
         self.blend_file_chooser_button = create_file_chooser_button(
             self, "Select .blend file", Gtk.FileChooserAction.OPEN,
@@ -193,6 +357,15 @@ class MainWindow(Gtk.Window):
         self.end_frame_spin = create_spin_button(250, 0, 1048574)
         self.end_frame_spin.set_sensitive(False)
 
+        chunk_workers_label = create_label("Parallel Chunks")
+        self.chunk_workers_spin = create_spin_button(1, 1, 256)
+        self.chunk_workers_spin.set_sensitive(False)
+
+        resume_label = create_label("Skip Finished Frames")
+        self.resume_switch = Gtk.Switch()
+        self.resume_switch.set_halign(Gtk.Align.START)
+        self.resume_switch.set_sensitive(False)
+
         output_format_label = create_label("Output Format")
         format_store = Gtk.ListStore(str, str)
         format_store.append([".blend file", ".blend file"])
@@ -225,40 +398,37 @@ class MainWindow(Gtk.Window):
         python_expressions_label = create_label("Python Expressions")
         self.python_expressions_entry = create_entry()
 
+        threads_label = create_label("Render Threads")
+        self.threads_spin = create_spin_button(0, 0, 4096)
+        self.threads_spin.connect("output", self.on_threads_output)
+
+        cpus_label = create_label("CPUs")
+        self.cpus_entry = create_entry()
+        self.cpus_entry.set_placeholder_text("Automatic, e.g. 0-7,16-23")
+
         post_rendering_label = create_label("After rendering is finished")
         post_rendering_options = ["Do nothing", "Suspend", "Shutdown"]
         self.post_rendering_combo_box = create_combo_box(
             labels=post_rendering_options
         )
 
-        self.queue_button = Gtk.Button(label="Queue")
-        self.queue_button.get_style_context().add_class("suggested-action")
-        self.queue_button.connect("clicked", self.on_queue_clicked)
-
-        self.render_tasks_store = Gtk.ListStore(str, str, str, str, int)
-        columns = ["File", "Engine", "Type", "Output"]
-        queue_tree_view = create_tree_view(self.render_tasks_store, columns)
-        queue_tree_view.connect(
-            "key-press-event", self.on_queue_tree_view_key_pressed
+        finish_by_label = create_label("Finish Queue By")
+        self.finish_by_entry = create_entry()
+        self.finish_by_entry.set_placeholder_text("HH:MM")
+        self.finish_by_entry.set_tooltip_text(
+            "Lower samples and resolution where needed to finish in time"
         )
-        queue_tree_view.set_grid_lines(Gtk.TreeViewGridLines.VERTICAL)
-        finished_progress_renderer = Gtk.CellRendererProgress()
-        finished_progress_column = Gtk.TreeViewColumn(
-            "Progress", finished_progress_renderer, value=4
-        )
-        finished_progress_column.set_min_width(200)
-        queue_tree_view.append_column(finished_progress_column)
 
-        self.render_button = Gtk.Button(label="Render")
-        self.render_button.set_sensitive(False)
-        self.render_button.set_size_request(0, 0)
-        self.render_button.get_style_context().add_class("suggested-action")
-        self.render_button.connect("clicked", self.on_render_clicked)
+        priority_label = create_label("Priority")
+        self.priority_spin = create_spin_button(0, -100, 100)
 
-        queue_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
-        queue_vbox.set_halign(Gtk.Align.CENTER)
-        queue_vbox.pack_start(queue_tree_view, True, True, 6)
-        queue_vbox.pack_start(self.render_button, False, False, 6)
+        wait_for_queue_label = create_label("Wait for Queued Tasks")
+        self.wait_for_queue_switch = Gtk.Switch()
+        self.wait_for_queue_switch.set_halign(Gtk.Align.START)
+
+        self.queue_button = Gtk.Button(label="Queue")
+        self.queue_button.get_style_context().add_class("suggested-action")
+        self.queue_button.connect("clicked", self.on_queue_clicked)
 
         grid = Gtk.Grid(column_spacing=12, row_spacing=12)
         grid.set_halign(Gtk.Align.CENTER)
@@ -283,26 +453,111 @@ class MainWindow(Gtk.Window):
         grid.attach(self.start_frame_spin, 1, 8, 1, 1)
         grid.attach(end_frame_label, 0, 9, 1, 1)
         grid.attach(self.end_frame_spin, 1, 9, 1, 1)
-        grid.attach(output_format_label, 0, 10, 1, 1)
-        grid.attach(self.output_format_combo_box, 1, 10, 1, 1)
-        grid.attach(output_name_label, 0, 11, 1, 1)
-        grid.attach(self.output_name_entry, 1, 11, 1, 1)
-        grid.attach(output_path_label, 0, 12, 1, 1)
-        grid.attach(self.output_path_chooser_button, 1, 12, 1, 1)
-        grid.attach(python_expressions_label, 0, 13, 1, 1)
-        grid.attach(self.python_expressions_entry, 1, 13, 1, 1)
-        grid.attach(post_rendering_label, 0, 14, 1, 1)
-        grid.attach(self.post_rendering_combo_box, 1, 14, 1, 1)
-        grid.attach(self.queue_button, 1, 15, 1, 1)
+        grid.attach(chunk_workers_label, 0, 10, 1, 1)
+        grid.attach(self.chunk_workers_spin, 1, 10, 1, 1)
+        grid.attach(resume_label, 0, 11, 1, 1)
+        grid.attach(self.resume_switch, 1, 11, 1, 1)
+        grid.attach(output_format_label, 0, 12, 1, 1)
+        grid.attach(self.output_format_combo_box, 1, 12, 1, 1)
+        grid.attach(output_name_label, 0, 13, 1, 1)
+        grid.attach(self.output_name_entry, 1, 13, 1, 1)
+        grid.attach(output_path_label, 0, 14, 1, 1)
+        grid.attach(self.output_path_chooser_button, 1, 14, 1, 1)
+        grid.attach(python_expressions_label, 0, 15, 1, 1)
+        grid.attach(self.python_expressions_entry, 1, 15, 1, 1)
+        grid.attach(threads_label, 0, 16, 1, 1)
+        grid.attach(self.threads_spin, 1, 16, 1, 1)
+        grid.attach(cpus_label, 0, 17, 1, 1)
+        grid.attach(self.cpus_entry, 1, 17, 1, 1)
+        grid.attach(post_rendering_label, 0, 18, 1, 1)
+        grid.attach(self.post_rendering_combo_box, 1, 18, 1, 1)
+        grid.attach(finish_by_label, 0, 19, 1, 1)
+        grid.attach(self.finish_by_entry, 1, 19, 1, 1)
+        grid.attach(priority_label, 0, 20, 1, 1)
+        grid.attach(self.priority_spin, 1, 20, 1, 1)
+        grid.attach(wait_for_queue_label, 0, 21, 1, 1)
+        grid.attach(self.wait_for_queue_switch, 1, 21, 1, 1)
+        grid.attach(self.queue_button, 1, 22, 1, 1)
+
+        return grid
+
+    def create_queue_page(self) -> Gtk.Box:
+        columns = ["File", "Engine", "Type", "Output"]
+        self.queue_tree_view = create_tree_view(
+            self.render_tasks_store, columns
+        )
+        self.queue_tree_view.connect(
+            "key-press-event", self.on_queue_tree_view_key_pressed
+        )
+        self.queue_tree_view.set_grid_lines(Gtk.TreeViewGridLines.VERTICAL)
+        self.queue_tree_view.get_selection().set_mode(
+            Gtk.SelectionMode.MULTIPLE
+        )
+        self.queue_model.tree_view = self.queue_tree_view
+        self.queue_tree_view.set_reorderable(True)
+        self.queue_tree_view.connect("drag-begin", self.on_queue_drag_begin)
+        self.queue_tree_view.connect("drag-end", self.on_queue_drag_end)
+        state_column = Gtk.TreeViewColumn(
+            "State", Gtk.CellRendererText(), text=8
+        )
+        self.queue_tree_view.append_column(state_column)
+        finished_progress_renderer = Gtk.CellRendererProgress()
+        finished_progress_column = Gtk.TreeViewColumn(
+            "Progress", finished_progress_renderer, value=4
+        )
+        finished_progress_column.set_min_width(200)
+        self.queue_tree_view.append_column(finished_progress_column)
+        resources_column = Gtk.TreeViewColumn(
+            "Resources", Gtk.CellRendererText(), text=6
+        )
+        self.queue_tree_view.append_column(resources_column)
+        eta_column = Gtk.TreeViewColumn(
+            "Remaining", Gtk.CellRendererText(), text=5
+        )
+        self.queue_tree_view.append_column(eta_column)
+        self.queue_tree_view.get_selection().connect(
+            "changed", self.on_queue_selection_changed
+        )
 
-        self.stack.add_titled(
-            blend_files_scrolled, "blend_files", "Blend Files"
+        self.pause_button = Gtk.Button(label="Pause")
+        self.pause_button.set_sensitive(False)
+        self.pause_button.connect("clicked", self.on_pause_clicked)
+        self.task_priority_combo_box = create_combo_box(
+            labels=PRIORITY_LEVELS
+        )
+        self.task_priority_combo_box.set_sensitive(False)
+        self.task_priority_combo_box.connect(
+            "changed", self.on_task_priority_changed
+        )
+        self.task_control_label = create_label("")
+        self.log_button = Gtk.Button(label="Log")
+        self.log_button.set_sensitive(False)
+        self.log_button.connect("clicked", self.on_log_clicked)
+        task_control_hbox = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=12
+        )
+        task_control_hbox.pack_start(self.pause_button, False, False, 0)
+        task_control_hbox.pack_start(create_label("Priority"), False, False, 0)
+        task_control_hbox.pack_start(
+            self.task_priority_combo_box, False, False, 0
         )
-        self.stack.add_titled(grid, "render_settings", "Render Settings")
-        self.stack.add_titled(queue_vbox, "queue", "Queue")
+        task_control_hbox.pack_start(self.task_control_label, True, True, 0)
+        task_control_hbox.pack_end(self.log_button, False, False, 0)
 
-        self.set_titlebar(header_bar)
-        self.add(vbox)
+        queue_scrolled = Gtk.ScrolledWindow()
+        queue_scrolled.set_policy(
+            Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC
+        )
+        queue_scrolled.set_propagate_natural_width(True)
+        queue_scrolled.add(self.queue_tree_view)
+
+        queue_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        queue_vbox.set_halign(Gtk.Align.CENTER)
+        queue_vbox.pack_start(queue_scrolled, True, True, 6)
+        queue_vbox.pack_start(task_control_hbox, False, False, 0)
+        queue_vbox.pack_start(self.render_button, False, False, 6)
+
+        return queue_vbox
 
     def on_settings_clicked(self, button: Gtk.Button) -> None:
         config_dialog = ConfigDialog(config)
@@ -318,6 +573,51 @@ class MainWindow(Gtk.Window):
                 .default_dir_chooser_button.get_filename()
             settings["post_rendering_timer"] = config_dialog \
                 .post_rendering_spin.get_value_as_int()
+            settings["parallel_slots"] = config_dialog \
+                .parallel_slots_spin.get_value_as_int()
+            settings["thread_budget"] = config_dialog \
+                .thread_budget_spin.get_value_as_int()
+            settings["persistent_workers"] = config_dialog \
+                .persistent_workers_switch.get_active()
+            settings["worker_max_jobs"] = config_dialog \
+                .worker_max_jobs_spin.get_value_as_int()
+            settings["worker_max_memory"] = config_dialog \
+                .worker_max_memory_spin.get_value_as_int()
+            settings["ui_update_rate"] = config_dialog \
+                .ui_update_rate_spin.get_value_as_int()
+            settings["resume_queue_on_startup"] = config_dialog \
+                .resume_queue_switch.get_active()
+            settings["resource_sample_interval"] = config_dialog \
+                .resource_interval_spin.get_value_as_int()
+            resource_export_iter = config_dialog.resource_export_combo_box \
+                .get_active_iter()
+            settings["resource_export"] = config_dialog \
+                .resource_export_combo_box.get_model()[resource_export_iter][0]
+            settings["resource_export_dir"] = config_dialog \
+                .resource_export_dir_chooser_button.get_filename() or ""
+            settings["memory_admission"] = config_dialog \
+                .memory_admission_switch.get_active()
+            memory_limit_iter = config_dialog.memory_limit_combo_box \
+                .get_active_iter()
+            settings["memory_limit"] = config_dialog \
+                .memory_limit_combo_box.get_model()[memory_limit_iter][1]
+            settings["memory_limit_swap"] = config_dialog \
+                .memory_limit_swap_switch.get_active()
+            settings["batch_tasks"] = config_dialog \
+                .batch_tasks_switch.get_active()
+            settings["deadline_min_samples"] = config_dialog \
+                .deadline_min_samples_spin.get_value_as_int()
+            settings["deadline_min_resolution"] = config_dialog \
+                .deadline_min_resolution_spin.get_value_as_int()
+            yield_to_users_iter = config_dialog.yield_to_users_combo_box \
+                .get_active_iter()
+            settings["yield_to_users"] = config_dialog \
+                .yield_to_users_combo_box.get_model()[yield_to_users_iter][1]
+            settings["pin_cpus"] = config_dialog.pin_cpus_switch.get_active()
+            settings["log_max_size"] = config_dialog.log_max_size_spin \
+                .get_value_as_int()
+            settings["log_max_age"] = config_dialog.log_max_age_spin \
+                .get_value_as_int()
             for i in range(6):
                 render_info_iter = config_dialog.render_info_store.get_iter(i)
                 settings["render_info"][i]["display_name"] = config_dialog \
@@ -336,36 +636,250 @@ class MainWindow(Gtk.Window):
         self.load_blend_files()
 
     def load_blend_files(self) -> None:
-        self.blend_files_store.clear()
+        self.load_recent_files()
 
-        try:
-            file = open(
-                f"{config.settings['blender_config']}/recent-files.txt", "r"
+        root = config.settings["default_blender_dir"]
+        if self.file_index is None or self.file_index.root != root:
+            self.open_file_index(root)
+        else:
+            self.nursery.start_soon(
+                self.refresh_file_index, self.file_index, [root]
             )
+
+    def load_recent_files(self) -> None:
+        path = f"{config.settings['blender_config']}/recent-files.txt"
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self.recent_files_mtime:
+            return
+        self.recent_files_mtime = mtime
+
+        if self.recent_files_row is not None \
+                and self.recent_files_row.valid():
+            self.blend_files_store.remove(self.blend_files_store.get_iter(
+                self.recent_files_row.get_path()
+            ))
+            self.prune_blend_file_rows()
+        self.recent_files_row = None
+
+        try:
+            file = open(path, "r")
             lines = file.readlines()
             file.close()
+        except IOError:
+            return
+
+        recent_files_iter = self.blend_files_store.insert(
+            None, 0, ["Recent", "", "", ""]
+        )
+        file_infos = self.metadata_cache.get_many(
+            line.strip() for line in lines
+        )
+        for line in lines:
+            self.append_blend_file(
+                recent_files_iter, line.strip(),
+                file_infos.get(line.strip())
+            )
+        self.recent_files_row = self.row_reference(recent_files_iter)
+        self.blend_files_tree_view.expand_row(
+            self.recent_files_row.get_path(), False
+        )
+        self.queue_metadata_scan([
+            line.strip() for line in lines
+            if line.strip() not in file_infos
+        ])
 
-            recent_files_row = self.blend_files_store.append(None, ["Recent"])
+    def open_file_index(self, root: str) -> None:
+        if self.file_index_cancel_scope is not None:
+            self.file_index_cancel_scope.cancel()
 
-            for line in lines:
-                path = line.strip()
-                self.blend_files_store.append(recent_files_row, [path])
-        except IOError:
-            pass
+        if self.default_dir_files_row is not None \
+                and self.default_dir_files_row.valid():
+            self.blend_files_store.remove(self.blend_files_store.get_iter(
+                self.default_dir_files_row.get_path()
+            ))
+            self.prune_blend_file_rows()
+        self.default_dir_rows = {}
+
+        default_dir_files_iter = self.blend_files_store.append(
+            None, ["Default Directory", "", "", ""]
+        )
+        self.default_dir_files_row = self.row_reference(
+            default_dir_files_iter
+        )
 
-        default_dir_files_row = self.blend_files_store.append(
-            None, ["Default Directory"]
+        self.file_index = BlendFileIndex(
+            root, data_path("file_index.json")
         )
+        self.file_index_cancel_scope = trio.CancelScope()
+        self.nursery.start_soon(
+            self.watch_file_index, self.file_index,
+            self.file_index_cancel_scope
+        )
+
+    async def watch_file_index(
+        self, file_index: BlendFileIndex, cancel_scope: trio.CancelScope
+    ) -> None:
+        with cancel_scope:
+            # Show the files of the last session first, the scan only
+            # applies what changed since then.
+            async with self.file_index_lock:
+                await trio.to_thread.run_sync(file_index.load)
+                paths = sorted(file_index.files())
+                await self.add_default_dir_files(file_index, paths)
+
+            await self.refresh_file_index(file_index, [file_index.root])
+            watcher = open_watcher()
+            poll_interval = config.settings["file_index_poll_interval"]
+            next_poll = trio.current_time() + poll_interval
+            try:
+                while True:
+                    # Changes made by other machines on network file systems
+                    # never show up in inotify, so the whole tree is still
+                    # compared now and then.
+                    directories = [file_index.root]
+                    with trio.move_on_at(next_poll) as poll_scope:
+                        if watcher is None or watcher.exhausted:
+                            await trio.sleep_forever()
+                        async with self.file_index_lock:
+                            watcher.watch(list(file_index.directories))
+                        changed = await watcher.changed_directories()
+                        with trio.move_on_after(0.5):
+                            while True:
+                                changed += \
+                                    await watcher.changed_directories()
+                        directories = changed
+                    if poll_scope.cancelled_caught:
+                        next_poll = trio.current_time() + poll_interval
+                    await self.refresh_file_index(file_index, directories)
+            finally:
+                if watcher is not None:
+                    watcher.close()
+
+    async def refresh_file_index(
+        self, file_index: BlendFileIndex, directories: List[str]
+    ) -> None:
+        async with self.file_index_lock:
+            added, removed = await trio.to_thread.run_sync(
+                file_index.update, directories
+            )
+            if added or removed:
+                await trio.to_thread.run_sync(file_index.save)
+            if file_index is not self.file_index:
+                return
+            self.remove_default_dir_files(removed)
+            await self.add_default_dir_files(file_index, sorted(added))
 
-        for dir, _, _ in os.walk(config.settings["default_blender_dir"]):
-            files = glob.glob(os.path.join(dir, "*.blend"))
-            if files:
-                for file in files:
-                    self.blend_files_store.append(
-                        default_dir_files_row, [file]
+    async def add_default_dir_files(
+        self, file_index: BlendFileIndex, paths: List[str]
+    ) -> None:
+        # Looking up thousands of files on a network share takes long, so
+        # it happens in a thread and the rows are added a chunk at a time.
+        for i in range(0, len(paths), 500):
+            chunk = [
+                path for path in paths[i:i + 500]
+                if path not in self.default_dir_rows
+            ]
+            file_infos = await trio.to_thread.run_sync(
+                self.metadata_cache.get_many, chunk
+            )
+            if file_index is not self.file_index:
+                return
+            expand = len(self.default_dir_rows) == 0
+            parent = self.blend_files_store.get_iter(
+                self.default_dir_files_row.get_path()
+            )
+            for path in chunk:
+                if path not in self.default_dir_rows:
+                    self.default_dir_rows[path] = self.append_blend_file(
+                        parent, path, file_infos.get(path)
                     )
+            if expand and chunk:
+                self.blend_files_tree_view.expand_row(
+                    self.default_dir_files_row.get_path(), False
+                )
+            self.queue_metadata_scan([
+                path for path in chunk if path not in file_infos
+            ])
+            await trio.sleep(0)
+
+    def remove_default_dir_files(self, paths: List[str]) -> None:
+        for path in paths:
+            row = self.default_dir_rows.pop(path, None)
+            if row is None:
+                continue
+            if row.valid():
+                self.blend_files_store.remove(
+                    self.blend_files_store.get_iter(row.get_path())
+                )
+            self.blend_file_rows[path].remove(row)
+
+    def row_reference(self, tree_iter: Gtk.TreeIter) -> Gtk.TreeRowReference:
+        return Gtk.TreeRowReference.new(
+            self.blend_files_store, self.blend_files_store.get_path(tree_iter)
+        )
+
+    def prune_blend_file_rows(self) -> None:
+        for path in list(self.blend_file_rows):
+            rows = [row for row in self.blend_file_rows[path] if row.valid()]
+            if rows:
+                self.blend_file_rows[path] = rows
+            else:
+                del self.blend_file_rows[path]
+
+    def append_blend_file(
+        self, parent: Gtk.TreeIter, path: str, file_info: Optional[FileInfo]
+    ) -> Gtk.TreeRowReference:
+        tree_iter = self.blend_files_store.append(
+            parent, [path] + file_info_columns(file_info)
+        )
+        row = self.row_reference(tree_iter)
+        self.blend_file_rows.setdefault(path, []).append(row)
+        return row
+
+    def queue_metadata_scan(self, paths: List[str]) -> None:
+        self.metadata_scan_queue.update(dict.fromkeys(paths))
+        if self.metadata_scan_queue:
+            self.metadata_scan_event.set()
+
+    async def scan_metadata(self) -> None:
+        # A single task works through the queue, so only one Blender probes
+        # files next to the renders.
+        batch_size = 50
+        while True:
+            await self.metadata_scan_event.wait()
+            self.metadata_scan_event = trio.Event()
+            while self.metadata_scan_queue:
+                paths = list(
+                    itertools.islice(self.metadata_scan_queue, batch_size)
+                )
+                for path in paths:
+                    del self.metadata_scan_queue[path]
+                paths = await trio.to_thread.run_sync(
+                    self.metadata_cache.missing, paths
+                )
+                if not paths:
+                    continue
+                file_infos = await read_file_infos(paths)
+                # Files Blender can't read are cached as well, so they are
+                # only probed again once they change.
+                for path in paths:
+                    file_infos.setdefault(path, None)
+                await trio.to_thread.run_sync(
+                    self.metadata_cache.put_many, file_infos
+                )
+                for path, file_info in file_infos.items():
+                    if file_info is not None:
+                        self.update_blend_file_rows(path, file_info)
 
-        self.blend_files_tree_view.expand_all()
+    def update_blend_file_rows(self, path: str, file_info: FileInfo) -> None:
+        for row in self.blend_file_rows.get(path, []):
+            if row.valid():
+                tree_iter = self.blend_files_store.get_iter(row.get_path())
+                for i, value in enumerate(file_info_columns(file_info)):
+                    self.blend_files_store[tree_iter][i + 1] = value
 
     def on_blend_cell_clicked(
         self, tree_view: Gtk.TreeView, event: Gdk.EventButton
@@ -375,6 +889,7 @@ class MainWindow(Gtk.Window):
             selection = tree_view.get_selection()
             model, tree_iter = selection.get_selected()
             path = model[tree_iter][0]
+            self.build_page("render_settings")
             self.blend_file_chooser_button.set_filename(path)
             self.update_render_settings(path)
             self.stack.set_visible_child_name("render_settings")
@@ -384,53 +899,75 @@ class MainWindow(Gtk.Window):
 
     def update_render_settings(self, path: str) -> None:
         self.load_file_info(path)
+
+    def load_file_info(self, file_path: str) -> None:
+        if self.file_info_cancel_scope is not None:
+            self.file_info_cancel_scope.cancel()
+            self.file_info_cancel_scope = None
+
+        file_info = self.metadata_cache.get(file_path)
+        if file_info is not None:
+            self.queue_button.set_sensitive(True)
+            self.apply_file_info(file_info)
+            self.apply_default_output_dir()
+            return
+
+        self.file_info_cancel_scope = trio.CancelScope()
+        self.queue_button.set_sensitive(False)
+        self.nursery.start_soon(
+            self.read_file_info, file_path, self.file_info_cancel_scope
+        )
+
+    async def read_file_info(
+        self, file_path: str, cancel_scope: trio.CancelScope
+    ) -> None:
+        file_info = None
+        with cancel_scope:
+            file_info = await read_file_info(
+                file_path, self.renderer.worker_pool
+            )
+
+        if cancel_scope is not self.file_info_cancel_scope:
+            return
+        self.file_info_cancel_scope = None
+        self.queue_button.set_sensitive(True)
+
+        if file_info is not None:
+            self.metadata_cache.put(file_path, file_info)
+            self.update_blend_file_rows(file_path, file_info)
+            self.apply_file_info(file_info)
+        self.apply_default_output_dir()
+
+    def apply_default_output_dir(self) -> None:
         if self.output_path_chooser_button.get_filename() == "/tmp" \
                 or self.output_path_chooser_button.get_filename() is None:
             self.output_path_chooser_button \
                 .set_filename(f"{config.settings['default_output_dir']}")
 
-    def load_file_info(self, file_path: str) -> None:
-        with subprocess.Popen(
-            [
-                "blender",
-                "-b", file_path,
-                "-P", os.path.abspath("blend_file_information.py"),
-            ],
-            stdout=subprocess.PIPE
-        ) as process:
-            output = process.stdout
-            file_info = []
-            ready = False
-            for raw_line in output:
-                line = raw_line.strip().decode("utf-8")
-                if line == "READY":
-                    ready = True
-                    continue
-                if ready:
-                    file_info.append(line)
-
-            if file_info[0] == "BLENDER_EEVEE":
-                self.render_engine_combo_box.set_active(0)
-                self.render_samples_spin.set_value(int(file_info[3]))
-            elif file_info[0] == "BLENDER_WORKBENCH":
-                self.render_engine_combo_box.set_active(1)
-            elif file_info[0] == "CYCLES":
-                self.render_engine_combo_box.set_active(2)
-                self.render_samples_spin.set_value(int(file_info[2]))
-            if file_info[1] == "CPU":
-                self.render_device_combo_box.set_active(0)
-            elif file_info[1] == "GPU":
-                self.render_device_combo_box.set_active(1)
-            self.resolution_x_spin.set_value(int(file_info[4]))
-            self.resolution_y_spin.set_value(int(file_info[5]))
-            self.resolution_percentage_spin.set_value(int(file_info[6]))
-            self.start_frame_spin.set_value(int(file_info[7]))
-            self.end_frame_spin.set_value(int(file_info[8]))
-            self.output_path_chooser_button.set_filename(
-                os.path.dirname(file_info[10])
-            )
-            layers = file_info[11].split(", ")
-            self.layers = layers
+    def apply_file_info(self, file_info: FileInfo) -> None:
+        if file_info.render_engine == "BLENDER_EEVEE":
+            self.render_engine_combo_box.set_active(0)
+            self.render_samples_spin.set_value(file_info.eevee_samples)
+        elif file_info.render_engine == "BLENDER_WORKBENCH":
+            self.render_engine_combo_box.set_active(1)
+        elif file_info.render_engine == "CYCLES":
+            self.render_engine_combo_box.set_active(2)
+            self.render_samples_spin.set_value(file_info.cycles_samples)
+        if file_info.render_device == "CPU":
+            self.render_device_combo_box.set_active(0)
+        elif file_info.render_device == "GPU":
+            self.render_device_combo_box.set_active(1)
+        self.resolution_x_spin.set_value(file_info.resolution_x)
+        self.resolution_y_spin.set_value(file_info.resolution_y)
+        self.resolution_percentage_spin.set_value(
+            file_info.resolution_percentage
+        )
+        self.start_frame_spin.set_value(file_info.frame_start)
+        self.end_frame_spin.set_value(file_info.frame_end)
+        self.output_path_chooser_button.set_filename(
+            os.path.dirname(file_info.filepath)
+        )
+        self.layers = file_info.layers
 
     def on_resolution_x_y_output(self, spin_button: Gtk.SpinButton) -> bool:
         spin_button.set_text(f"{spin_button.get_value_as_int()} px")
@@ -442,6 +979,11 @@ class MainWindow(Gtk.Window):
         spin_button.set_text(f"{spin_button.get_value_as_int()} %")
         return True
 
+    def on_threads_output(self, spin_button: Gtk.SpinButton) -> bool:
+        threads = spin_button.get_value_as_int()
+        spin_button.set_text(str(threads) if threads > 0 else "Automatic")
+        return True
+
     def on_output_type_changed(self, combo_box: Gtk.ComboBox) -> None:
         output_type_iter = combo_box.get_active_iter()
         output_type_model = combo_box.get_model()
@@ -449,26 +991,49 @@ class MainWindow(Gtk.Window):
 
         if output_type == "Animation":
             self.end_frame_spin.set_sensitive(True)
+            self.chunk_workers_spin.set_sensitive(True)
+            self.resume_switch.set_sensitive(True)
         elif output_type == "Single Frame":
             self.end_frame_spin.set_sensitive(False)
+            self.chunk_workers_spin.set_sensitive(False)
+            self.resume_switch.set_sensitive(False)
 
     def on_render_clicked(self, button: Gtk.Button) -> None:
-        for render_task in self.render_queue:
-            if not render_task.finished:
-                self.current_render_task = render_task
-                break
-
+        self.build_page("render_settings")
+        finish_by = self.finish_by_entry.get_text()
+        finish_time = None
+        if finish_by.strip():
+            try:
+                finish_time = parse_finish_time(
+                    finish_by, datetime.datetime.now()
+                )
+            except ValueError:
+                self.finish_by_entry.get_style_context().add_class("error")
+                self.stack.set_visible_child_name("render_settings")
+                return
+        self.finish_by_entry.get_style_context().remove_class("error")
+        self.deadline_planner.finish_time = finish_time
         self.render_button.set_sensitive(False)
 
-        self.nursery.start_soon(self.render)
+        self.nursery.start_soon(self.run_queue)
 
     def on_queue_clicked(self, button: Gtk.Button) -> None:
-        render_task, render_engine_display = self.create_render_task()
+        render_task, _ = self.create_render_task()
         if render_task.blend_file == "" or render_task.output_file == "":
             return
-        self.add_render_task_to_tree_view(render_engine_display, render_task)
-        if self.process is None:
+        try:
+            parse_cpu_list(render_task.cpus)
+        except ValueError:
+            self.cpus_entry.get_style_context().add_class("error")
+            return
+        self.cpus_entry.get_style_context().remove_class("error")
+        self.add_render_tasks([render_task])
+        self.journal.add([render_task])
+        self.update_eta()
+        if self.scheduler is None:
             self.render_button.set_sensitive(True)
+        else:
+            self.scheduler.notify()
         self.stack.set_visible_child_name("queue")
 
     def create_render_task(self) -> Tuple[RenderTask, str]:
@@ -500,6 +1065,10 @@ class MainWindow(Gtk.Window):
 
         end_frame = self.end_frame_spin.get_value_as_int()
 
+        chunk_workers = self.chunk_workers_spin.get_value_as_int()
+
+        resume = self.resume_switch.get_active()
+
         output_format_iter = self.output_format_combo_box.get_active_iter()
         output_format_model = self.output_format_combo_box.get_model()
         output_format = output_format_model[output_format_iter][1]
@@ -511,183 +1080,411 @@ class MainWindow(Gtk.Window):
 
         python_expressions = self.python_expressions_entry.get_text()
 
+        threads = self.threads_spin.get_value_as_int()
+
+        cpus = self.cpus_entry.get_text().strip()
+
         layers = self.layers
 
+        priority = self.priority_spin.get_value_as_int()
+
+        dependencies = []
+        if self.wait_for_queue_switch.get_active():
+            dependencies = [
+                render_task.task_id for render_task in self.queue_model.order
+                if not render_task.finished
+            ]
+
         return RenderTask(
             blend_file, render_engine, render_device, render_samples,
             resolution_x, resolution_y, resolution_percentage, output_type,
             start_frame, end_frame, output_format, output_file,
-            python_expressions, layers, False
+            python_expressions, layers, False, chunk_workers, resume, None,
+            priority, dependencies, None, None, threads, cpus
         ), render_engine_display
 
-    def add_render_task_to_tree_view(
-        self, render_engine_display: str, render_task: RenderTask
+    def add_render_tasks(
+        self, render_tasks: List[RenderTask],
+        progress: Optional[Dict[RenderTask, float]] = None
     ) -> None:
-        def frames_argument() -> str:
-            output_type = render_task.output_type
-            if output_type == "Animation":
-                return f"{output_type}" \
-                       f"({render_task.start_frame} - {render_task.end_frame})"
-            elif output_type == "Single Frame":
-                return f"{output_type} ({render_task.start_frame})"
-
-        self.render_tasks_store.append([
-            os.path.basename(render_task.blend_file),
-            render_engine_display,
-            frames_argument(),
-            render_task.output_file,
-            0
-        ])
-        self.render_queue.append(render_task)
-
-    async def render(self) -> None:
-        image_path = None
-        async with await trio.open_process(
-            self.current_render_task.to_cmd_line(),
-            stdout=subprocess.PIPE
-        ) as process:
-            self.process = process
-            self.info_bar.set_revealed(True)
-            async for raw_line in process.stdout:
-                line = raw_line.strip().decode("utf-8")
-                parts = line.split("\n")
-
-                if self.current_render_task.output_type == "Animation":
-                    start_frame = self.current_render_task.start_frame
-                    end_frame = self.current_render_task.end_frame
-                else:
-                    start_frame = self.current_render_task.start_frame
-                    end_frame = self.current_render_task.start_frame
-                info, progress = self.parse_blender_logs(
-                    parts[-1], start_frame, end_frame
-                )
+        progress = progress or {}
+        rows = [
+            [
+                os.path.basename(render_task.blend_file),
+                ENGINE_NAMES.get(
+                    render_task.render_engine, render_task.render_engine
+                ),
+                self.frames_argument(render_task),
+                render_task.output_file,
+                progress.get(render_task, 0),
+                "",
+                "",
+                render_task.task_id,
+                ""
+            ]
+            for render_task in render_tasks
+        ]
+        moved = self.queue_model.add(render_tasks, rows)
+        for render_task in render_tasks:
+            try:
+                self.task_queue.add(render_task)
+            except ValueError as e:
+                # Only an edited journal holds a cycle, the task doesn't
+                # wait for anything then.
+                print(f"{e}, ignoring its dependencies")
+                render_task.dependencies = []
+                self.task_queue.add(render_task)
+        if moved:
+            self.task_queue.reorder(self.queue_model.order)
+
+    def restore_queue(self) -> None:
+        render_tasks = []
+        progress = {}
+        for entry in self.journal.load():
+            render_task = RenderTask.from_dict(entry.task)
+            if render_task.output_type == "Animation" and entry.started:
+                # Frames that were saved before the restart are skipped.
+                render_task.resume = True
+            render_tasks.append(render_task)
+            frame_count = render_task.end_frame \
+                - render_task.start_frame + 1 \
+                if render_task.output_type == "Animation" else 1
+            progress[render_task] = min(
+                entry.saved_frames / frame_count * 100, 100
+            )
+        self.add_render_tasks(render_tasks, progress)
+        for render_task, task_progress in progress.items():
+            self.eta_predictor.update_progress(render_task, task_progress)
+        self.update_eta()
+
+        if not render_tasks:
+            return
+        self.stack.set_visible_child_name("queue")
+        if config.settings["resume_queue_on_startup"]:
+            self.nursery.start_soon(self.run_queue)
+        else:
+            self.render_button.set_sensitive(True)
 
-                if info is not None:
-                    self.info_bar_label.set_text(str(info))
-                if progress is not None:
-                    self.update_progress(progress)
+    def frames_argument(self, render_task: RenderTask) -> str:
+        output_type = render_task.output_type
+        if output_type == "Animation":
+            return f"{output_type}" \
+                   f"({render_task.start_frame} - {render_task.end_frame})"
+        elif output_type == "Single Frame":
+            return f"{output_type} ({render_task.start_frame})"
+
+    async def run_queue(self) -> None:
+        self.memory_guard.limit_mode = config.settings["memory_limit"]
+        self.memory_guard.limit_swap = config.settings["memory_limit_swap"]
+        self.renderer.memory_guard = self.memory_guard
+        self.deadline_planner.min_samples = \
+            config.settings["deadline_min_samples"]
+        self.deadline_planner.min_resolution = \
+            config.settings["deadline_min_resolution"]
+        self.scheduler = Scheduler(
+            config.settings["parallel_slots"],
+            config.settings["thread_budget"],
+            self.memory_guard if config.settings["memory_admission"] else None,
+            config.settings["batch_tasks"],
+            CpuAllocator.read() if config.settings["pin_cpus"] else None
+        )
+        await self.renderer.update_worker_pool()
+        self.renderer.yield_mode = config.settings["yield_to_users"]
+        self.render_logs.cleanup(
+            config.settings["log_max_size"] * MIB,
+            config.settings["log_max_age"] * 24 * 60 * 60
+        )
+        self.info_bar.set_revealed(True)
+        self.progress_throttle.rate = config.settings["ui_update_rate"]
+        self.info_throttle.rate = config.settings["ui_update_rate"]
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(self.progress_throttle.run)
+            nursery.start_soon(self.info_throttle.run)
+            nursery.start_soon(self.update_eta_periodically)
+            if self.renderer.yield_mode != "off":
+                nursery.start_soon(
+                    watch_user_activity, self.on_user_activity
+                )
+            self.resource_sampler.interval = \
+                config.settings["resource_sample_interval"]
+            nursery.start_soon(
+                self.resource_sampler.run,
+                lambda: list(self.scheduler.running),
+                self.update_resources
+            )
+            await self.scheduler.run(self.task_queue, self.render)
+            nursery.cancel_scope.cancel()
+        self.scheduler = None
+        self.update_eta()
+
+        blocked = self.task_queue.blocked()
+        if blocked:
+            # The machine stays on, so the skipped tasks can be looked at.
+            self.info_bar.set_message_type(Gtk.MessageType.WARNING)
+            self.info_bar_label.set_text(
+                f"{len(blocked)} tasks were not rendered, their dependencies "
+                "never finished"
+            )
+            return
+        await self.post_rendering()
 
-                m = re.search(
-                    r"^Saved: \s '(?P<path>.*)'",
-                    line,
-                    flags=re.VERBOSE
+    async def render(
+        self, render_tasks: List[RenderTask], threads: int,
+        cpus: Optional[List[int]]
+    ) -> None:
+        self.deadline_planner.start_tasks(
+            render_tasks, self.queue_model.order, self.task_queue,
+            self.scheduler.running, self.scheduler.slots,
+            trio.current_time()
+        )
+        for render_task in render_tasks:
+            self.journal.start(render_task)
+            self.eta_predictor.start_task(render_task, trio.current_time())
+            if self.renderer.task_paused(render_task):
+                self.eta_predictor.pause_task(
+                    render_task, trio.current_time()
                 )
-                if m:
-                    image_path = m.group("path")
-
-        await self.post_rendering(image_path)
-
-    def update_progress(self, progress: float) -> None:
-        self.render_tasks_store[
-            self.render_queue.index(self.current_render_task)
-        ][4] = progress
-
-    def parse_blender_logs(
-        self, line: str, start_frame: int, end_frame: int
-    ) -> Tuple[Optional[RenderInfo], Optional[int]]:
-        m = re.search(
-            r"""
-            ^
-            (?P<frame> [^|]*)
-            \s \| \s
-            (?P<time> Time: [^|]*)
-            \s \| \s
-            (?P<payload> .*?)
-            \s*
-            $
-            """,
-            line,
-            flags=re.VERBOSE
-        )
-
-        if not m:
-            return None, None
-
-        frame = m.group("frame")
-        time = m.group("time")
-        payload = m.group("payload")
-        remaining = None
-        mem = None
-        layer = None
-        status = None
-        progress = None
-
-        if payload.startswith("Remaining:"):
-            remaining, payload = payload.split(" | ", maxsplit=1)
-        if payload.startswith("Mem:"):
-            mem, layer, status = payload.split(" | ", maxsplit=2)
-        elif payload.startswith("Compositing"):
-            status = payload
-
-        if self.current_render_task.render_engine == "CYCLES":
-            if status is not None and status.startswith("Rendered "):
-                progress = self.parse_status(
-                    status, frame, start_frame, end_frame, layer
+        await self.renderer.render_batch(
+            render_tasks, threads, self.finish_render_task, cpus
+        )
+
+    def on_render_info(
+        self, render_task: RenderTask, info: RenderInfo
+    ) -> None:
+        self.info_throttle.update(None, (render_task, info))
+
+    def apply_render_info(self, pending: Dict[None, Any]) -> None:
+        render_task, info = pending[None]
+        if len(self.renderer.processes) > 1:
+            text = f"{os.path.basename(render_task.blend_file)}: {info}"
+        else:
+            text = str(info)
+        if self.queue_eta_text:
+            text = f"{text} | {self.queue_eta_text}"
+        self.info_bar_label.set_text(text)
+
+    def update_resources(self) -> None:
+        for render_task, series in self.resource_sampler.series.items():
+            self.queue_model.set(render_task, 6, series.summary())
+
+    async def update_eta_periodically(self) -> None:
+        while True:
+            self.update_eta(False)
+            await trio.sleep(2)
+
+    def update_eta(self, full: bool = True) -> None:
+        # Waiting tasks only change when the queue or the render history
+        # does, so the periodic update only looks at the tasks that run or
+        # just stopped, those whose dependencies finished and, now and then,
+        # those of files that saved frames.
+        now = trio.current_time()
+        self.update_task_controls()
+        held = set(self.scheduler.held) if self.scheduler is not None \
+            else set()
+        active = set(self.eta_predictor.started) | held
+        if full:
+            render_tasks = self.queue_model.order
+            self.eta_remaining = {}
+            self.eta_changed_files = set()
+        else:
+            changed = self.eta_active | active | self.eta_changed
+            if self.eta_changed_files and now >= self.eta_files_due:
+                changed.update(
+                    render_task for render_task in self.queue_model.order
+                    if render_task.blend_file in self.eta_changed_files
                 )
+                self.eta_changed_files = set()
+                self.eta_files_due = now + 30
+            render_tasks = [
+                render_task for render_task in changed
+                if render_task.task_id in self.queue_model.tasks
+            ]
+        self.eta_active = active
+        self.eta_changed = set()
+        for render_task in render_tasks:
+            remaining = self.eta_predictor.task_remaining(render_task, now)
+            self.eta_remaining[render_task] = remaining
+            self.queue_model.set(render_task, 8, self.task_state(render_task))
+            if render_task.finished:
+                text = ""
+            elif render_task in held:
+                text = "Waiting for memory"
+            elif remaining is None:
+                text = "?"
+            else:
+                text = format_duration(remaining)
+            self.queue_model.set(render_task, 5, text)
+
+        slots = config.settings["parallel_slots"]
+        remaining, unknown = self.eta_predictor.queue_total(
+            self.eta_remaining.values(), slots
+        )
+        if remaining == 0 and unknown == 0:
+            self.queue_eta_text = ""
+            return
+        finish_time = time.strftime(
+            "%H:%M", time.localtime(time.time() + remaining)
+        )
+        self.queue_eta_text = \
+            f"Queue done in {format_duration(remaining)} (~{finish_time})"
+        if unknown:
+            self.queue_eta_text += f", {unknown} tasks without estimate"
+        if self.scheduler is not None \
+                and self.deadline_planner.finish_time is not None:
+            self.queue_eta_text += \
+                f", {self.deadline_planner.plan.describe()}"
+
+    def task_state(self, render_task: RenderTask) -> str:
+        state = self.task_queue.state(render_task)
+        if state != "Running" or render_task not in self.renderer.task_pids:
+            return state
+        if self.renderer.task_paused(render_task):
+            return "Paused"
+        priority = self.renderer.task_priority(render_task)
+        if priority != PRIORITY_LEVELS[0]:
+            return f"Running ({priority})"
+        return state
+
+    def selected_render_tasks(self) -> List[RenderTask]:
+        if self.queue_tree_view is None:
+            return []
+        model, paths = self.queue_tree_view.get_selection().get_selected_rows()
+        return [self.queue_model.task(model.get_iter(path)) for path in paths]
+
+    def selected_render_task(self) -> Optional[RenderTask]:
+        # The task controls act on a single task.
+        render_tasks = self.selected_render_tasks()
+        return render_tasks[0] if len(render_tasks) == 1 else None
+
+    def update_task_controls(self) -> None:
+        if self.pause_button is None:
+            return
+        render_task = self.selected_render_task()
+        self.log_button.set_sensitive(render_task is not None)
+        running = render_task is not None \
+            and render_task in self.renderer.task_pids
+        self.pause_button.set_sensitive(running)
+        self.task_priority_combo_box.set_sensitive(running)
+        if not running:
+            self.pause_button.set_label("Pause")
+            return
+        self.pause_button.set_label(
+            "Resume" if render_task in self.renderer.paused else "Pause"
+        )
+        self.task_priority_combo_box.set_active(PRIORITY_LEVELS.index(
+            self.renderer.priorities.get(render_task, PRIORITY_LEVELS[0])
+        ))
+
+    def on_queue_selection_changed(
+        self, selection: Gtk.TreeSelection
+    ) -> None:
+        self.task_control_label.set_text("")
+        self.update_task_controls()
+
+    def on_pause_clicked(self, button: Gtk.Button) -> None:
+        render_task = self.selected_render_task()
+        if render_task is None:
+            return
+        if render_task in self.renderer.paused:
+            self.renderer.resume(render_task)
         else:
-            i_frame = int(re.search(
-                "^ Fra: (?P<frame> [0-9]+)", frame, flags=re.VERBOSE
-            ).group("frame"))
-            progress = (i_frame - start_frame) \
-                / (end_frame - start_frame + 1) * 100
-
-        render_info = RenderInfo(
-            frame, time, remaining, mem, layer, status, config
-        )
-        return render_info, progress
-
-    def parse_status(
-        self, status: str, frame: str, start_frame: int, end_frame: int,
-        layer: str
-    ) -> float:
-        m = re.search(
-            r"""
-            ^
-            Rendered \s+
-            (?P<tiles> [0-9]+) / (?P<total_tiles> [0-9]+) \s+
-            Tiles, \s+
-            (
-                Sample \s+
-                (?P<samples> [0-9]+) / (?P<total_samples> [0-9]+)
-            )?
-            \b
-            """,
-            status,
-            flags=re.VERBOSE
-        )
-
-        tiles = int(m.group("tiles"))
-        total_tiles = int(m.group("total_tiles"))
-        try:
-            samples = int(m.group("samples"))
-            total_samples = int(m.group("total_samples"))
-        except TypeError:
-            samples = 1
-            total_samples = 1
+            self.renderer.pause(render_task)
+        self.update_paused_tasks()
 
-        frame = int(re.search(
-            "^ Fra: (?P<frame> [0-9]+)", frame, flags=re.VERBOSE
-        ).group("frame"))
+    def on_log_clicked(self, button: Gtk.Button) -> None:
+        render_task = self.selected_render_task()
+        if render_task is None:
+            return
+        log_dialog = LogDialog(
+            f"Log of {os.path.basename(render_task.blend_file)}",
+            self.render_logs.path(render_task)
+        )
+        log_dialog.connect(
+            "response", lambda dialog, response: dialog.destroy()
+        )
+
+    def on_task_priority_changed(self, combo_box: Gtk.ComboBox) -> None:
+        render_task = self.selected_render_task()
+        level = PRIORITY_LEVELS[combo_box.get_active()]
+        if render_task is None or render_task not in self.renderer.task_pids \
+                or level == self.renderer.priorities.get(
+                    render_task, PRIORITY_LEVELS[0]
+                ):
+            return
+        if self.renderer.set_priority(render_task, level):
+            self.task_control_label.set_text("")
+        else:
+            self.task_control_label.set_text(
+                "Only root can raise the priority of a running render"
+            )
+        self.update_eta()
+
+    def on_user_activity(self, users_active: bool) -> None:
+        if not self.renderer.set_users_active(users_active):
+            print("Only root can raise the priority of running renders "
+                  "again, renders started from now on use normal priority")
+        self.update_paused_tasks()
+
+    def update_paused_tasks(self) -> None:
+        # Paused time is kept out of the frame times.
+        now = trio.current_time()
+        for render_task in list(self.renderer.task_pids):
+            if self.renderer.task_paused(render_task):
+                self.eta_predictor.pause_task(render_task, now)
+            else:
+                self.eta_predictor.resume_task(render_task, now)
+        self.update_eta()
+
+    def on_render_resumed(
+        self, render_task: RenderTask, done_frames: int, total_frames: int
+    ) -> None:
+        self.queue_model.set(
+            render_task, 2,
+            f"{self.frames_argument(render_task)}, {done_frames} of "
+            f"{total_frames} frames already done"
+        )
 
-        if samples == total_samples:
-            samples = 0
+    def on_frame_saved(
+        self, render_task: RenderTask, path: str, frame_started: float
+    ) -> None:
+        self.journal.save_frame(render_task)
+        self.eta_predictor.frame_saved(
+            render_task, frame_started, trio.current_time()
+        )
+        self.eta_changed_files.add(render_task.blend_file)
 
-        layer = layer.split(", ")[1]
-        layer_index = self.current_render_task.layers.index(layer)
+    def update_progress(
+        self, render_task: RenderTask, progress: float
+    ) -> None:
+        self.progress_throttle.update(render_task, progress)
+        self.eta_predictor.update_progress(render_task, progress)
 
-        f_tiles = tiles + samples / total_samples
-        f_layers = layer_index + f_tiles / total_tiles
-        f_frames = frame + f_layers / len(self.current_render_task.layers)
-        return (f_frames - start_frame) / (end_frame - start_frame + 1) * 100
+    def apply_progress(self, pending: Dict[RenderTask, float]) -> None:
+        for render_task, progress in pending.items():
+            self.queue_model.set(render_task, 4, progress)
+
+    def finish_render_task(
+        self, render_task: RenderTask, image_path: Optional[str]
+    ) -> None:
+        self.memory_guard.record_peak(
+            render_task, self.renderer.peak_memory(
+                render_task, self.resource_sampler.peak_rss(render_task)
+            )
+        )
+        export_path = self.resource_sampler.finish_task(
+            render_task, config.settings["resource_export"],
+            config.settings["resource_export_dir"]
+        )
+        if export_path is not None:
+            print(f"Resource usage written to {export_path}")
 
-    async def post_rendering(self, image_path: Optional[str]) -> None:
         print("Rendering complete!")
         Notify.init("Overnight Renderer")
         if image_path is not None:
             notification = Notify.Notification.new(
                 "Rendering complete",
                 "Rendering "
-                f"{os.path.basename(self.current_render_task.blend_file)} "
+                f"{os.path.basename(render_task.blend_file)} "
                 "finished",
                 image_path
             )
@@ -695,26 +1492,25 @@ class MainWindow(Gtk.Window):
             notification = Notify.Notification.new(
                 "Rendering complete",
                 "Rendering "
-                f"{os.path.basename(self.current_render_task.blend_file)} "
+                f"{os.path.basename(render_task.blend_file)} "
                 "finished"
             )
         notification.show()
 
-        self.update_progress(100)
+        self.update_progress(render_task, 100)
+        self.progress_throttle.flush()
 
-        self.process = None
-        self.current_render_task.finished = True
-
-        for render_task in self.render_queue:
-            if not render_task.finished:
-                self.current_render_task = render_task
-                self.nursery.start_soon(self.render, self.current_render_task)
-                return
-
-        self.current_render_task = None
+        render_task.finished = True
+        self.journal.finish(render_task)
+        self.eta_predictor.finish_task(render_task)
+        for task_id in self.task_queue.dependents.get(render_task.task_id, ()):
+            if task_id in self.task_queue.tasks:
+                self.eta_changed.add(self.task_queue.tasks[task_id])
 
+    async def post_rendering(self) -> None:
         self.info_bar.set_revealed(False)
 
+        self.build_page("render_settings")
         post_rendering_iter = self.post_rendering_combo_box.get_active_iter()
         post_rendering_model = self.post_rendering_combo_box.get_model()
         post_rendering_action = post_rendering_model[post_rendering_iter][0]
@@ -731,7 +1527,7 @@ class MainWindow(Gtk.Window):
                 await trio.sleep(1)
             if self.do_post_rendering:
                 print("Suspending...")
-                subprocess.run(["systemctl", "suspend"])
+                subprocess.run(post_rendering_command(post_rendering_action))
         elif post_rendering_action == "Shutdown":
             self.info_bar.add_button(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL)
             self.info_bar.set_message_type(Gtk.MessageType.WARNING)
@@ -742,7 +1538,7 @@ class MainWindow(Gtk.Window):
                 await trio.sleep(1)
             if self.do_post_rendering:
                 print("Shutting down...")
-                subprocess.run(["poweroff"])
+                subprocess.run(post_rendering_command(post_rendering_action))
 
     def on_info_bar_cancel_pressed(
         self, info_bar: Gtk.InfoBar, response: Gtk.ResponseType
@@ -754,23 +1550,58 @@ class MainWindow(Gtk.Window):
     def on_queue_tree_view_key_pressed(
         self, tree_view: Gtk.TreeView, event: Gdk.EventKey
     ) -> None:
-        keyname = Gdk.keyval_name(event.keyval)
-        render_task_index = tree_view.get_selection() \
-            .get_selected_rows()[1][0][0]
-        current_render_task_index = self.render_queue.index(
-            self.current_render_task
-        )
-        if keyname == "Delete" \
-                and render_task_index != current_render_task_index:
-            del self.render_queue[render_task_index]
-            model, iter = tree_view.get_selection().get_selected()
-            model.remove(iter)
+        if Gdk.keyval_name(event.keyval) != "Delete":
+            return
+        render_tasks = [
+            render_task for render_task in self.selected_render_tasks()
+            if self.scheduler is None
+            or render_task not in self.scheduler.running
+        ]
+        if not render_tasks:
+            return
+        self.queue_model.remove(render_tasks)
+        for render_task in render_tasks:
+            self.task_queue.remove(render_task)
+        self.journal.remove(render_tasks)
+        self.update_eta()
+
+    def on_queue_drag_begin(
+        self, tree_view: Gtk.TreeView, context: Gdk.DragContext
+    ) -> None:
+        render_task = self.selected_render_task()
+        self.dragged_task_id = render_task.task_id \
+            if render_task is not None else None
+
+    def on_queue_drag_end(
+        self, tree_view: Gtk.TreeView, context: Gdk.DragContext
+    ) -> None:
+        self.queue_model.sync()
+        render_task = self.queue_model.tasks.get(self.dragged_task_id)
+        self.dragged_task_id = None
+        render_queue = self.queue_model.order
+        if render_task is None or len(render_queue) < 2:
+            return
+        # A dropped task takes the priority of the task above it, or the
+        # one below it when it was dropped at the top.
+        index = self.queue_model.position(render_task)
+        neighbour = render_queue[index - 1 if index > 0 else 1]
+        self.task_queue.set_priority(render_task, neighbour.priority)
+        self.task_queue.reorder(render_queue)
+        self.journal.move(render_task, index)
+        self.update_eta()
+        if self.scheduler is not None:
+            self.scheduler.notify()
 
 
 def main_quit(window: MainWindow, event: Gdk.Event) -> None:
+    window.nursery.start_soon(shut_down, window)
+
+
+async def shut_down(window: MainWindow) -> None:
+    # The main loop keeps running until the renders are stopped.
+    await window.renderer.terminate()
+    window.journal.close()
     Gtk.main_quit()
-    if window.process is not None:
-        window.process.terminate()
 
 
 async def main() -> None:
@@ -0,0 +1,138 @@
+import os
+import shutil
+import signal
+import subprocess
+import trio
+from typing import Callable, Dict, List, Optional
+
+
+PRIORITY_LEVELS = ["Normal", "Low", "Background"]
+NICE_VALUES = {"Normal": 0, "Low": 10, "Background": 19}
+IONICE_ARGUMENTS = {
+    "Normal": ["-c", "2", "-n", "4"],
+    "Low": ["-c", "2", "-n", "7"],
+    "Background": ["-c", "3"]
+}
+CPU_WEIGHTS = {"Normal": 100, "Low": 20, "Background": 1}
+GRAPHICAL_SESSIONS = ["x11", "wayland", "mir"]
+
+
+def signal_process_group(pid: int, signal_number: int) -> bool:
+    try:
+        os.killpg(pid, signal_number)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
+
+
+def pause_process_group(pid: int) -> bool:
+    return signal_process_group(pid, signal.SIGSTOP)
+
+
+def resume_process_group(pid: int) -> bool:
+    return signal_process_group(pid, signal.SIGCONT)
+
+
+def scope_unit(pid: int) -> Optional[str]:
+    try:
+        with open(f"/proc/{pid}/cgroup", "r") as file:
+            for line in file:
+                unit = line.strip().rsplit("/", 1)[-1]
+                if line.startswith("0::") and unit.endswith(".scope"):
+                    return unit
+    except OSError:
+        pass
+    return None
+
+
+def run_quietly(cmd_line: List[str]) -> bool:
+    try:
+        return subprocess.run(
+            cmd_line, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ).returncode == 0
+    except OSError:
+        return False
+
+
+def set_process_group_priority(pid: int, level: str) -> bool:
+    # The whole group is changed, which includes every render thread
+    # Blender has started so far. Threads started later inherit it.
+    try:
+        os.setpriority(os.PRIO_PGRP, pid, NICE_VALUES[level])
+        niced = True
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # Only root may lower the nice value again.
+        niced = False
+    if shutil.which("ionice") is not None:
+        run_quietly(["ionice"] + IONICE_ARGUMENTS[level] + ["-P", str(pid)])
+
+    unit = scope_unit(pid)
+    if unit is None or not unit.startswith("run-") \
+            or shutil.which("systemctl") is None:
+        return niced
+    # Renders in their own scope are weighted against the rest of the
+    # desktop by the cgroup, which can be undone without privileges.
+    weight = CPU_WEIGHTS[level]
+    return run_quietly([
+        "systemctl", "--user", "set-property", "--runtime", unit,
+        f"CPUWeight={weight}", f"IOWeight={weight}"
+    ]) or niced
+
+
+def parse_sessions(output: str) -> List[Dict[str, str]]:
+    sessions = []
+    properties: Dict[str, str] = {}
+    for line in output.splitlines() + [""]:
+        if not line.strip():
+            if properties:
+                sessions.append(properties)
+            properties = {}
+            continue
+        name, _, value = line.partition("=")
+        properties[name] = value
+    return sessions
+
+
+async def users_active() -> bool:
+    # A graphical session that systemd-logind doesn't consider idle means
+    # someone is working at the machine. The desktop decides when it is
+    # idle, usually together with the screen saver.
+    if shutil.which("loginctl") is None:
+        return False
+    result = await trio.run_process(
+        ["loginctl", "list-sessions", "--no-legend"],
+        capture_stdout=True, stderr=subprocess.DEVNULL, check=False
+    )
+    session_ids = [
+        line.split()[0]
+        for line in result.stdout.decode("utf-8", "replace").splitlines()
+        if line.strip()
+    ]
+    if not session_ids:
+        return False
+    result = await trio.run_process(
+        ["loginctl", "show-session", "-p", "Type", "-p", "IdleHint"]
+        + session_ids,
+        capture_stdout=True, stderr=subprocess.DEVNULL, check=False
+    )
+    return any(
+        session.get("Type") in GRAPHICAL_SESSIONS
+        and session.get("IdleHint") == "no"
+        for session in parse_sessions(
+            result.stdout.decode("utf-8", "replace")
+        )
+    )
+
+
+async def watch_user_activity(
+    on_change: Callable[[bool], None], interval: float = 10
+) -> None:
+    active = False
+    while True:
+        now_active = await users_active()
+        if now_active != active:
+            active = now_active
+            on_change(active)
+        await trio.sleep(interval)
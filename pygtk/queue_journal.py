@@ -0,0 +1,152 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, TextIO
+
+from config import data_path
+from render_task import RenderTask
+
+
+class JournalEntry:
+    def __init__(self, task: Dict[str, Any]) -> None:
+        self.task = task
+        self.started = False
+        self.finished = task.get("finished", False)
+        self.saved_frames = 0
+
+
+class QueueJournal:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: Dict[str, JournalEntry] = {}
+        self.events = 0
+        self.file: Optional[TextIO] = None
+
+    def open_default() -> "QueueJournal":
+        return QueueJournal(data_path("queue.journal"))
+
+    def load(self) -> List[JournalEntry]:
+        self.entries = {}
+        self.events = 0
+        try:
+            with open(self.path, "r") as file:
+                for line in file:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # The last event may have been cut off by a crash.
+                        continue
+                    self.apply(event)
+        except IOError:
+            pass
+        # Tasks finished in an earlier session are dropped, otherwise the
+        # journal would carry them forever.
+        self.entries = {
+            task_id: entry for task_id, entry in self.entries.items()
+            if not entry.finished
+        }
+        self.compact()
+        return list(self.entries.values())
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        self.events += 1
+        task_id = event["id"]
+        if event["event"] == "added":
+            entry = JournalEntry(event["task"])
+            entry.started = event.get("started", False)
+            entry.saved_frames = event.get("saved_frames", 0)
+            self.entries[task_id] = entry
+            return
+        entry = self.entries.get(task_id)
+        if entry is None:
+            return
+        if event["event"] == "removed":
+            del self.entries[task_id]
+        elif event["event"] == "started":
+            entry.started = True
+        elif event["event"] == "frame":
+            entry.saved_frames += 1
+        elif event["event"] == "finished":
+            entry.finished = True
+            entry.task["finished"] = True
+        elif event["event"] == "moved":
+            entry.task["priority"] = event["priority"]
+            entries = [
+                item for item in self.entries.items() if item[0] != task_id
+            ]
+            entries.insert(event["index"], (task_id, entry))
+            self.entries = dict(entries)
+
+    def append(self, event: Dict[str, Any]) -> None:
+        self.append_all([event])
+
+    def append_all(self, events: List[Dict[str, Any]]) -> None:
+        # Events that belong together are synced to disk once.
+        if self.file is None:
+            self.file = open(self.path, "a")
+        for event in events:
+            self.apply(event)
+            self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if self.events > 4 * len(self.entries) + 1000:
+            self.compact()
+
+    def compact(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            for task_id, entry in self.entries.items():
+                file.write(json.dumps({
+                    "event": "added", "id": task_id, "task": entry.task,
+                    "started": entry.started,
+                    "saved_frames": entry.saved_frames
+                }) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        # The rename itself only survives a crash once the directory is
+        # synced.
+        directory = os.open(os.path.dirname(self.path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self.events = len(self.entries)
+
+    def add(self, render_tasks: List[RenderTask]) -> None:
+        self.append_all([
+            {
+                "event": "added", "id": render_task.task_id,
+                "task": render_task.to_dict()
+            }
+            for render_task in render_tasks
+        ])
+
+    def remove(self, render_tasks: List[RenderTask]) -> None:
+        self.append_all([
+            {"event": "removed", "id": render_task.task_id}
+            for render_task in render_tasks
+        ])
+
+    def start(self, render_task: RenderTask) -> None:
+        self.append({"event": "started", "id": render_task.task_id})
+
+    def save_frame(self, render_task: RenderTask) -> None:
+        self.append({"event": "frame", "id": render_task.task_id})
+
+    def move(self, render_task: RenderTask, index: int) -> None:
+        self.append({
+            "event": "moved", "id": render_task.task_id,
+            "priority": render_task.priority, "index": index
+        })
+
+    def finish(self, render_task: RenderTask) -> None:
+        self.append({"event": "finished", "id": render_task.task_id})
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,98 @@
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import Gtk  # noqa: E402
+
+import bisect  # noqa: E402
+from typing import Any, Dict, List, Optional  # noqa: E402
+
+from render_task import RenderTask  # noqa: E402
+
+
+TASK_ID_COLUMN = 7
+# Changes to more rows than this are made with the tree view detached
+BULK_SIZE = 100
+
+
+class QueueModel:
+    def __init__(self, store: Gtk.ListStore) -> None:
+        self.store = store
+        self.tree_view: Optional[Gtk.TreeView] = None
+        # Tasks in the order they are shown and rendered in
+        self.order: List[RenderTask] = []
+        self.tasks: Dict[str, RenderTask] = {}
+        # Iterators of a list store stay valid while other rows are
+        # inserted or removed, so a task finds its row without a search.
+        self.rows: Dict[str, Gtk.TreeIter] = {}
+
+    def task(self, tree_iter: Gtk.TreeIter) -> RenderTask:
+        return self.tasks[self.store.get_value(tree_iter, TASK_ID_COLUMN)]
+
+    def position(self, render_task: RenderTask) -> int:
+        return self.store.get_path(self.rows[render_task.task_id])[0]
+
+    def set(self, render_task: RenderTask, column: int, value: Any) -> None:
+        tree_iter = self.rows.get(render_task.task_id)
+        # Every change redraws the row, unchanged cells are left alone.
+        if tree_iter is not None \
+                and self.store.get_value(tree_iter, column) != value:
+            self.store.set_value(tree_iter, column, value)
+
+    def detach(self, count: int) -> bool:
+        # The tree view handles every inserted or removed row on its own,
+        # without a model it only handles the result.
+        if self.tree_view is None or count < BULK_SIZE:
+            return False
+        self.tree_view.set_model(None)
+        return True
+
+    def attach(self) -> None:
+        self.tree_view.set_model(self.store)
+
+    def add(
+        self, render_tasks: List[RenderTask], rows: List[List[Any]]
+    ) -> bool:
+        # The queue is shown in the order it is rendered in, so a task goes
+        # behind all tasks of the same or a higher priority. Returns
+        # whether a task went in front of others.
+        keys = [-render_task.priority for render_task in self.order]
+        moved = False
+        detached = self.detach(len(render_tasks))
+        try:
+            for render_task, row in zip(render_tasks, rows):
+                position = bisect.bisect_right(keys, -render_task.priority)
+                moved = moved or position < len(keys)
+                keys.insert(position, -render_task.priority)
+                self.order.insert(position, render_task)
+                self.tasks[render_task.task_id] = render_task
+                self.rows[render_task.task_id] = self.store.insert(
+                    position, row
+                )
+        finally:
+            if detached:
+                self.attach()
+        return moved
+
+    def remove(self, render_tasks: List[RenderTask]) -> None:
+        detached = self.detach(len(render_tasks))
+        try:
+            for render_task in render_tasks:
+                self.store.remove(self.rows.pop(render_task.task_id))
+                del self.tasks[render_task.task_id]
+        finally:
+            if detached:
+                self.attach()
+        self.order = [
+            render_task for render_task in self.order
+            if render_task.task_id in self.tasks
+        ]
+
+    def sync(self) -> None:
+        # Dragging a row inserts a copy and removes the original, so the
+        # order and the rows are read back from the store.
+        self.order = []
+        self.rows = {}
+        for row in self.store:
+            render_task = self.task(row.iter)
+            self.order.append(render_task)
+            self.rows[render_task.task_id] = row.iter
@@ -0,0 +1,117 @@
+import trio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from frame_check import frame_ranges
+from log_parser import LogParser, parse_saved
+from render_info import RenderInfo
+from render_task import RenderTask
+
+
+FRAME = "OVERNIGHT_BATCH_FRAME"
+FAILED = "OVERNIGHT_BATCH_FAILED"
+
+
+class RenderBatch:
+    def __init__(
+        self, config: Config,
+        on_info: Callable[[RenderTask, RenderInfo], None],
+        on_progress: Callable[[RenderTask, float], None],
+        on_frame_saved: Optional[Callable[[RenderTask, str, float], None]],
+        on_finished: Callable[[RenderTask, Optional[str]], None]
+    ) -> None:
+        self.config = config
+        self.on_info = on_info
+        self.on_progress = on_progress
+        self.on_frame_saved = on_frame_saved
+        self.on_finished = on_finished
+        self.owners: Dict[int, List[RenderTask]] = {}
+        self.remaining: Dict[RenderTask, int] = {}
+        self.done_frames: Dict[RenderTask, int] = {}
+        self.total_frames: Dict[RenderTask, int] = {}
+        self.image_paths: Dict[RenderTask, str] = {}
+        self.frame: Optional[int] = None
+        # Loading the file counts towards the first frame.
+        self.frame_started = trio.current_time()
+        self.log_parser: Optional[LogParser] = None
+
+    def add(
+        self, render_task: RenderTask, frames: List[Tuple[int, int]],
+        done_frames: int, total_frames: int
+    ) -> None:
+        self.done_frames[render_task] = done_frames
+        self.total_frames[render_task] = total_frames
+        self.remaining[render_task] = 0
+        for start_frame, end_frame in frames:
+            for frame in range(start_frame, end_frame + 1):
+                self.owners.setdefault(frame, []).append(render_task)
+                self.remaining[render_task] += 1
+        if self.remaining[render_task] == 0:
+            self.finish_task(render_task)
+
+    def frames(self) -> List[Tuple[int, int]]:
+        # Overlapping and adjacent ranges of the tasks become one list of
+        # ranges in which every frame is rendered once.
+        return frame_ranges(list(self.owners))
+
+    def update_progress(
+        self, render_task: RenderTask, frame_progress: float
+    ) -> None:
+        self.on_progress(
+            render_task,
+            (self.done_frames[render_task] + frame_progress / 100)
+            / self.total_frames[render_task] * 100
+        )
+
+    def handle_line(self, line: str) -> None:
+        if line.startswith(FRAME):
+            self.finish_frame()
+            self.frame = int(line.split()[1])
+            render_task = self.owners[self.frame][0]
+            self.log_parser = LogParser(
+                render_task.render_engine, render_task.layers,
+                [(self.frame, self.frame)], self.config
+            )
+            return
+        if line.startswith(FAILED):
+            print(f"Frame {self.frame} of "
+                  f"{self.owners[self.frame][0].blend_file} failed, "
+                  "continuing with the next frame", flush=True)
+            return
+        if self.frame is None:
+            return
+
+        info, progress = self.log_parser.parse(line)
+        path = parse_saved(line)
+        for render_task in self.owners[self.frame]:
+            if info is not None:
+                self.on_info(render_task, info)
+            if progress is not None:
+                self.update_progress(render_task, progress)
+            if path is not None:
+                self.image_paths[render_task] = path
+                if self.on_frame_saved is not None:
+                    self.on_frame_saved(render_task, path, self.frame_started)
+
+    def finish_frame(self) -> None:
+        if self.frame is None:
+            return
+        for render_task in self.owners[self.frame]:
+            self.done_frames[render_task] += 1
+            self.remaining[render_task] -= 1
+            self.update_progress(render_task, 0)
+            if self.remaining[render_task] == 0:
+                self.finish_task(render_task)
+        self.frame = None
+        self.frame_started = trio.current_time()
+
+    def finish_task(self, render_task: RenderTask) -> None:
+        del self.remaining[render_task]
+        self.on_finished(render_task, self.image_paths.get(render_task))
+
+    def finish(self) -> None:
+        self.finish_frame()
+        # Frames that Blender never got to because it crashed are given up
+        # like a failed frame of a single task.
+        for render_task in list(self.remaining):
+            self.finish_task(render_task)
@@ -0,0 +1,410 @@
+import functools
+import json
+import os
+import socket
+import subprocess
+import trio
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from config import Config
+from frame_check import frame_ranges, missing_frames
+from log_parser import LogParser, parse_saved
+from render_info import RenderInfo
+from render_task import RenderTask
+from task_queue import TaskQueue
+from worker_pool import LineReader
+
+
+DEFAULT_PORT = 7842
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+POLL_INTERVAL = 1
+RECONNECT_INTERVAL = 5
+# Heartbeats only show that the worker is alive, a job whose Blender hasn't
+# logged anything for this long is handed to another worker.
+STALL_TIMEOUT = 10 * 60
+# Errors of the stream and of the messages sent over it. Errors of the
+# machine itself, like Blender not starting, are reported as failed jobs.
+CONNECTION_ERRORS = (
+    trio.BrokenResourceError, trio.ClosedResourceError, ValueError, KeyError
+)
+
+
+class Connection:
+    def __init__(self, stream: trio.abc.Stream) -> None:
+        self.stream = stream
+        self.reader = LineReader(stream)
+        self.send_lock = trio.Lock()
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        async with self.send_lock:
+            await self.stream.send_all(
+                (json.dumps(message) + "\n").encode("utf-8")
+            )
+
+    async def receive(self) -> Optional[Dict[str, Any]]:
+        while True:
+            line = await self.reader.readline()
+            if line is None:
+                return None
+            if line.strip():
+                return json.loads(line)
+
+
+class FarmJob:
+    def __init__(
+        self, job_id: int, render_task: RenderTask, start_frame: int,
+        end_frame: int
+    ) -> None:
+        self.job_id = job_id
+        self.render_task = render_task
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.saved_frames = 0
+        self.progress = 0.0
+        self.last_output = 0.0
+        self.log_parser: Optional[LogParser] = None
+
+    def frame_count(self) -> int:
+        return self.end_frame - self.start_frame + 1
+
+    def to_message(self) -> Dict[str, Any]:
+        return {
+            "type": "job",
+            "job_id": self.job_id,
+            "task": self.render_task.to_dict(),
+            "frames": [[self.start_frame, self.end_frame]]
+        }
+
+
+class Coordinator:
+    def __init__(
+        self, config: Config, task_queue: TaskQueue, chunk_frames: int,
+        on_info: Callable[[RenderTask, RenderInfo], None],
+        on_progress: Callable[[RenderTask, float], None],
+        on_task_finished: Callable[[RenderTask], None],
+        stall_timeout: float = STALL_TIMEOUT
+    ) -> None:
+        self.config = config
+        self.task_queue = task_queue
+        self.chunk_frames = max(1, chunk_frames)
+        self.stall_timeout = stall_timeout
+        self.on_info = on_info
+        self.on_progress = on_progress
+        self.on_task_finished = on_task_finished
+        self.pending: Deque[FarmJob] = deque()
+        self.assigned: Dict[int, FarmJob] = {}
+        self.total_frames: Dict[RenderTask, int] = {}
+        self.done_frames: Dict[RenderTask, int] = {}
+        self.open_jobs: Dict[RenderTask, int] = {}
+        self.next_job_id = 0
+        self.finished = trio.Event()
+
+    def add_job(
+        self, render_task: RenderTask, start_frame: int, end_frame: int,
+        first: bool = False
+    ) -> None:
+        self.next_job_id += 1
+        job = FarmJob(self.next_job_id, render_task, start_frame, end_frame)
+        if first:
+            self.pending.appendleft(job)
+        else:
+            self.pending.append(job)
+        self.open_jobs[render_task] = self.open_jobs.get(render_task, 0) + 1
+
+    async def start_tasks(self) -> None:
+        # Tasks are handed out in the order of the task queue, the next one
+        # once the chunks of the last one are taken and only after the
+        # tasks it depends on have finished.
+        while not self.pending:
+            render_task = self.task_queue.take(lambda render_task: True)
+            if render_task is None:
+                break
+            await self.add_task(render_task)
+        if not self.pending and not self.open_jobs:
+            self.finished.set()
+
+    async def add_task(self, render_task: RenderTask) -> None:
+        # Counts as open while the frames are checked, so that the queue
+        # isn't considered done in the meantime.
+        self.open_jobs[render_task] = 0
+        animation = render_task.output_type == "Animation"
+        start_frame = render_task.start_frame
+        end_frame = render_task.end_frame if animation else start_frame
+        frames = [(start_frame, end_frame)]
+        self.total_frames[render_task] = end_frame - start_frame + 1
+        self.done_frames[render_task] = 0
+
+        # Workers write to the same paths, so the output has to be on
+        # storage that the coordinator can see as well.
+        if animation and render_task.resume:
+            missing = await trio.to_thread.run_sync(
+                missing_frames, render_task.output_file,
+                render_task.blend_file, start_frame, end_frame,
+                render_task.output_format
+            )
+            self.done_frames[render_task] = \
+                self.total_frames[render_task] - len(missing)
+            frames = frame_ranges(missing)
+
+        for start, end in frames:
+            for lo in range(start, end + 1, self.chunk_frames):
+                self.add_job(
+                    render_task, lo, min(end, lo + self.chunk_frames - 1)
+                )
+        if self.open_jobs[render_task] == 0:
+            self.finish_task(render_task)
+
+    def assign(self) -> Optional[FarmJob]:
+        if not self.pending:
+            return None
+        job = self.pending.popleft()
+        job.saved_frames = 0
+        job.progress = 0
+        job.last_output = trio.current_time()
+        job.log_parser = LogParser(
+            job.render_task.render_engine, job.render_task.layers,
+            [(job.start_frame, job.end_frame)], self.config
+        )
+        self.assigned[job.job_id] = job
+        return job
+
+    def update_progress(self, render_task: RenderTask) -> None:
+        frames = self.done_frames[render_task] + sum(
+            job.progress / 100 * job.frame_count()
+            for job in self.assigned.values()
+            if job.render_task is render_task
+        )
+        self.on_progress(
+            render_task, frames / self.total_frames[render_task] * 100
+        )
+
+    def handle_line(self, job: FarmJob, line: str) -> None:
+        job.last_output = trio.current_time()
+        info, progress = job.log_parser.parse(line)
+        if info is not None:
+            self.on_info(job.render_task, info)
+        if progress is not None:
+            job.progress = progress
+            self.update_progress(job.render_task)
+        if parse_saved(line) is not None:
+            job.saved_frames += 1
+
+    def finish_job(self, job: FarmJob, returncode: int) -> None:
+        del self.assigned[job.job_id]
+        render_task = job.render_task
+        self.open_jobs[render_task] -= 1
+        failed_frame = job.start_frame + job.saved_frames
+        if returncode == 0 or failed_frame > job.end_frame:
+            self.done_frames[render_task] += job.frame_count()
+        else:
+            # The frame that failed is skipped like in chunked rendering,
+            # otherwise a broken frame would be handed out forever.
+            self.done_frames[render_task] += job.saved_frames + 1
+            print(f"Frame {failed_frame} of {render_task.blend_file} "
+                  "failed, continuing with the next frame", flush=True)
+            if failed_frame < job.end_frame:
+                self.add_job(
+                    render_task, failed_frame + 1, job.end_frame, True
+                )
+        self.update_progress(render_task)
+        if self.open_jobs[render_task] == 0:
+            self.finish_task(render_task)
+
+    def requeue(self, job: FarmJob) -> None:
+        del self.assigned[job.job_id]
+        render_task = job.render_task
+        self.open_jobs[render_task] -= 1
+        self.done_frames[render_task] += job.saved_frames
+        if job.start_frame + job.saved_frames <= job.end_frame:
+            self.add_job(
+                render_task, job.start_frame + job.saved_frames,
+                job.end_frame, True
+            )
+        self.update_progress(render_task)
+        if self.open_jobs[render_task] == 0:
+            self.finish_task(render_task)
+
+    def finish_task(self, render_task: RenderTask) -> None:
+        self.open_jobs.pop(render_task, None)
+        render_task.finished = True
+        # Tasks that depend on it can be handed out now.
+        self.task_queue.done(render_task)
+        self.on_task_finished(render_task)
+
+    async def handle_worker(self, stream: trio.SocketStream) -> None:
+        connection = Connection(stream)
+        name = "unknown"
+        job = None
+        async with stream:
+            try:
+                while True:
+                    # Workers send heartbeats while rendering, so silence
+                    # means the machine or the network went away.
+                    with trio.fail_after(HEARTBEAT_TIMEOUT):
+                        message = await connection.receive()
+                    if message is None:
+                        break
+                    if job is not None and trio.current_time() \
+                            - job.last_output >= self.stall_timeout:
+                        print(f"Blender on worker {name} stopped logging",
+                              flush=True)
+                        break
+
+                    if message["type"] == "hello":
+                        name = message["name"]
+                        print(f"Worker {name} connected", flush=True)
+                    elif message["type"] == "request":
+                        await self.start_tasks()
+                        job = self.assign()
+                        if job is not None:
+                            await connection.send(job.to_message())
+                        elif self.finished.is_set():
+                            await connection.send({"type": "done"})
+                        else:
+                            await connection.send({"type": "wait"})
+                    elif job is not None \
+                            and message.get("job_id") == job.job_id:
+                        if message["type"] == "log":
+                            self.handle_line(job, message["line"])
+                        elif message["type"] == "finished":
+                            self.finish_job(job, message["returncode"])
+                            job = None
+            except trio.TooSlowError:
+                print(f"Worker {name} stopped responding", flush=True)
+            except CONNECTION_ERRORS:
+                pass
+            finally:
+                if job is not None:
+                    print(f"Worker {name} lost, reassigning frames "
+                          f"{job.start_frame + job.saved_frames}-"
+                          f"{job.end_frame} of {job.render_task.blend_file}",
+                          flush=True)
+                    self.requeue(job)
+
+    async def run(self, host: str, port: int) -> None:
+        await self.start_tasks()
+        if self.finished.is_set():
+            return
+        async with trio.open_nursery() as nursery:
+            listeners = await nursery.start(
+                functools.partial(trio.serve_tcp, host=host),
+                self.handle_worker, port
+            )
+            address = listeners[0].socket.getsockname()
+            print(f"Waiting for workers on {address[0]}:{address[1]}",
+                  flush=True)
+            await self.finished.wait()
+            # Give idle workers the chance to hear that the queue is done.
+            await trio.sleep(2 * POLL_INTERVAL)
+            nursery.cancel_scope.cancel()
+
+
+class FarmWorker:
+    def __init__(
+        self, host: str, port: int, threads: int, name: Optional[str] = None,
+        give_up_after: float = 0
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.give_up_after = give_up_after
+
+    async def run(self) -> bool:
+        unreachable_since = trio.current_time()
+        while True:
+            try:
+                stream = await trio.open_tcp_stream(self.host, self.port)
+            except OSError as e:
+                print(f"Could not connect to {self.host}:{self.port}: {e}",
+                      flush=True)
+                if self.give_up_after > 0 and trio.current_time() \
+                        - unreachable_since >= self.give_up_after:
+                    return False
+                await trio.sleep(RECONNECT_INTERVAL)
+                continue
+
+            async with stream:
+                connection = Connection(stream)
+                done = False
+                async with trio.open_nursery() as nursery:
+                    nursery.start_soon(
+                        self.send_heartbeats, connection, nursery.cancel_scope
+                    )
+                    done = await self.take_jobs(connection)
+                    nursery.cancel_scope.cancel()
+            if done:
+                return True
+            print("Lost connection to the coordinator", flush=True)
+            unreachable_since = trio.current_time()
+            await trio.sleep(RECONNECT_INTERVAL)
+
+    async def send_heartbeats(
+        self, connection: Connection, cancel_scope: trio.CancelScope
+    ) -> None:
+        try:
+            while True:
+                await trio.sleep(HEARTBEAT_INTERVAL)
+                await connection.send({"type": "heartbeat"})
+        except CONNECTION_ERRORS:
+            # The coordinator dropped the job, which kills a Blender that
+            # doesn't log anything anymore as well.
+            cancel_scope.cancel()
+
+    async def take_jobs(self, connection: Connection) -> bool:
+        try:
+            await connection.send({
+                "type": "hello", "name": self.name, "threads": self.threads
+            })
+            while True:
+                await connection.send({"type": "request"})
+                message = await connection.receive()
+                if message is None:
+                    return False
+                if message["type"] == "done":
+                    return True
+                if message["type"] == "wait":
+                    await trio.sleep(POLL_INTERVAL)
+                elif message["type"] == "job":
+                    await self.run_job(connection, message)
+        except CONNECTION_ERRORS:
+            return False
+
+    async def run_job(
+        self, connection: Connection, message: Dict[str, Any]
+    ) -> None:
+        render_task = RenderTask.from_dict(message["task"])
+        frames = [(start, end) for start, end in message["frames"]]
+        job_id = message["job_id"]
+        print(f"Rendering frames {frames[0][0]}-{frames[-1][1]} of "
+              f"{render_task.blend_file}", flush=True)
+
+        async with trio.open_nursery() as nursery:
+            try:
+                # Frames of a job that can't be reported are rendered again
+                # elsewhere, so Blender is killed along with the job.
+                process = await nursery.start(functools.partial(
+                    trio.run_process,
+                    render_task.to_cmd_line(self.threads, frames),
+                    stdout=subprocess.PIPE, check=False
+                ))
+            except OSError as e:
+                print(f"Could not start Blender: {e}", flush=True)
+                await connection.send(
+                    {"type": "finished", "job_id": job_id, "returncode": 1}
+                )
+                return
+            reader = LineReader(process.stdout)
+            while True:
+                line = await reader.readline()
+                if line is None:
+                    break
+                await connection.send(
+                    {"type": "log", "job_id": job_id, "line": line.strip()}
+                )
+        await connection.send({
+            "type": "finished", "job_id": job_id,
+            "returncode": process.returncode
+        })
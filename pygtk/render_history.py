@@ -0,0 +1,113 @@
+import sqlite3
+import time
+from typing import Optional
+
+from config import data_path
+from render_task import RenderTask
+
+
+class RenderHistory:
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS frames ("
+            "blend_file TEXT, render_engine TEXT, render_samples INTEGER, "
+            "resolution_x INTEGER, resolution_y INTEGER, "
+            "resolution_percentage INTEGER, layers TEXT, "
+            "wall_time REAL, recorded REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS frames_file "
+            "ON frames (blend_file, render_engine)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS peak_memory ("
+            "blend_file TEXT, render_engine TEXT, render_samples INTEGER, "
+            "resolution_x INTEGER, resolution_y INTEGER, "
+            "resolution_percentage INTEGER, peak INTEGER, recorded REAL)"
+        )
+        self.connection.commit()
+
+    def open_default() -> "RenderHistory":
+        return RenderHistory(data_path("render_history.sqlite"))
+
+    def record(self, render_task: RenderTask, wall_time: float) -> None:
+        self.connection.execute(
+            "INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                render_task.blend_file, render_task.render_engine,
+                render_task.effective_samples(), render_task.resolution_x,
+                render_task.resolution_y,
+                render_task.effective_resolution_percentage(),
+                ", ".join(render_task.layers), wall_time, time.time()
+            )
+        )
+        self.connection.commit()
+
+    def frame_time(self, render_task: RenderTask) -> Optional[float]:
+        row = self.connection.execute(
+            "SELECT AVG(wall_time) FROM (SELECT wall_time FROM frames "
+            "WHERE blend_file = ? AND render_engine = ? "
+            "AND render_samples = ? AND resolution_x = ? "
+            "AND resolution_y = ? AND resolution_percentage = ? "
+            "AND layers = ? ORDER BY recorded DESC LIMIT 20)",
+            (
+                render_task.blend_file, render_task.render_engine,
+                render_task.effective_samples(), render_task.resolution_x,
+                render_task.resolution_y,
+                render_task.effective_resolution_percentage(),
+                ", ".join(render_task.layers)
+            )
+        ).fetchone()
+        if row[0] is not None:
+            return row[0]
+
+        # Fall back to other settings of the same file, assuming the time
+        # scales with the number of pixels and samples.
+        row = self.connection.execute(
+            "SELECT AVG(wall_time / (render_samples * resolution_x "
+            "* resolution_y * resolution_percentage * resolution_percentage"
+            ")) FROM (SELECT * FROM frames WHERE blend_file = ? "
+            "AND render_engine = ? ORDER BY recorded DESC LIMIT 20)",
+            (render_task.blend_file, render_task.render_engine)
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return row[0] * render_task.effective_samples() \
+            * render_task.resolution_x * render_task.resolution_y \
+            * render_task.effective_resolution_percentage() ** 2
+
+    def record_peak_memory(self, render_task: RenderTask, peak: int) -> None:
+        self.connection.execute(
+            "INSERT INTO peak_memory VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                render_task.blend_file, render_task.render_engine,
+                render_task.effective_samples(), render_task.resolution_x,
+                render_task.resolution_y,
+                render_task.effective_resolution_percentage(),
+                peak, time.time()
+            )
+        )
+        self.connection.commit()
+
+    def peak_memory(self, render_task: RenderTask) -> Optional[int]:
+        rows = self.connection.execute(
+            "SELECT peak, resolution_x * resolution_y * resolution_percentage "
+            "* resolution_percentage FROM peak_memory "
+            "WHERE blend_file = ? AND render_engine = ? "
+            "ORDER BY recorded DESC LIMIT 5",
+            (render_task.blend_file, render_task.render_engine)
+        ).fetchall()
+        if not rows:
+            return None
+        # Scene data dominates, so only the render buffers are scaled with
+        # the number of pixels of this task.
+        pixels = render_task.resolution_x * render_task.resolution_y \
+            * render_task.effective_resolution_percentage() ** 2
+        return max(
+            peak + int((pixels - old_pixels) / 10000 * 16 * 4)
+            for peak, old_pixels in rows
+        )
+
+    def close(self) -> None:
+        self.connection.close()
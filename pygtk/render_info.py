@@ -4,6 +4,10 @@ from config import Config
 
 
 class RenderInfo:
+    __slots__ = (
+        "frame", "time", "remaining", "mem", "layer", "status", "config"
+    )
+
     def __init__(
         self, frame: Optional[str], time: Optional[str],
         remaining: Optional[str], mem: Optional[str], layer: Optional[str],
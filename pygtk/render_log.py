@@ -0,0 +1,203 @@
+import os
+import time
+import zlib
+from typing import BinaryIO, Dict, List, Optional, Set, TextIO, Tuple
+
+from config import data_path
+from log_parser import FRAME_PATTERN
+from render_batch import FRAME
+from render_task import RenderTask
+
+
+MIB = 1024 * 1024
+# Compressed size after which a frame is continued in a new segment
+SEGMENT_SIZE = MIB
+START = "-"
+
+
+def line_frame(line: str) -> Optional[str]:
+    if line.startswith(FRAME):
+        return line.split()[1]
+    m = FRAME_PATTERN.match(line)
+    return m.group(1) if m is not None else None
+
+
+def read_segments(path: str) -> List[Tuple[str, int, int]]:
+    segments = []
+    try:
+        with open(f"{path}.idx", "r") as file:
+            for line in file:
+                parts = line.split()
+                # The last entry may have been cut off by a crash.
+                if len(parts) == 3:
+                    segments.append((parts[0], int(parts[1]), int(parts[2])))
+    except (OSError, ValueError):
+        pass
+    return segments
+
+
+def read_frames(path: str) -> List[str]:
+    frames: List[str] = []
+    for frame, _, _ in read_segments(path):
+        if frame not in frames:
+            frames.append(frame)
+    return frames
+
+
+def read_frame(path: str, frame: str) -> str:
+    # Only the segments of the frame are read and decompressed.
+    text = []
+    try:
+        with open(f"{path}.gz", "rb") as file:
+            for segment_frame, offset, size in read_segments(path):
+                if segment_frame != frame:
+                    continue
+                file.seek(offset)
+                text.append(zlib.decompressobj(31).decompress(
+                    file.read(size)
+                ).decode("utf-8", errors="replace"))
+    except (OSError, zlib.error):
+        pass
+    return "".join(text)
+
+
+class TaskLog:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file: Optional[BinaryIO] = None
+        self.index: Optional[TextIO] = None
+        self.writers = 0
+
+    def append(self, frame: str, data: bytes) -> None:
+        try:
+            if self.file is None:
+                self.file = open(f"{self.path}.gz", "ab")
+                self.index = open(f"{self.path}.idx", "a")
+            offset = self.file.seek(0, os.SEEK_END)
+            self.file.write(data)
+            self.file.flush()
+            self.index.write(f"{frame} {offset} {len(data)}\n")
+            self.index.flush()
+        except OSError as e:
+            # A full disk must not stop the render.
+            print(f"Writing {self.path}.gz failed: {e}")
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.index.close()
+        self.file = None
+        self.index = None
+
+
+class LogWriter:
+    # Every frame is written as gzip members of its own, so the file can be
+    # read with zcat and a frame can be found without decompressing the
+    # ones before it. Only the current segment is kept in memory.
+    def __init__(
+        self, task_log: TaskLog, frames: Optional[Set[str]] = None
+    ) -> None:
+        self.task_log = task_log
+        self.frames = frames
+        self.frame = START
+        self.compressor = None
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, line: str) -> None:
+        frame = line_frame(line)
+        if frame is not None and frame != self.frame:
+            self.flush()
+            self.frame = frame
+        if self.frames is not None and self.frame != START \
+                and self.frame not in self.frames:
+            # Frames of other tasks in the same batch
+            return
+        if self.compressor is None:
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        chunk = self.compressor.compress(line.encode("utf-8") + b"\n")
+        if chunk:
+            self.chunks.append(chunk)
+            self.size += len(chunk)
+            if self.size >= SEGMENT_SIZE:
+                self.flush()
+
+    def flush(self) -> None:
+        if self.compressor is None:
+            return
+        self.chunks.append(self.compressor.flush())
+        self.task_log.append(self.frame, b"".join(self.chunks))
+        self.compressor = None
+        self.chunks = []
+        self.size = 0
+
+
+class RenderLogs:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        # Logs that are being written, by task ID
+        self.task_logs: Dict[str, TaskLog] = {}
+
+    def open_default() -> "RenderLogs":
+        return RenderLogs(data_path("logs"))
+
+    def path(self, render_task: RenderTask) -> str:
+        return os.path.join(self.directory, render_task.task_id + ".log")
+
+    def writer(
+        self, render_task: RenderTask, frames: Optional[Set[int]] = None
+    ) -> LogWriter:
+        task_log = self.task_logs.get(render_task.task_id)
+        if task_log is None:
+            os.makedirs(self.directory, exist_ok=True)
+            task_log = TaskLog(self.path(render_task))
+            self.task_logs[render_task.task_id] = task_log
+        task_log.writers += 1
+        return LogWriter(
+            task_log,
+            {str(frame) for frame in frames} if frames is not None else None
+        )
+
+    def close_writer(self, writer: LogWriter) -> None:
+        writer.flush()
+        task_log = writer.task_log
+        task_log.writers -= 1
+        if task_log.writers == 0:
+            task_log.close()
+            self.task_logs = {
+                task_id: other for task_id, other in self.task_logs.items()
+                if other is not task_log
+            }
+
+    def cleanup(self, max_size: int, max_age: float) -> None:
+        # Logs of finished renders go oldest first, until they are younger
+        # than the age limit and fit into the size limit.
+        logs = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".log.gz"):
+                continue
+            task_id = name[:-len(".log.gz")]
+            if task_id in self.task_logs:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            logs.append((stat.st_mtime, stat.st_size, task_id))
+        logs.sort()
+        total = sum(size for _, size, _ in logs)
+        now = time.time()
+        for mtime, size, task_id in logs:
+            if total <= max_size and now - mtime <= max_age:
+                break
+            path = os.path.join(self.directory, task_id)
+            for extension in (".log.gz", ".log.idx"):
+                try:
+                    os.remove(path + extension)
+                except OSError:
+                    pass
+            total -= size
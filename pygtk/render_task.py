@@ -1,18 +1,40 @@
-from typing import List
+import sys
+import uuid
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 
 from convert_input_to_argument import convert_output_format, \
-    convert_animation, convert_render_device, convert_render_samples, \
+    convert_file_format, convert_animation, convert_render_device, \
+    convert_render_samples, \
     convert_resolution_x, convert_resolution_y, \
-    convert_resolution_percentage, convert_single_frame
+    convert_resolution_percentage, convert_single_frame, convert_threads, \
+    convert_frame_ranges, convert_batch_frames
+from frame_check import MOVIE_FORMATS
 
 
 class RenderTask:
+    # Generated queues hold tens of thousands of tasks.
+    __slots__ = (
+        "blend_file", "render_engine", "render_device", "render_samples",
+        "resolution_x", "resolution_y", "resolution_percentage",
+        "output_type", "start_frame", "end_frame", "output_format",
+        "output_file", "python_expressions", "layers", "finished",
+        "chunk_workers", "resume", "task_id", "priority", "dependencies",
+        "deadline_samples", "deadline_resolution_percentage", "threads",
+        "cpus"
+    )
+
     def __init__(
         self, blend_file: str, render_engine: str, render_device: str,
         render_samples: int, resolution_x: int, resolution_y: int,
         resolution_percentage: int, output_type: str, start_frame: int,
         end_frame: int, output_format: str, output_file: str,
-        python_expressions: str, layers: List[str], finished: bool
+        python_expressions: str, layers: List[str], finished: bool,
+        chunk_workers: int = 1, resume: bool = False,
+        task_id: Optional[str] = None, priority: int = 0,
+        dependencies: Optional[List[str]] = None,
+        deadline_samples: Optional[int] = None,
+        deadline_resolution_percentage: Optional[int] = None,
+        threads: int = 0, cpus: str = ""
     ) -> None:
         self.blend_file = blend_file
         self.render_engine = render_engine
@@ -29,33 +51,179 @@ class RenderTask:
         self.python_expressions = python_expressions
         self.layers = layers
         self.finished = finished
+        self.chunk_workers = chunk_workers
+        self.resume = resume
+        self.task_id = task_id or uuid.uuid4().hex
+        self.priority = priority
+        self.dependencies = dependencies or []
+        # Lower settings chosen to finish the queue in time
+        self.deadline_samples = deadline_samples
+        self.deadline_resolution_percentage = deadline_resolution_percentage
+        # 0 threads and no CPUs leave it to the scheduler
+        self.threads = threads
+        self.cpus = cpus
+
+    def from_dict(data: Dict[str, Any]) -> "RenderTask":
+        # The tasks of a sweep share their file and settings, interned
+        # strings are kept once instead of once per task.
+        return RenderTask(
+            sys.intern(data["blend_file"]),
+            sys.intern(data.get("render_engine", "CYCLES")),
+            sys.intern(data.get("render_device", "CPU")),
+            data.get("render_samples", 128),
+            data.get("resolution_x", 1920),
+            data.get("resolution_y", 1080),
+            data.get("resolution_percentage", 100),
+            sys.intern(data.get("output_type", "Single Frame")),
+            data.get("start_frame", 1),
+            data.get("end_frame", 250),
+            sys.intern(data.get("output_format", "PNG")),
+            sys.intern(data["output_file"]),
+            data.get("python_expressions", ""),
+            data.get("layers", []),
+            data.get("finished", False),
+            data.get("chunk_workers", 1),
+            data.get("resume", False),
+            data.get("task_id"),
+            data.get("priority", 0),
+            data.get("dependencies", []),
+            data.get("deadline_samples"),
+            data.get("deadline_resolution_percentage"),
+            data.get("threads", 0),
+            data.get("cpus", "")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "blend_file": self.blend_file,
+            "render_engine": self.render_engine,
+            "render_device": self.render_device,
+            "render_samples": self.render_samples,
+            "resolution_x": self.resolution_x,
+            "resolution_y": self.resolution_y,
+            "resolution_percentage": self.resolution_percentage,
+            "output_type": self.output_type,
+            "start_frame": self.start_frame,
+            "end_frame": self.end_frame,
+            "output_format": self.output_format,
+            "output_file": self.output_file,
+            "python_expressions": self.python_expressions,
+            "layers": self.layers,
+            "finished": self.finished,
+            "chunk_workers": self.chunk_workers,
+            "resume": self.resume,
+            "task_id": self.task_id,
+            "priority": self.priority,
+            "dependencies": self.dependencies,
+            "deadline_samples": self.deadline_samples,
+            "deadline_resolution_percentage":
+                self.deadline_resolution_percentage,
+            "threads": self.threads,
+            "cpus": self.cpus
+        }
+
+    def effective_samples(self) -> int:
+        return self.deadline_samples or self.render_samples
+
+    def effective_resolution_percentage(self) -> int:
+        return self.deadline_resolution_percentage \
+            or self.resolution_percentage
+
+    def python_expression(self) -> str:
+        return "import bpy; " \
+            + convert_render_device(self.render_device) \
+            + convert_render_samples(
+                self.effective_samples(),
+                self.render_engine
+            ) \
+            + convert_resolution_x(self.resolution_x) \
+            + convert_resolution_y(self.resolution_y) \
+            + convert_resolution_percentage(
+                self.effective_resolution_percentage()
+            ) \
+            + f"{self.python_expressions}"
+
+    def batch_key(self) -> Optional[Hashable]:
+        # Tasks with the same key only differ in their frames, so they can
+        # share one Blender process that loads the file once.
+        if self.chunk_workers > 1 or self.output_format in MOVIE_FORMATS:
+            return None
+        return (
+            self.blend_file, self.render_engine, self.render_device,
+            self.render_samples, self.resolution_x, self.resolution_y,
+            self.resolution_percentage, self.output_format, self.output_file,
+            self.python_expressions, tuple(self.layers), self.threads,
+            self.cpus
+        )
+
+    def to_job(
+        self, threads: int = 0,
+        frames: Optional[List[Tuple[int, int]]] = None
+    ) -> Dict[str, Any]:
+        if frames is None:
+            frames = [(self.start_frame, self.end_frame)]
+        return {
+            "type": "render",
+            "blend_file": self.blend_file,
+            "render_engine": self.render_engine,
+            "output_file": self.output_file,
+            "output_format": convert_file_format(self.output_format),
+            "threads": threads,
+            "python_expressions": self.python_expression(),
+            "animation": self.output_type == "Animation",
+            "frames": [list(frame_range) for frame_range in frames]
+        }
+
+    def to_batch_job(
+        self, threads: int, frames: List[Tuple[int, int]]
+    ) -> Dict[str, Any]:
+        job = self.to_job(threads, frames)
+        job["type"] = "batch"
+        return job
+
+    def to_batch_cmd_line(
+        self, threads: int, frames: List[Tuple[int, int]]
+    ) -> List[str]:
+        return [
+            "blender",
+            "-b", self.blend_file,
+            "-E", self.render_engine,
+            "-o", self.output_file,
+        ] + convert_threads(threads) \
+            + convert_output_format(self.output_format) \
+            + ["--python-expr", self.python_expression()] \
+            + convert_batch_frames(frames)
 
-    def to_cmd_line(self) -> List[str]:
+    def to_cmd_line(
+        self, threads: int = 0,
+        frames: Optional[List[Tuple[int, int]]] = None
+    ) -> List[str]:
+        if frames is None:
+            frames = [(self.start_frame, self.end_frame)]
+        if len(frames) > 1:
+            return [
+                "blender",
+                "-b", self.blend_file,
+                "-E", self.render_engine,
+                "-o", self.output_file,
+            ] + convert_threads(threads) \
+                + convert_output_format(self.output_format) \
+                + ["--python-expr", self.python_expression()] \
+                + convert_frame_ranges(frames)
         return [
             "blender",
             "-b", self.blend_file,
             "-E", self.render_engine,
             "-o", self.output_file,
-        ] + convert_output_format(self.output_format) \
+        ] + convert_threads(threads) \
+            + convert_output_format(self.output_format) \
             + convert_animation(
                 self.output_type,
-                self.start_frame,
-                self.end_frame
+                frames[0][0],
+                frames[0][1]
            ) \
-            + [
-                "--python-expr",
-                "import bpy; "
-                + convert_render_device(self.render_device)
-                + convert_render_samples(
-                    self.render_samples,
-                    self.render_engine
-                )
-                + convert_resolution_x(self.resolution_x)
-                + convert_resolution_y(self.resolution_y)
-                + convert_resolution_percentage(self.resolution_percentage)
-                + f"{self.python_expressions}"
-            ] \
+            + ["--python-expr", self.python_expression()] \
             + convert_single_frame(
                 self.output_type,
-                self.start_frame
+                frames[0][0]
             )
@@ -0,0 +1,477 @@
+import functools
+import os
+import trio
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config import Config
+from cpu_topology import set_process_affinity, split_cpus
+from frame_check import frame_ranges, missing_frames
+from frame_chunks import FrameChunker
+from log_parser import LogParser, parse_saved
+from memory_guard import MemoryGuard, parse_peak_memory
+from process_control import PRIORITY_LEVELS, pause_process_group, \
+    resume_process_group, set_process_group_priority
+from render_batch import RenderBatch
+from render_info import RenderInfo
+from render_log import LogWriter, RenderLogs
+from render_task import RenderTask
+from worker_pool import LineReader, WorkerPool
+
+
+def post_rendering_command(action: str) -> Optional[List[str]]:
+    if action == "Suspend":
+        return ["systemctl", "suspend"]
+    elif action == "Shutdown":
+        return ["poweroff"]
+    return None
+
+
+class Renderer:
+    def __init__(
+        self, config: Config,
+        on_info: Callable[[RenderTask, RenderInfo], None],
+        on_progress: Callable[[RenderTask, float], None],
+        on_resume: Optional[Callable[[RenderTask, int, int], None]] = None,
+        on_frame_saved: Optional[
+            Callable[[RenderTask, str, float], None]
+        ] = None
+    ) -> None:
+        self.config = config
+        self.on_info = on_info
+        self.on_progress = on_progress
+        self.on_resume = on_resume
+        self.on_frame_saved = on_frame_saved
+        self.processes: List[trio.Process] = []
+        self.task_pids: Dict[RenderTask, List[int]] = {}
+        self.log_peaks: Dict[RenderTask, int] = {}
+        self.memory_guard: Optional[MemoryGuard] = None
+        self.render_logs: Optional[RenderLogs] = None
+        # Frames of each task of a batch, the rest of the log is theirs
+        self.log_frames: Dict[RenderTask, Set[int]] = {}
+        self.paused: Set[RenderTask] = set()
+        self.priorities: Dict[RenderTask, str] = {}
+        # "off", "priority" or "pause" while someone uses the machine
+        self.yield_mode = "off"
+        self.users_active = False
+        self.worker_pool: Optional[WorkerPool] = None
+        if config.settings["persistent_workers"]:
+            self.worker_pool = WorkerPool(
+                config.settings["worker_max_jobs"],
+                config.settings["worker_max_memory"]
+            )
+
+    async def update_worker_pool(self) -> None:
+        settings = self.config.settings
+        if not settings["persistent_workers"]:
+            if self.worker_pool is not None:
+                await self.worker_pool.terminate()
+            self.worker_pool = None
+        elif self.worker_pool is None:
+            self.worker_pool = WorkerPool(
+                settings["worker_max_jobs"], settings["worker_max_memory"]
+            )
+        else:
+            self.worker_pool.max_jobs = settings["worker_max_jobs"]
+            self.worker_pool.max_memory = settings["worker_max_memory"]
+
+    async def terminate(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        # Stopped processes only act on the signal once they continue.
+        for pids in self.task_pids.values():
+            for pid in pids:
+                resume_process_group(pid)
+        if self.worker_pool is not None:
+            await self.worker_pool.terminate()
+
+    def task_paused(self, render_task: RenderTask) -> bool:
+        return render_task in self.paused \
+            or self.yield_mode == "pause" and self.users_active
+
+    def task_priority(self, render_task: RenderTask) -> str:
+        if self.yield_mode == "priority" and self.users_active:
+            return PRIORITY_LEVELS[-1]
+        return self.priorities.get(render_task, PRIORITY_LEVELS[0])
+
+    def sharing_tasks(self, render_task: RenderTask) -> List[RenderTask]:
+        # Tasks of a batch share their Blender process, so they can only be
+        # paused or reniced together.
+        pids = set(self.task_pids.get(render_task, []))
+        return [
+            other for other, other_pids in self.task_pids.items()
+            if other is render_task or pids.intersection(other_pids)
+        ] or [render_task]
+
+    def pause(self, render_task: RenderTask) -> None:
+        for other in self.sharing_tasks(render_task):
+            self.paused.add(other)
+            self.control(other)
+
+    def resume(self, render_task: RenderTask) -> None:
+        for other in self.sharing_tasks(render_task):
+            self.paused.discard(other)
+            self.control(other)
+
+    def set_priority(self, render_task: RenderTask, level: str) -> bool:
+        success = True
+        for other in self.sharing_tasks(render_task):
+            self.priorities[other] = level
+            success = self.control(other) and success
+        return success
+
+    def set_users_active(self, users_active: bool) -> bool:
+        self.users_active = users_active
+        success = True
+        for render_task in list(self.task_pids):
+            success = self.control(render_task) and success
+        return success
+
+    def control(self, render_task: RenderTask) -> bool:
+        success = True
+        for pid in self.task_pids.get(render_task, []):
+            success = self.control_process(render_task, pid) and success
+        return success
+
+    def control_process(self, render_task: RenderTask, pid: int) -> bool:
+        if self.task_paused(render_task):
+            pause_process_group(pid)
+        else:
+            resume_process_group(pid)
+        return set_process_group_priority(
+            pid, self.task_priority(render_task)
+        )
+
+    def start_process(
+        self, render_tasks: List[RenderTask], pid: int
+    ) -> None:
+        for render_task in render_tasks:
+            self.task_pids.setdefault(render_task, []).append(pid)
+        # New processes of a paused or reniced task, like the next chunk,
+        # follow the task.
+        if self.task_paused(render_tasks[0]) \
+                or self.task_priority(render_tasks[0]) != PRIORITY_LEVELS[0]:
+            self.control_process(render_tasks[0], pid)
+
+    def release(self, render_task: RenderTask) -> None:
+        self.paused.discard(render_task)
+        self.priorities.pop(render_task, None)
+
+    async def frames_to_render(
+        self, render_task: RenderTask
+    ) -> Tuple[List[Tuple[int, int]], int, int]:
+        animation = render_task.output_type == "Animation"
+        start_frame = render_task.start_frame
+        end_frame = render_task.end_frame if animation else start_frame
+        total_frames = end_frame - start_frame + 1
+        if not animation or not render_task.resume:
+            return [(start_frame, end_frame)], 0, total_frames
+
+        missing = await trio.to_thread.run_sync(
+            missing_frames, render_task.output_file, render_task.blend_file,
+            start_frame, end_frame, render_task.output_format
+        )
+        done_frames = total_frames - len(missing)
+        if self.on_resume is not None:
+            self.on_resume(render_task, done_frames, total_frames)
+        return frame_ranges(missing), done_frames, total_frames
+
+    async def render(
+        self, render_task: RenderTask, threads: int,
+        cpus: Optional[List[int]] = None
+    ) -> Optional[str]:
+        frames, done_frames, total_frames = \
+            await self.frames_to_render(render_task)
+        if not frames:
+            return None
+        animation = render_task.output_type == "Animation"
+
+        def on_progress(progress: float) -> None:
+            remaining = total_frames - done_frames
+            self.on_progress(
+                render_task,
+                (done_frames + progress / 100 * remaining) / total_frames
+                * 100
+            )
+
+        if animation and render_task.chunk_workers > 1:
+            return await self.render_chunked(
+                render_task, threads, frames, on_progress, cpus
+            )
+
+        image_path, _, _ = await self.run_blender(
+            render_task, threads, frames, on_progress, cpus
+        )
+        return image_path
+
+    async def render_batch(
+        self, render_tasks: List[RenderTask], threads: int,
+        on_finished: Callable[[RenderTask, Optional[str]], None],
+        cpus: Optional[List[int]] = None
+    ) -> None:
+        if len(render_tasks) == 1:
+            try:
+                image_path = await self.render(
+                    render_tasks[0], threads, cpus
+                )
+            finally:
+                self.release(render_tasks[0])
+            on_finished(render_tasks[0], image_path)
+            return
+
+        def finish_task(
+            render_task: RenderTask, image_path: Optional[str]
+        ) -> None:
+            # Tasks are done as soon as their own frames are, even though
+            # Blender keeps running for the rest of the batch.
+            self.task_pids.pop(render_task, None)
+            self.release(render_task)
+            on_finished(render_task, image_path)
+
+        batch = RenderBatch(
+            self.config, self.handle_info, self.on_progress,
+            self.on_frame_saved, finish_task
+        )
+        for render_task in render_tasks:
+            batch.add(render_task, *await self.frames_to_render(render_task))
+        frames = batch.frames()
+        if frames:
+            running_tasks = list(batch.remaining)
+            print(f"Rendering {len(running_tasks)} tasks of "
+                  f"{render_tasks[0].blend_file} in one Blender process")
+            for frame, owners in batch.owners.items():
+                for render_task in owners:
+                    self.log_frames.setdefault(render_task, set()).add(frame)
+            try:
+                await self.run_job(
+                    running_tasks,
+                    render_tasks[0].to_batch_job(threads, frames),
+                    render_tasks[0].to_batch_cmd_line(threads, frames),
+                    batch.handle_line, cpus
+                )
+            finally:
+                for render_task in running_tasks:
+                    self.task_pids.pop(render_task, None)
+                    self.log_frames.pop(render_task, None)
+                    self.release(render_task)
+        batch.finish()
+
+    async def render_chunked(
+        self, render_task: RenderTask, threads: int,
+        frames: List[Tuple[int, int]], on_progress: Callable[[float], None],
+        cpus: Optional[List[int]] = None
+    ) -> Optional[str]:
+        frame_count = sum(end - start + 1 for start, end in frames)
+        rendered_frames = 0
+        image_path = None
+        for start_frame, end_frame in frames:
+            range_frames = end_frame - start_frame + 1
+
+            def on_range_progress(progress: float) -> None:
+                on_progress(
+                    (rendered_frames + progress / 100 * range_frames)
+                    / frame_count * 100
+                )
+
+            image_path = await self.render_chunks(
+                render_task, threads, start_frame, end_frame,
+                on_range_progress, cpus
+            ) or image_path
+            rendered_frames += range_frames
+        return image_path
+
+    async def render_chunks(
+        self, render_task: RenderTask, threads: int, start_frame: int,
+        end_frame: int, on_progress: Callable[[float], None],
+        cpus: Optional[List[int]] = None
+    ) -> Optional[str]:
+        chunker = FrameChunker(
+            start_frame, end_frame, render_task.chunk_workers
+        )
+        worker_threads = max(1, threads // chunker.workers) \
+            if threads > 0 else 0
+        worker_cpus = split_cpus(cpus, chunker.workers) \
+            if cpus else [None] * chunker.workers
+        chunk_progress: Dict[int, float] = {}
+        image_paths: List[str] = []
+
+        def update_chunk_progress(worker: int, progress: float) -> None:
+            chunk_progress[worker] = progress
+            on_progress(chunker.progress(chunk_progress))
+
+        async def run_worker(worker: int) -> None:
+            while True:
+                chunk = chunker.next_chunk(worker, trio.current_time())
+                if chunk is None:
+                    return
+                chunk_progress[worker] = 0
+                image_path, saved_frames, returncode = await self.run_blender(
+                    render_task, worker_threads, [chunk],
+                    lambda progress: update_chunk_progress(worker, progress),
+                    worker_cpus[worker]
+                )
+                if image_path is not None:
+                    image_paths.append(image_path)
+                failed_frame = None
+                if returncode != 0 and chunk[0] + saved_frames <= chunk[1]:
+                    failed_frame = chunk[0] + saved_frames
+                    print(f"Frame {failed_frame} of {render_task.blend_file}"
+                          " failed, continuing with the next frame",
+                          flush=True)
+                chunker.finish_chunk(
+                    worker, trio.current_time(), failed_frame
+                )
+
+        async with trio.open_nursery() as nursery:
+            for worker in range(chunker.workers):
+                nursery.start_soon(run_worker, worker)
+
+        return image_paths[-1] if image_paths else None
+
+    async def run_blender(
+        self, render_task: RenderTask, threads: int,
+        frames: List[Tuple[int, int]], on_progress: Callable[[float], None],
+        cpus: Optional[List[int]] = None
+    ) -> Tuple[Optional[str], int, int]:
+        image_path = None
+        saved_frames = 0
+        # Loading the file counts towards the first frame.
+        frame_started = trio.current_time()
+        log_parser = LogParser(
+            render_task.render_engine, render_task.layers, frames, self.config
+        )
+
+        def handle_line(line: str) -> None:
+            nonlocal image_path, saved_frames, frame_started
+            info, progress = log_parser.parse(line)
+
+            if info is not None:
+                self.handle_info(render_task, info)
+            if progress is not None:
+                on_progress(progress)
+
+            path = parse_saved(line)
+            if path is not None:
+                image_path = path
+                saved_frames += 1
+                if self.on_frame_saved is not None:
+                    self.on_frame_saved(render_task, path, frame_started)
+                frame_started = trio.current_time()
+
+        returncode = await self.run_job(
+            [render_task], render_task.to_job(threads, frames),
+            render_task.to_cmd_line(threads, frames), handle_line, cpus
+        )
+        return image_path, saved_frames, returncode
+
+    async def run_job(
+        self, render_tasks: List[RenderTask], job: Dict[str, Any],
+        cmd_line: List[str], handle_line: Callable[[str], None],
+        cpus: Optional[List[int]] = None
+    ) -> int:
+        log_writers = self.open_logs(render_tasks)
+
+        def handle_output(line: str) -> None:
+            # The log keeps the lines as Blender printed them.
+            for log_writer in log_writers:
+                log_writer.write(line.rstrip())
+            handle_line(line.strip())
+
+        try:
+            return await self.run_process(
+                render_tasks, job, cmd_line, handle_output, cpus
+            )
+        finally:
+            for log_writer in log_writers:
+                self.render_logs.close_writer(log_writer)
+
+    def open_logs(self, render_tasks: List[RenderTask]) -> List[LogWriter]:
+        if self.render_logs is None:
+            return []
+        return [
+            self.render_logs.writer(
+                render_task, self.log_frames.get(render_task)
+            )
+            for render_task in render_tasks
+        ]
+
+    async def run_process(
+        self, render_tasks: List[RenderTask], job: Dict[str, Any],
+        cmd_line: List[str], handle_line: Callable[[str], None],
+        cpus: Optional[List[int]]
+    ) -> int:
+        if self.worker_pool is not None:
+            pid = None
+
+            def on_start(worker_pid: int) -> None:
+                nonlocal pid
+                pid = worker_pid
+                # Workers are reused, so the CPUs of the previous job are
+                # replaced, or the restriction lifted.
+                set_process_affinity(pid, cpus)
+                self.start_process(render_tasks, pid)
+
+            try:
+                return await self.worker_pool.run_job(
+                    job, handle_line, on_start
+                )
+            finally:
+                for render_task in render_tasks:
+                    self.remove_pid(render_task, pid)
+
+        preexec_fns: List[Callable[[], None]] = []
+        if self.memory_guard is not None:
+            # The first task stands for the whole job when it comes to
+            # memory.
+            cmd_line = self.memory_guard.wrap_command(
+                render_tasks[0], cmd_line
+            )
+            limit_memory = self.memory_guard.preexec(render_tasks[0])
+            if limit_memory is not None:
+                preexec_fns.append(limit_memory)
+        if cpus:
+            preexec_fns.append(lambda: os.sched_setaffinity(0, cpus))
+
+        def preexec_fn() -> None:
+            for function in preexec_fns:
+                function()
+        # Blender gets a process group of its own, so that pausing and
+        # renicing reach every process it starts.
+        async with trio.open_nursery() as nursery:
+            # A cancelled render kills Blender.
+            process = await nursery.start(functools.partial(
+                trio.run_process, cmd_line, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, check=False,
+                preexec_fn=preexec_fn if preexec_fns else None,
+                start_new_session=True
+            ))
+            self.processes.append(process)
+            self.start_process(render_tasks, process.pid)
+            try:
+                reader = LineReader(process.stdout)
+                while True:
+                    line = await reader.readline()
+                    if line is None:
+                        break
+                    handle_line(line)
+            finally:
+                for render_task in render_tasks:
+                    self.remove_pid(render_task, process.pid)
+                self.processes.remove(process)
+        return process.returncode
+
+    def handle_info(self, render_task: RenderTask, info: RenderInfo) -> None:
+        self.on_info(render_task, info)
+        peak = parse_peak_memory(info.frame)
+        if peak is not None and peak > self.log_peaks.get(render_task, 0):
+            self.log_peaks[render_task] = peak
+
+    def peak_memory(self, render_task: RenderTask, rss: int) -> int:
+        return max(self.log_peaks.pop(render_task, 0), rss)
+
+    def remove_pid(self, render_task: RenderTask, pid: Optional[int]) -> None:
+        pids = self.task_pids.get(render_task, [])
+        if pid in pids:
+            pids.remove(pid)
+        if not pids:
+            self.task_pids.pop(render_task, None)
@@ -0,0 +1,243 @@
+import array
+import os
+import time
+import trio
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import data_path
+from render_task import RenderTask
+
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def format_bytes(size: float) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else \
+                f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def child_pids(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", "r") as file:
+                children += [int(child) for child in file.read().split()]
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def process_tree(pids: Iterable[int]) -> List[int]:
+    tree = []
+    stack = list(pids)
+    while stack:
+        pid = stack.pop()
+        if pid in tree:
+            continue
+        tree.append(pid)
+        stack += child_pids(pid)
+    return tree
+
+
+def read_process(pid: int) -> Optional[Tuple[int, int, int, int, int]]:
+    try:
+        with open(f"/proc/{pid}/stat", "r") as file:
+            # The command name may contain spaces, the fields follow it.
+            fields = file.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    cpu_ticks = int(fields[11]) + int(fields[12])
+    threads = int(fields[17])
+    rss = int(fields[21]) * PAGE_SIZE
+
+    read_bytes = 0
+    write_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io", "r") as file:
+            for line in file:
+                if line.startswith("read_bytes:"):
+                    read_bytes = int(line.split()[1])
+                elif line.startswith("write_bytes:"):
+                    write_bytes = int(line.split()[1])
+    except OSError:
+        pass
+    return cpu_ticks, rss, threads, read_bytes, write_bytes
+
+
+class ResourceSeries:
+    __slots__ = (
+        "times", "cpu", "rss", "threads", "read_bytes", "write_bytes",
+        "peak_cpu", "peak_rss", "peak_threads"
+    )
+
+    def __init__(self) -> None:
+        self.times = array.array("d")
+        self.cpu = array.array("f")
+        self.rss = array.array("q")
+        self.threads = array.array("l")
+        self.read_bytes = array.array("q")
+        self.write_bytes = array.array("q")
+        self.peak_cpu = 0.0
+        self.peak_rss = 0
+        self.peak_threads = 0
+
+    def append(
+        self, timestamp: float, cpu: float, rss: int, threads: int,
+        read_bytes: int, write_bytes: int
+    ) -> None:
+        self.times.append(timestamp)
+        self.cpu.append(cpu)
+        self.rss.append(rss)
+        self.threads.append(threads)
+        self.read_bytes.append(read_bytes)
+        self.write_bytes.append(write_bytes)
+        self.peak_cpu = max(self.peak_cpu, cpu)
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_threads = max(self.peak_threads, threads)
+
+    def summary(self) -> str:
+        if not self.times:
+            return ""
+        return f"CPU {self.cpu[-1]:.0f} % (max {self.peak_cpu:.0f} %), " \
+            f"RSS {format_bytes(self.rss[-1])} " \
+            f"(max {format_bytes(self.peak_rss)}), " \
+            f"{self.threads[-1]} threads"
+
+    def write_csv(self, path: str) -> None:
+        with open(path, "w") as file:
+            file.write(
+                "time,cpu_percent,rss_bytes,threads,read_bytes,write_bytes\n"
+            )
+            for i in range(len(self.times)):
+                file.write(
+                    f"{self.times[i]:.3f},{self.cpu[i]:.1f},{self.rss[i]},"
+                    f"{self.threads[i]},{self.read_bytes[i]},"
+                    f"{self.write_bytes[i]}\n"
+                )
+
+    def write_prometheus(self, path: str, render_task: RenderTask) -> None:
+        blend_file = render_task.blend_file.replace("\\", "\\\\") \
+            .replace('"', '\\"')
+        labels = f'task="{render_task.task_id}",blend_file="{blend_file}"'
+        duration = self.times[-1] - self.times[0] if self.times else 0
+        average_cpu = sum(self.cpu) / len(self.cpu) if self.cpu else 0
+        metrics = [
+            ("duration_seconds", "Sampled render time", duration),
+            ("cpu_percent_average", "Average CPU use", average_cpu),
+            ("cpu_percent_peak", "Peak CPU use", self.peak_cpu),
+            ("rss_bytes_peak", "Peak resident memory", self.peak_rss),
+            ("threads_peak", "Peak number of threads", self.peak_threads),
+            (
+                "read_bytes", "Bytes read from storage",
+                self.read_bytes[-1] if self.read_bytes else 0
+            ),
+            (
+                "write_bytes", "Bytes written to storage",
+                self.write_bytes[-1] if self.write_bytes else 0
+            )
+        ]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as file:
+            for name, description, value in metrics:
+                file.write(
+                    f"# HELP overnight_renderer_{name} {description}\n"
+                    f"# TYPE overnight_renderer_{name} gauge\n"
+                    f"overnight_renderer_{name}{{{labels}}} {value}\n"
+                )
+        os.replace(temp_path, path)
+
+
+class ResourceSampler:
+    def __init__(
+        self, interval: float,
+        task_pids: Callable[[RenderTask], List[int]]
+    ) -> None:
+        self.interval = interval
+        self.task_pids = task_pids
+        self.series: Dict[RenderTask, ResourceSeries] = {}
+        # pid -> (time, cpu ticks, read bytes, write bytes)
+        self.previous: Dict[int, Tuple[float, int, int, int]] = {}
+        self.io_totals: Dict[RenderTask, Tuple[int, int]] = {}
+
+    def sample(self, render_tasks: Iterable[RenderTask]) -> None:
+        now = time.monotonic()
+        previous_samples = self.previous
+        self.previous = {}
+        for render_task in render_tasks:
+            cpu = 0.0
+            rss = 0
+            threads = 0
+            pids = self.task_pids(render_task)
+            if not pids:
+                # Tasks of a batch can be done while Blender is still busy
+                # with the others.
+                continue
+            read_bytes, write_bytes = self.io_totals.get(render_task, (0, 0))
+            for pid in process_tree(pids):
+                stats = read_process(pid)
+                if stats is None:
+                    continue
+                cpu_ticks, pid_rss, pid_threads, pid_read, pid_write = stats
+                previous = previous_samples.get(pid)
+                self.previous[pid] = (now, cpu_ticks, pid_read, pid_write)
+                rss += pid_rss
+                threads += pid_threads
+                if previous is None:
+                    continue
+                # Persistent workers carry counters over from older jobs,
+                # so only the differences are attributed to this task.
+                elapsed = now - previous[0]
+                if elapsed > 0:
+                    cpu += (cpu_ticks - previous[1]) / CLOCK_TICKS \
+                        / elapsed * 100
+                read_bytes += pid_read - previous[2]
+                write_bytes += pid_write - previous[3]
+            self.io_totals[render_task] = (read_bytes, write_bytes)
+            self.series.setdefault(render_task, ResourceSeries()).append(
+                time.time(), cpu, rss, threads, read_bytes, write_bytes
+            )
+
+    def current_rss(self, render_task: RenderTask) -> int:
+        series = self.series.get(render_task)
+        return series.rss[-1] if series is not None and series.rss else 0
+
+    def peak_rss(self, render_task: RenderTask) -> int:
+        series = self.series.get(render_task)
+        return series.peak_rss if series is not None else 0
+
+    async def run(
+        self, running_tasks: Callable[[], Iterable[RenderTask]],
+        on_sample: Optional[Callable[[], None]] = None
+    ) -> None:
+        while True:
+            self.sample(running_tasks())
+            if on_sample is not None:
+                on_sample()
+            await trio.sleep(max(self.interval, 0.1))
+
+    def finish_task(
+        self, render_task: RenderTask, export_format: str, export_dir: str
+    ) -> Optional[str]:
+        series = self.series.pop(render_task, None)
+        self.io_totals.pop(render_task, None)
+        if series is None or export_format not in ("CSV", "Prometheus"):
+            return None
+
+        export_dir = export_dir or data_path("resources")
+        os.makedirs(export_dir, exist_ok=True)
+        blend_name = os.path.splitext(
+            os.path.basename(render_task.blend_file)
+        )[0]
+        name = f"{blend_name}-{render_task.task_id[:8]}"
+        if export_format == "CSV":
+            path = os.path.join(export_dir, f"{name}.csv")
+            series.write_csv(path)
+        else:
+            path = os.path.join(export_dir, f"{name}.prom")
+            series.write_prometheus(path, render_task)
+        return path
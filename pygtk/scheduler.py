@@ -0,0 +1,151 @@
+import trio
+
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from cpu_topology import CpuAllocator, parse_cpu_list
+from memory_guard import MemoryGuard
+from render_task import RenderTask
+from task_queue import TaskQueue
+
+
+class Scheduler:
+    def __init__(
+        self, slots: int, thread_budget: int,
+        memory_guard: Optional[MemoryGuard] = None,
+        batch_tasks: bool = False,
+        cpu_allocator: Optional[CpuAllocator] = None
+    ) -> None:
+        self.slots = max(1, slots)
+        self.thread_budget = max(1, thread_budget)
+        self.memory_guard = memory_guard
+        self.batch_tasks = batch_tasks
+        self.cpu_allocator = cpu_allocator
+        # Tasks of a batch share the threads of the first one.
+        self.running: Dict[RenderTask, int] = {}
+        self.cpus: Dict[RenderTask, Optional[List[int]]] = {}
+        self.used_slots = 0
+        self.held: List[RenderTask] = []
+        self.wakeup = trio.Event()
+
+    def threads_per_slot(self) -> int:
+        return max(1, self.thread_budget // self.slots)
+
+    def used_threads(self) -> int:
+        return sum(self.running.values())
+
+    def task_threads(self, render_task: RenderTask) -> int:
+        if render_task.threads > 0:
+            return render_task.threads
+        if render_task.cpus:
+            return len(parse_cpu_list(render_task.cpus))
+        return self.threads_per_slot()
+
+    def task_cpus(
+        self, render_task: RenderTask, threads: int
+    ) -> Optional[List[int]]:
+        if render_task.cpus:
+            cpus = parse_cpu_list(render_task.cpus)
+            if self.cpu_allocator is not None:
+                self.cpu_allocator.reserve(cpus)
+            return cpus
+        if self.cpu_allocator is None:
+            return None
+        return self.cpu_allocator.allocate(threads)
+
+    def can_start(self) -> bool:
+        if not self.running:
+            return True
+        return self.used_slots < self.slots \
+            and self.used_threads() < self.thread_budget
+
+    def next_task(self, task_queue: TaskQueue) -> Optional[RenderTask]:
+        self.held = []
+
+        def fits(render_task: RenderTask) -> bool:
+            # A single task may always run, even if it exceeds the budget
+            # on its own, otherwise the queue could never drain.
+            if not self.running:
+                return True
+            if self.used_threads() + self.task_threads(render_task) \
+                    > self.thread_budget:
+                return False
+            if self.memory_guard is None \
+                    or self.memory_guard.fits(render_task):
+                return True
+            # Lower priority tasks that fit into the free memory go first.
+            self.held.append(render_task)
+            return False
+
+        return task_queue.take(fits)
+
+    def next_batch(self, task_queue: TaskQueue) -> List[RenderTask]:
+        render_task = self.next_task(task_queue)
+        if render_task is None:
+            return []
+        batch_key = render_task.batch_key() if self.batch_tasks else None
+        if batch_key is None:
+            return [render_task]
+        return [render_task] + task_queue.take_matching(
+            lambda other: other.batch_key() == batch_key
+        )
+
+    def notify(self) -> None:
+        self.wakeup.set()
+
+    async def run(
+        self, task_queue: TaskQueue,
+        render: Callable[
+            [List[RenderTask], int, Optional[List[int]]], Awaitable[None]
+        ]
+    ) -> None:
+        async with trio.open_nursery() as nursery:
+            while True:
+                render_tasks = []
+                if self.can_start():
+                    render_tasks = self.next_batch(task_queue)
+                if not render_tasks and not self.running:
+                    break
+
+                if render_tasks:
+                    threads = self.task_threads(render_tasks[0])
+                    cpus = self.task_cpus(render_tasks[0], threads)
+                    for render_task in render_tasks:
+                        self.running[render_task] = 0
+                    self.running[render_tasks[0]] = threads
+                    self.cpus[render_tasks[0]] = cpus
+                    self.used_slots += 1
+                    if self.memory_guard is not None:
+                        self.memory_guard.start_task(render_tasks[0])
+                    nursery.start_soon(
+                        self.run_task, render, task_queue, render_tasks,
+                        threads, cpus
+                    )
+                    continue
+
+                # Held tasks are checked again when memory frees up outside
+                # of the renderer.
+                with trio.move_on_after(10 if self.held else float("inf")):
+                    await self.wakeup.wait()
+                self.wakeup = trio.Event()
+
+    async def run_task(
+        self,
+        render: Callable[
+            [List[RenderTask], int, Optional[List[int]]], Awaitable[None]
+        ],
+        task_queue: TaskQueue, render_tasks: List[RenderTask], threads: int,
+        cpus: Optional[List[int]]
+    ) -> None:
+        try:
+            await render(render_tasks, threads, cpus)
+        finally:
+            self.used_slots -= 1
+            self.cpus.pop(render_tasks[0], None)
+            if self.cpu_allocator is not None:
+                self.cpu_allocator.release(cpus)
+            for render_task in render_tasks:
+                del self.running[render_task]
+                task_queue.done(render_task)
+            if self.memory_guard is not None:
+                self.memory_guard.release(render_tasks[0])
+            self.notify()
@@ -0,0 +1,176 @@
+import heapq
+from typing import Callable, Dict, List, Optional, Set
+
+from render_task import RenderTask
+
+
+class TaskQueue:
+    def __init__(self) -> None:
+        self.tasks: Dict[str, RenderTask] = {}
+        self.positions: Dict[str, int] = {}
+        self.next_position = 0
+        # Ready tasks as [-priority, position, task id]. Entries of tasks
+        # that were taken, removed or reprioritized are emptied in place
+        # and skipped when they come up.
+        self.heap: List[list] = []
+        self.entries: Dict[str, list] = {}
+        self.blocking: Dict[str, Set[str]] = {}
+        self.dependents: Dict[str, Set[str]] = {}
+        self.running: Set[str] = set()
+
+    def add(self, render_task: RenderTask) -> None:
+        task_id = render_task.task_id
+        if self.creates_cycle(render_task):
+            raise ValueError(
+                f"{render_task.blend_file} depends on itself through its "
+                "dependencies"
+            )
+        self.tasks[task_id] = render_task
+        self.positions[task_id] = self.next_position
+        self.next_position += 1
+        if render_task.finished:
+            return
+
+        for dependent_id in self.dependents.get(task_id, ()):
+            # Tasks loaded before their dependency was added wait for it.
+            if dependent_id in self.blocking:
+                self.blocking[dependent_id].add(task_id)
+                self.discard(dependent_id)
+
+        blocking = set()
+        for dependency_id in render_task.dependencies:
+            self.dependents.setdefault(dependency_id, set()).add(task_id)
+            dependency = self.tasks.get(dependency_id)
+            if dependency is not None and not dependency.finished:
+                blocking.add(dependency_id)
+        self.blocking[task_id] = blocking
+        if not blocking:
+            self.push(task_id)
+
+    def creates_cycle(self, render_task: RenderTask) -> bool:
+        # Only a task that others already wait for can close a cycle.
+        task_id = render_task.task_id
+        if task_id not in self.dependents \
+                and task_id not in render_task.dependencies:
+            return False
+        visited = set()
+        pending = list(render_task.dependencies)
+        while pending:
+            dependency_id = pending.pop()
+            if dependency_id == task_id:
+                return True
+            if dependency_id in visited or dependency_id not in self.tasks:
+                continue
+            visited.add(dependency_id)
+            pending += self.tasks[dependency_id].dependencies
+        return False
+
+    def remove(self, render_task: RenderTask) -> None:
+        task_id = render_task.task_id
+        if self.tasks.pop(task_id, None) is None:
+            return
+        self.discard(task_id)
+        self.positions.pop(task_id, None)
+        self.blocking.pop(task_id, None)
+        self.running.discard(task_id)
+        # A removed task doesn't hold back the tasks that depend on it.
+        self.release_dependents(task_id)
+
+    def push(self, task_id: str) -> None:
+        entry = [
+            -self.tasks[task_id].priority, self.positions[task_id], task_id
+        ]
+        self.entries[task_id] = entry
+        heapq.heappush(self.heap, entry)
+
+    def discard(self, task_id: str) -> None:
+        entry = self.entries.pop(task_id, None)
+        if entry is not None:
+            # An empty id still compares with the ids of new entries for
+            # the same task.
+            entry[2] = ""
+
+    def release_dependents(self, task_id: str) -> None:
+        for dependent_id in self.dependents.get(task_id, ()):
+            blocking = self.blocking.get(dependent_id)
+            if blocking is None or task_id not in blocking:
+                continue
+            blocking.discard(task_id)
+            if not blocking and dependent_id not in self.running:
+                self.push(dependent_id)
+
+    def take(
+        self, accept: Callable[[RenderTask], bool]
+    ) -> Optional[RenderTask]:
+        rejected = []
+        render_task = None
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            task_id = entry[2]
+            if not task_id:
+                continue
+            del self.entries[task_id]
+            if accept(self.tasks[task_id]):
+                render_task = self.tasks[task_id]
+                self.running.add(task_id)
+                break
+            rejected.append(task_id)
+        for task_id in rejected:
+            self.push(task_id)
+        return render_task
+
+    def take_matching(
+        self, accept: Callable[[RenderTask], bool]
+    ) -> List[RenderTask]:
+        entries = sorted(
+            entry for entry in self.entries.values()
+            if accept(self.tasks[entry[2]])
+        )
+        render_tasks = []
+        for entry in entries:
+            task_id = entry[2]
+            self.discard(task_id)
+            self.running.add(task_id)
+            render_tasks.append(self.tasks[task_id])
+        return render_tasks
+
+    def done(self, render_task: RenderTask) -> None:
+        task_id = render_task.task_id
+        self.running.discard(task_id)
+        if task_id not in self.tasks:
+            return
+        if render_task.finished:
+            self.blocking.pop(task_id, None)
+            self.release_dependents(task_id)
+        elif not self.blocking.get(task_id):
+            self.push(task_id)
+
+    def set_priority(self, render_task: RenderTask, priority: int) -> None:
+        render_task.priority = priority
+        if render_task.task_id in self.entries:
+            self.discard(render_task.task_id)
+            self.push(render_task.task_id)
+
+    def reorder(self, render_queue: List[RenderTask]) -> None:
+        for position, render_task in enumerate(render_queue):
+            self.positions[render_task.task_id] = position
+        self.next_position = len(render_queue)
+        self.heap = []
+        for task_id in list(self.entries):
+            self.push(task_id)
+
+    def state(self, render_task: RenderTask) -> str:
+        task_id = render_task.task_id
+        if render_task.finished:
+            return "Done"
+        if task_id in self.running:
+            return "Running"
+        if self.blocking.get(task_id):
+            return "Blocked"
+        return "Ready"
+
+    def blocked(self) -> List[RenderTask]:
+        return [
+            self.tasks[task_id]
+            for task_id, blocking in self.blocking.items() if blocking
+        ]
@@ -0,0 +1,43 @@
+from cpu_topology import CpuAllocator, format_cpu_list, parse_cpu_list
+
+
+def make_allocator() -> CpuAllocator:
+    # Two NUMA nodes with two L3 caches of four CPUs each.
+    return CpuAllocator([
+        (0, [0, 1, 2, 3]), (0, [4, 5, 6, 7]),
+        (1, [8, 9, 10, 11]), (1, [12, 13, 14, 15])
+    ])
+
+
+def test_cpu_lists_round_trip():
+    assert parse_cpu_list("0-3, 8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpu_list([11, 0, 1, 2, 3, 8, 10]) == "0-3,8,10-11"
+
+
+def test_task_stays_in_one_cache():
+    allocator = make_allocator()
+    assert allocator.allocate(4) == [0, 1, 2, 3]
+    assert allocator.allocate(2) == [4, 5]
+    # The fullest cache that fits is taken.
+    assert allocator.allocate(2) == [6, 7]
+
+
+def test_task_stays_in_one_node():
+    allocator = make_allocator()
+    allocator.allocate(2)
+    assert allocator.allocate(8) == [8, 9, 10, 11, 12, 13, 14, 15]
+
+
+def test_task_is_spread_when_no_node_fits():
+    allocator = make_allocator()
+    allocator.allocate(4)
+    assert sorted(allocator.allocate(10)) == list(range(4, 14))
+    assert allocator.allocate(4) is None
+
+
+def test_released_cpus_are_reused():
+    allocator = make_allocator()
+    cpus = allocator.allocate(16)
+    assert allocator.allocate(1) is None
+    allocator.release(cpus)
+    assert allocator.allocate(16) == cpus
@@ -0,0 +1,63 @@
+from frame_chunks import FrameChunker
+
+
+def test_ranges_are_split_between_workers():
+    chunker = FrameChunker(1, 10, 3)
+    assert chunker.ranges == [[1, 4], [5, 7], [8, 10]]
+
+
+def test_workers_are_limited_to_the_frames():
+    assert FrameChunker(1, 2, 8).workers == 2
+
+
+def test_idle_worker_steals_the_back_half():
+    # Frames slower than the target chunk time are rendered one by one.
+    chunker = FrameChunker(1, 10, 2, target_chunk_time=10)
+    for frame in range(1, 6):
+        assert chunker.next_chunk(0, frame * 100) == (frame, frame)
+        chunker.finish_chunk(0, frame * 100 + 100)
+    assert chunker.next_chunk(0, 600) == (8, 8)
+    assert chunker.ranges[1] == [6, 7]
+
+
+def test_last_frame_of_a_busy_worker_is_not_stolen():
+    chunker = FrameChunker(1, 2, 2)
+    assert chunker.next_chunk(0, 0) == (1, 1)
+    chunker.finish_chunk(0, 0)
+    assert chunker.next_chunk(1, 0) == (2, 2)
+    assert chunker.next_chunk(0, 0) is None
+
+
+def test_chunks_grow_with_the_frame_time():
+    chunker = FrameChunker(1, 100, 1, target_chunk_time=10)
+    assert chunker.next_chunk(0, 0) == (1, 1)
+    chunker.finish_chunk(0, 2)
+    assert chunker.next_chunk(0, 2) == (2, 6)
+
+
+def test_failed_frame_is_skipped():
+    chunker = FrameChunker(1, 10, 1)
+    assert chunker.next_chunk(0, 0) == (1, 1)
+    chunker.finish_chunk(0, 1)
+    assert chunker.next_chunk(0, 1) == (2, 10)
+    chunker.finish_chunk(0, 3, failed_frame=4)
+    assert chunker.failed_frames == [4]
+    assert chunker.done_frames == 4
+
+    assert chunker.next_chunk(0, 3) == (5, 10)
+    chunker.finish_chunk(0, 9)
+    assert chunker.done_frames == 10
+    assert chunker.next_chunk(0, 9) is None
+    assert chunker.progress({}) == 100
+
+
+def test_progress_does_not_go_backwards():
+    chunker = FrameChunker(1, 4, 1)
+    chunker.next_chunk(0, 0)
+    chunker.finish_chunk(0, 1)
+    assert chunker.next_chunk(0, 1) == (2, 4)
+    assert chunker.progress({0: 50}) == 62.5
+    chunker.finish_chunk(0, 2, failed_frame=2)
+    chunker.next_chunk(0, 2)
+    assert chunker.progress({0: 0}) == 62.5
+    assert chunker.progress({0: 100}) == 100
@@ -0,0 +1,53 @@
+from config import Config, default_settings
+from log_parser import LogParser, parse_saved
+
+
+CONFIG = Config(default_settings(""))
+CYCLES_LINE = (
+    "Fra:1 Mem:101.00M (Peak 102.00M) | Time:00:02.95 | Remaining:00:27.05 "
+    "| Mem:71.00M, Peak:72.00M | Scene, View Layer | Rendered 11/12 Tiles, "
+    "Sample 96/128"
+)
+
+
+def test_cycles_line_is_split_into_fields():
+    parser = LogParser("CYCLES", ["View Layer"], [(1, 1)], CONFIG)
+    info, progress = parser.parse(CYCLES_LINE)
+    assert info.frame == "Fra:1 Mem:101.00M (Peak 102.00M)"
+    assert info.time == "Time:00:02.95"
+    assert info.remaining == "Remaining:00:27.05"
+    assert info.mem == "Mem:71.00M, Peak:72.00M"
+    assert info.layer == "Scene, View Layer"
+    assert info.status == "Rendered 11/12 Tiles, Sample 96/128"
+    assert progress == (11 + 96 / 128) / 12 * 100
+
+
+def test_cycles_progress_counts_layers_and_frames():
+    parser = LogParser(
+        "CYCLES", ["Background", "View Layer"], [(1, 4)], CONFIG
+    )
+    _, progress = parser.parse(CYCLES_LINE)
+    assert progress == (1 + (11 + 96 / 128) / 12) / 2 / 4 * 100
+
+
+def test_progress_follows_the_frame_ranges():
+    parser = LogParser("BLENDER_EEVEE", [], [(1, 2), (11, 12)], CONFIG)
+    _, progress = parser.parse(
+        "Fra:11 Mem:111.98M (Peak 114.98M) | Time:00:00.80 | Syncing Floor"
+    )
+    assert progress == 50
+
+
+def test_other_lines_are_ignored():
+    parser = LogParser("CYCLES", [], [(1, 1)], CONFIG)
+    assert parser.parse("Read blend: /tmp/a.blend") == (None, None)
+    info, progress = parser.parse(
+        "Fra:1 Mem:41.00M (Peak 41.00M) | Time:00:00.01 | Syncing Ground"
+    )
+    assert info.status is None
+    assert progress is None
+
+
+def test_saved_path():
+    assert parse_saved("Saved: '/tmp/out_0001.png'") == "/tmp/out_0001.png"
+    assert parse_saved("Time: 00:01.00 (Saving: 00:00.10)") is None
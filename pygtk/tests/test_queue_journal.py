@@ -0,0 +1,67 @@
+import json
+
+from queue_journal import QueueJournal
+from render_task import RenderTask
+
+
+def make_task(task_id: str) -> RenderTask:
+    return RenderTask(
+        f"/tmp/{task_id}.blend", "CYCLES", "CPU", 128, 1920, 1080, 100,
+        "Animation", 1, 10, "PNG", f"/tmp/{task_id}_", "", [], False,
+        task_id=task_id
+    )
+
+
+def test_events_are_replayed(tmp_path):
+    path = str(tmp_path / "queue.journal")
+    a, b, c = make_task("a"), make_task("b"), make_task("c")
+    journal = QueueJournal(path)
+    journal.add([a, b, c])
+    journal.start(a)
+    journal.save_frame(a)
+    journal.save_frame(a)
+    journal.remove([b])
+    c.priority = 5
+    journal.move(c, 0)
+    journal.close()
+
+    entries = QueueJournal(path).load()
+    assert [entry.task["task_id"] for entry in entries] == ["c", "a"]
+    assert entries[0].task["priority"] == 5
+    assert entries[1].started
+    assert entries[1].saved_frames == 2
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "queue.journal")
+    a = make_task("a")
+    journal = QueueJournal(path)
+    journal.add([a])
+    journal.close()
+    with open(path, "a") as file:
+        file.write('{"event": "frame", "id": "a"')
+
+    journal = QueueJournal(path)
+    entries = journal.load()
+    assert len(entries) == 1
+    assert entries[0].saved_frames == 0
+
+    # Loading rewrites the journal, so new events start on a fresh line.
+    journal.save_frame(a)
+    journal.close()
+    with open(path, "r") as file:
+        events = [json.loads(line) for line in file]
+    assert [event["event"] for event in events] == ["added", "frame"]
+    assert QueueJournal(path).load()[0].saved_frames == 1
+
+
+def test_finished_tasks_are_dropped(tmp_path):
+    path = str(tmp_path / "queue.journal")
+    a, b = make_task("a"), make_task("b")
+    journal = QueueJournal(path)
+    journal.add([a, b])
+    journal.finish(a)
+    journal.close()
+
+    entries = QueueJournal(path).load()
+    assert [entry.task["task_id"] for entry in entries] == ["b"]
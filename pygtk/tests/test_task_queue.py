@@ -0,0 +1,112 @@
+from typing import List, Optional
+
+import pytest
+
+from render_task import RenderTask
+from task_queue import TaskQueue
+
+
+def make_task(
+    task_id: str, priority: int = 0,
+    dependencies: Optional[List[str]] = None
+) -> RenderTask:
+    return RenderTask(
+        f"/tmp/{task_id}.blend", "CYCLES", "CPU", 128, 1920, 1080, 100,
+        "Single Frame", 1, 1, "PNG", f"/tmp/{task_id}_", "", [], False,
+        task_id=task_id, priority=priority, dependencies=dependencies
+    )
+
+
+def take_all(task_queue: TaskQueue) -> List[str]:
+    task_ids = []
+    while True:
+        render_task = task_queue.take(lambda render_task: True)
+        if render_task is None:
+            return task_ids
+        task_ids.append(render_task.task_id)
+
+
+def finish(task_queue: TaskQueue, render_task: RenderTask) -> None:
+    render_task.finished = True
+    task_queue.done(render_task)
+
+
+def test_tasks_are_taken_by_priority_then_position():
+    task_queue = TaskQueue()
+    for render_task in [
+        make_task("a"), make_task("b", 5), make_task("c"), make_task("d", 5)
+    ]:
+        task_queue.add(render_task)
+    assert take_all(task_queue) == ["b", "d", "a", "c"]
+
+
+def test_priority_change_reorders_ready_tasks():
+    task_queue = TaskQueue()
+    a, b = make_task("a"), make_task("b")
+    task_queue.add(a)
+    task_queue.add(b)
+    task_queue.set_priority(b, 1)
+    assert take_all(task_queue) == ["b", "a"]
+
+
+def test_rejected_tasks_stay_queued():
+    task_queue = TaskQueue()
+    task_queue.add(make_task("a"))
+    task_queue.add(make_task("b"))
+    render_task = task_queue.take(
+        lambda render_task: render_task.task_id == "b"
+    )
+    assert render_task.task_id == "b"
+    assert take_all(task_queue) == ["a"]
+
+
+def test_dependents_wait_for_their_dependencies():
+    task_queue = TaskQueue()
+    a, b = make_task("a"), make_task("b", 5, ["a"])
+    task_queue.add(a)
+    task_queue.add(b)
+    assert task_queue.state(b) == "Blocked"
+    assert take_all(task_queue) == ["a"]
+    finish(task_queue, a)
+    assert take_all(task_queue) == ["b"]
+
+
+def test_dependency_added_after_its_dependent():
+    task_queue = TaskQueue()
+    a, b = make_task("a"), make_task("b", 0, ["a"])
+    task_queue.add(b)
+    task_queue.add(a)
+    assert take_all(task_queue) == ["a"]
+    assert [render_task.task_id for render_task in task_queue.blocked()] \
+        == ["b"]
+
+
+def test_failed_dependency_keeps_dependents_blocked():
+    task_queue = TaskQueue()
+    a, b = make_task("a"), make_task("b", 0, ["a"])
+    task_queue.add(a)
+    task_queue.add(b)
+    take_all(task_queue)
+    task_queue.done(a)
+    assert take_all(task_queue) == ["a"]
+
+
+def test_removed_dependency_releases_dependents():
+    task_queue = TaskQueue()
+    a, b = make_task("a"), make_task("b", 0, ["a"])
+    task_queue.add(a)
+    task_queue.add(b)
+    task_queue.remove(a)
+    assert take_all(task_queue) == ["b"]
+
+
+def test_cycles_are_rejected():
+    task_queue = TaskQueue()
+    task_queue.add(make_task("a", 0, ["c"]))
+    task_queue.add(make_task("b", 0, ["a"]))
+    with pytest.raises(ValueError):
+        task_queue.add(make_task("c", 0, ["b"]))
+    with pytest.raises(ValueError):
+        task_queue.add(make_task("d", 0, ["d"]))
+    task_queue.add(make_task("c"))
+    assert take_all(task_queue) == ["c"]
@@ -0,0 +1,29 @@
+import trio
+from typing import Any, Callable, Dict
+
+
+class Throttle:
+    def __init__(
+        self, rate: float, apply: Callable[[Dict[Any, Any]], None]
+    ) -> None:
+        self.rate = rate
+        self.apply = apply
+        self.pending: Dict[Any, Any] = {}
+
+    def update(self, key: Any, value: Any) -> None:
+        self.pending[key] = value
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        pending = self.pending
+        self.pending = {}
+        self.apply(pending)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                await trio.sleep(1 / max(self.rate, 0.1))
+                self.flush()
+        finally:
+            self.flush()
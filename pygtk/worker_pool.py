@@ -0,0 +1,181 @@
+import json
+import os
+import signal
+import trio
+import subprocess
+from typing import Any, Callable, Dict, List, Optional
+
+
+WORKER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "blender_worker.py"
+)
+READY = "OVERNIGHT_WORKER_READY"
+DONE = "OVERNIGHT_WORKER_DONE"
+
+
+class LineReader:
+    def __init__(self, stream: trio.abc.ReceiveStream) -> None:
+        self.stream = stream
+        self.buffer = b""
+
+    async def readline(self) -> Optional[str]:
+        while b"\n" not in self.buffer:
+            data = await self.stream.receive_some()
+            if not data:
+                if not self.buffer:
+                    return None
+                line, self.buffer = self.buffer, b""
+                return line.decode("utf-8", errors="replace")
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode("utf-8", errors="replace")
+
+
+class BlenderWorker:
+    def __init__(self, process: trio.Process) -> None:
+        self.process = process
+        self.reader = LineReader(process.stdout)
+        self.jobs = 0
+        self.terminated = False
+
+    async def start() -> "BlenderWorker":
+        process = await trio.lowlevel.open_process(
+            ["blender", "-b", "--python", WORKER_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, start_new_session=True
+        )
+        worker = BlenderWorker(process)
+        while True:
+            line = await worker.reader.readline()
+            if line is None:
+                await worker.terminate()
+                raise RuntimeError("Blender worker exited during startup")
+            if line.strip() == READY:
+                return worker
+
+    def rss(self) -> int:
+        try:
+            with open(f"/proc/{self.process.pid}/status", "r") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except IOError:
+            pass
+        return 0
+
+    def reniced(self) -> bool:
+        try:
+            return os.getpriority(os.PRIO_PROCESS, self.process.pid) \
+                != os.getpriority(os.PRIO_PROCESS, 0)
+        except OSError:
+            return False
+
+    def alive(self) -> bool:
+        return not self.terminated and self.process.returncode is None
+
+    async def run_job(
+        self, job: Dict[str, Any], on_line: Callable[[str], None]
+    ) -> int:
+        self.jobs += 1
+        await self.process.stdin.send_all(
+            (json.dumps(job) + "\n").encode("utf-8")
+        )
+        while True:
+            try:
+                line = await self.reader.readline()
+            except trio.ClosedResourceError:
+                # The worker was terminated while running the job.
+                line = None
+            if line is None:
+                await self.process.wait()
+                return self.process.returncode or 1
+            if line.startswith(DONE):
+                return int(line.split()[1])
+            on_line(line)
+
+    async def terminate(self, timeout: float = 10) -> None:
+        if self.alive():
+            self.process.terminate()
+            # A paused worker would never get to handle the signal.
+            self.process.send_signal(signal.SIGCONT)
+        self.terminated = True
+        # Exited workers are waited on, so they don't stay around as
+        # zombies, and those that ignore the signal are killed.
+        with trio.move_on_after(timeout):
+            await self.process.wait()
+        if self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        await self.process.stdin.aclose()
+        await self.process.stdout.aclose()
+
+
+class WorkerPool:
+    def __init__(self, max_jobs: int, max_memory: int) -> None:
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
+        self.idle: List[BlenderWorker] = []
+        self.busy: List[BlenderWorker] = []
+
+    async def acquire(self) -> BlenderWorker:
+        while self.idle:
+            worker = self.idle.pop()
+            if worker.alive():
+                self.busy.append(worker)
+                return worker
+        worker = await BlenderWorker.start()
+        self.busy.append(worker)
+        return worker
+
+    async def release(self, worker: BlenderWorker) -> None:
+        self.busy.remove(worker)
+        if not worker.alive():
+            return
+        # A worker whose priority was lowered can't be raised again without
+        # root, so it isn't handed to the next task.
+        if worker.jobs >= self.max_jobs \
+                or worker.rss() > self.max_memory * 1024 * 1024 \
+                or worker.reniced():
+            await worker.terminate()
+            return
+        self.idle.append(worker)
+
+    async def run_job(
+        self, job: Dict[str, Any], on_line: Callable[[str], None],
+        on_start: Optional[Callable[[int], None]] = None
+    ) -> int:
+        worker = await self.acquire()
+        if on_start is not None:
+            on_start(worker.process.pid)
+        try:
+            returncode = await worker.run_job(job, on_line)
+        except BaseException:
+            # A cancelled job leaves the worker in an unknown state.
+            with trio.CancelScope(shield=True):
+                await worker.terminate()
+            raise
+        finally:
+            with trio.CancelScope(shield=True):
+                await self.release(worker)
+        return returncode
+
+    async def file_info(self, blend_file: str) -> List[str]:
+        file_info = []
+        ready = False
+
+        def collect(line: str) -> None:
+            nonlocal ready
+            line = line.strip()
+            if line == "READY":
+                ready = True
+            elif ready:
+                file_info.append(line)
+
+        await self.run_job({"type": "info", "blend_file": blend_file}, collect)
+        return file_info
+
+    async def terminate(self) -> None:
+        async with trio.open_nursery() as nursery:
+            for worker in self.idle + self.busy:
+                nursery.start_soon(worker.terminate)
+        self.idle = []